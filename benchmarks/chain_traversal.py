@@ -0,0 +1,144 @@
+"""
+Chain traversal benchmark: latency and allocations on the deepest chains.
+
+Compares, for the items whose production trees are largest in the loaded catalog:
+
+- recursive: the previous recursive calculator (reproduced below as a reference),
+- tree:      calculate_chain (explicit stack, builds the nested ProductionNode),
+- totals:    calculate_chain(tree=False) (explicit stack, flat totals only),
+- compact:   compact_chain (shared unit-rate templates in flat arrays).
+
+All three run against the same in-memory RecipeGraph, so no SQL is timed.
+
+Usage (from the repo root, after the ETL has populated the database):
+
+    python -m benchmarks.chain_traversal [--items 8] [--repeat 20] > bench_output.txt
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from functools import partial
+
+from dotenv import load_dotenv
+
+from src.calculator import (
+    _choose_recipe,
+    _item_name,
+    calculate_chain,
+    compute_requirements,
+    merge_sum,
+    raw_node,
+)
+from src.compact import compact_chain
+from src.database import get_engine
+from src.graph import RecipeGraph, load_recipe_graph
+from src.schemas import ProductionNode
+
+
+def recursive_chain(
+    graph: RecipeGraph,
+    item_id: int,
+    target_rate: float,
+    visited: frozenset[int] = frozenset(),
+) -> ProductionNode:
+    """The pre-stack calculator: one frame, frozenset and four merge dicts per node."""
+    recipe = None if item_id in visited else _choose_recipe(graph, item_id, None)
+    if recipe is None:
+        return raw_node(item_id, _item_name(graph, item_id), target_rate)
+    req = compute_requirements(recipe, item_id, target_rate)
+    node: ProductionNode = {
+        "item_id": item_id,
+        "item_name": req["output"]["item_name"],
+        "required_rate": target_rate,
+        "is_raw_material": False,
+        "recipe": req,
+        "dependencies": {},
+        "raw_materials": {},
+        "byproducts_totals": {bp["item_name"]: bp["rate"] for bp in req["byproducts"]},
+        "building_summary": {req["building_name"]: req["num_buildings_ideal"]},
+        "power_mw_total": req["total_power_mw"],
+    }
+    next_visited = visited | {item_id}
+    for inp in req["inputs"]:
+        dep = recursive_chain(graph, inp["item_id"], inp["rate"], next_visited)
+        node["dependencies"][inp["item_name"]] = dep
+        merge_sum(node["raw_materials"], dep["raw_materials"])
+        merge_sum(node["byproducts_totals"], dep["byproducts_totals"])
+        merge_sum(node["building_summary"], dep["building_summary"])
+        node["power_mw_total"] += dep["power_mw_total"]
+    return node
+
+
+def tree_shape(node: ProductionNode) -> tuple[int, int]:
+    """(node count, depth) of a chain."""
+    count, depth = 0, 0
+    stack = [(node, 1)]
+    while stack:
+        current, level = stack.pop()
+        count += 1
+        depth = max(depth, level)
+        stack.extend((dep, level + 1) for dep in current.get("dependencies", {}).values())
+    return count, depth
+
+
+def measure(fn: Callable[[], object], repeat: int) -> tuple[float, int, int]:
+    """(median ms, peak traced KiB during one call, memory blocks held by its result)."""
+    fn()  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = fn()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    del result
+    return statistics.median(timings), peak // 1024, blocks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=8, help="how many of the deepest chains")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per variant")
+    parser.add_argument("--rate", type=float, default=60.0, help="target rate (items/min)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    engine = get_engine(os.getenv("DATABASE_URL", "sqlite:///satisfactory.db"))
+    graph = load_recipe_graph(engine)
+    if not graph.item_count:
+        sys.exit("Catalog is empty - run the ETL first.")
+
+    shapes = {item_id: tree_shape(calculate_chain(graph, item_id, 1.0)) for item_id in graph.item_ids}
+    deepest = sorted(shapes, key=lambda i: shapes[i], reverse=True)[: args.items]
+
+    variants: dict[str, Callable[[int], object]] = {
+        "recursive": lambda i: recursive_chain(graph, i, args.rate),
+        "tree": lambda i: calculate_chain(graph, i, args.rate),
+        "totals": lambda i: calculate_chain(graph, i, args.rate, tree=False),
+        "compact": lambda i: compact_chain(graph, i, args.rate),
+    }
+    print(f"{graph!r}, rate={args.rate}/min, median of {args.repeat} runs")
+    print(f"{'item':<32}{'nodes':>7}{'depth':>6}  "
+          + "".join(f"{name + ' ms':>14}{'KiB':>7}{'blocks':>8}" for name in variants))
+    for item_id in deepest:
+        count, depth = shapes[item_id]
+        row = f"{graph.item_name(item_id)[:31]:<32}{count:>7}{depth:>6}  "
+        for fn in variants.values():
+            ms, kib, blocks = measure(partial(fn, item_id), args.repeat)
+            row += f"{ms:>14.2f}{kib:>7}{blocks:>8}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
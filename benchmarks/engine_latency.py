@@ -0,0 +1,96 @@
+"""
+Page-rerun latency: a fresh engine per rerun vs the shared, pragma-tuned engine.
+
+Each "rerun" does what the dashboard does at the top of every Streamlit rerun:
+get an engine, check the ETL ran, open a session, list groups and items, build the
+global summary, close the session. Two setups are compared:
+
+- per-rerun: `create_engine` + `sessionmaker` on every rerun, no pragmas (the
+  pages' previous behaviour),
+- shared:    `shared_engine` + the cached session factory, SQLite pragmas applied.
+
+"cold" is the first rerun after every process-level cache is dropped; "warm" is
+the median of the reruns after it. The benchmark runs against a temporary copy of
+the database (with demo data added), so satisfactory.db itself is never modified.
+
+Usage (from the repo root, after the ETL has populated the database):
+
+    python -m benchmarks.engine_latency [--reruns 30] > bench_output.txt
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from collections.abc import Callable
+
+from dotenv import load_dotenv
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.database import dispose_engines, get_session, is_etl_complete, shared_engine
+from src.graph import invalidate_recipe_graph
+from src.production import create_starter_data, get_global_summary
+from src.queries import get_all_groups, get_all_items
+
+
+def per_rerun(url: str) -> tuple[Engine, Session]:
+    engine = create_engine(url)
+    return engine, sessionmaker(bind=engine)()
+
+
+def shared(url: str) -> tuple[Engine, Session]:
+    engine = shared_engine(url)
+    return engine, get_session(engine)
+
+
+def rerun(setup: Callable[[str], tuple[Engine, Session]], url: str) -> None:
+    engine, session = setup(url)
+    assert is_etl_complete(engine)
+    try:
+        get_all_groups(session)
+        get_all_items(session)
+        get_global_summary(session)
+    finally:
+        session.close()
+
+
+def measure(setup: Callable[[str], tuple[Engine, Session]], url: str, reruns: int) -> tuple:
+    """(cold ms, warm median ms)."""
+    dispose_engines()
+    invalidate_recipe_graph()
+    timings = []
+    for _ in range(reruns + 1):
+        start = time.perf_counter()
+        rerun(setup, url)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings[0], statistics.median(timings[1:])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reruns", type=int, default=30, help="warm reruns per setup")
+    args = parser.parse_args()
+
+    load_dotenv()
+    source = make_url(os.getenv("DATABASE_URL", "sqlite:///satisfactory.db")).database
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        shutil.copyfile(source, path)
+        url = f"sqlite:///{path}"
+        with Session(create_engine(url)) as session:
+            create_starter_data(session)
+
+        print(f"{args.reruns} warm reruns, database copied from {source}")
+        print(f"{'setup':<12}{'cold ms':>10}{'warm ms':>10}")
+        for name, setup in (("per-rerun", per_rerun), ("shared", shared)):
+            cold, warm = measure(setup, url, args.reruns)
+            print(f"{name:<12}{cold:>10.2f}{warm:>10.2f}")
+        dispose_engines()
+
+
+if __name__ == "__main__":
+    main()
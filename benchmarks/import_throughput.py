@@ -0,0 +1,174 @@
+"""
+Import throughput: the bulk `import_factory_state` vs the previous per-row import.
+
+A synthetic export is generated from the loaded catalog: `--groups` groups with a
+few resource nodes each and `--lines` production lines spread over them, targeting
+producible items at a handful of rates (like a real save, many lines repeat a
+target). Two importers are compared:
+
+- per-row: create_group / add_resource_node / create_production_line /
+  set_production_line_active per entry, each committing on its own, and one item
+  lookup per node and line (the previous implementation, reproduced below),
+- bulk:    import_factory_state (one transaction, bulk inserts, one chain per
+  distinct target).
+
+The per-row importer runs on the first `--baseline-lines` lines only (it is slow
+enough that the full export would dominate the run); both are reported in lines/s.
+Each import runs against a fresh temporary copy of the database, so
+satisfactory.db itself is never modified.
+
+Usage (from the repo root, after the ETL has populated the database):
+
+    python -m benchmarks.import_throughput [--lines 10000] [--baseline-lines 1000]
+"""
+
+import argparse
+import itertools
+import os
+import shutil
+import tempfile
+import time
+from collections.abc import Callable
+from typing import Any
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from src.database import (
+    Item,
+    ProductionLine,
+    Recipe,
+    RecipeIngredient,
+    dispose_engines,
+    upgrade_schema,
+)
+from src.graph import invalidate_recipe_graph
+from src.production import (
+    add_resource_node,
+    create_group,
+    create_production_line,
+    import_factory_state,
+    set_production_line_active,
+)
+
+RATES = (7.5, 15.0, 30.0, 60.0, 120.0)
+RAW_CLASSES = ("Desc_OreIron_C", "Desc_OreCopper_C", "Desc_Stone_C", "Desc_Coal_C")
+
+
+def synthetic_export(session: Session, groups: int, lines: int) -> dict:
+    """An export dict with `lines` lines over `groups` groups, every 10th inactive."""
+    targets = session.scalars(
+        select(Item.class_name)
+        .join(RecipeIngredient, RecipeIngredient.item_id == Item.id)
+        .join(Recipe, Recipe.id == RecipeIngredient.recipe_id)
+        .where(RecipeIngredient.is_output.is_(True))
+        .distinct()
+        .order_by(Item.class_name)
+    ).all()
+    picks = itertools.cycle(itertools.product(targets, RATES))
+    out: list[dict[str, Any]] = [
+        {
+            "name": f"Group {g}",
+            "description": "synthetic",
+            "resource_nodes": [
+                {"name": f"{raw} {g}", "item_class": raw, "purity": "NORMAL",
+                 "extraction_rate": 120.0}
+                for raw in RAW_CLASSES
+            ],
+            "production_lines": [],
+        }
+        for g in range(groups)
+    ]
+    for n in range(lines):
+        item_class, rate = next(picks)
+        out[n % groups]["production_lines"].append({
+            "name": f"Line {n}",
+            "target_item_class": item_class,
+            "target_rate": rate,
+            "is_active": n % 10 != 0,
+        })
+    return {"version": 1, "groups": out}
+
+
+def per_row_import(session: Session, data: dict) -> None:
+    """The previous import_factory_state: one commit and item lookup per entry."""
+    for group_data in data["groups"]:
+        group = create_group(session, group_data["name"], group_data.get("description", ""))
+        for node_data in group_data["resource_nodes"]:
+            item = session.query(Item).filter_by(class_name=node_data["item_class"]).first()
+            if item is not None:
+                add_resource_node(
+                    session, group.id, node_data["name"], item.id,
+                    node_data["purity"], node_data["extraction_rate"],
+                )
+        for line_data in group_data["production_lines"]:
+            item = session.query(Item).filter_by(
+                class_name=line_data["target_item_class"]
+            ).first()
+            if item is None:
+                continue
+            line = create_production_line(
+                session, group.id, line_data["name"], item.id, line_data["target_rate"]
+            )
+            if not line_data["is_active"]:
+                set_production_line_active(session, line.id, False)
+
+
+def truncated(data: dict, lines: int) -> dict:
+    """The same export cut down to its first `lines` lines (in line-number order)."""
+    keep = {f"Line {n}" for n in range(lines)}
+    return {"version": 1, "groups": [
+        {**g, "production_lines": [ln for ln in g["production_lines"] if ln["name"] in keep]}
+        for g in data["groups"]
+    ]}
+
+
+def timed_import(
+    importer: Callable[[Session, dict], Any], source: str, tmp: str, data: dict
+) -> tuple[float, int]:
+    """(seconds, lines imported) for one import into a fresh copy of `source`."""
+    path = os.path.join(tmp, f"{importer.__name__}.db")
+    shutil.copyfile(source, path)
+    engine = create_engine(f"sqlite:///{path}")
+    upgrade_schema(engine)
+    invalidate_recipe_graph()
+    try:
+        with Session(engine) as session:
+            start = time.perf_counter()
+            importer(session, data)
+            elapsed = time.perf_counter() - start
+            count = session.query(ProductionLine).count()
+    finally:
+        engine.dispose()
+    return elapsed, count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--groups", type=int, default=100, help="groups in the export")
+    parser.add_argument("--lines", type=int, default=10_000, help="lines in the export")
+    parser.add_argument("--baseline-lines", type=int, default=1_000,
+                        help="lines imported by the per-row importer")
+    args = parser.parse_args()
+
+    load_dotenv()
+    source = make_url(os.getenv("DATABASE_URL", "sqlite:///satisfactory.db")).database
+    with Session(create_engine(f"sqlite:///{source}")) as session:
+        data = synthetic_export(session, args.groups, args.lines)
+
+    print(f"export: {args.groups} groups, {args.lines} lines, database copied from {source}")
+    print(f"{'importer':<10}{'lines':>8}{'seconds':>10}{'lines/s':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, importer, payload in (
+            ("per-row", per_row_import, truncated(data, args.baseline_lines)),
+            ("bulk", import_factory_state, data),
+        ):
+            elapsed, count = timed_import(importer, source, tmp, payload)
+            print(f"{name:<10}{count:>8}{elapsed:>10.2f}{count / elapsed:>12.0f}")
+    dispose_engines()
+
+
+if __name__ == "__main__":
+    main()
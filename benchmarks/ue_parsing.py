@@ -0,0 +1,105 @@
+"""
+Recipe property parsing: the structured UE-text parser vs the previous regexes.
+
+Every recipe class in Docs.json has its `mIngredients`, `mProduct` and
+`mProducedIn` strings parsed by two implementations:
+
+- regex:      two independent `re.findall` calls zipped together for item amounts,
+              plus a `Build_X.Build_Y_C` search for the building (the previous
+              ETL code, reproduced below),
+- structured: ue_properties.parse_item_amounts / parse_class_paths.
+
+Besides the time per pass, the output is compared entry by entry: "dropped" counts
+item amounts the regexes never saw (non-Desc_ classes such as BP_ItemDescriptor*),
+"misaligned" counts amounts the zip paired with the wrong class.
+
+Usage (from the repo root; reads data/Docs.json, needs no database):
+
+    python -m benchmarks.ue_parsing [--repeat 20]
+"""
+
+import argparse
+import re
+import statistics
+import time
+from collections.abc import Callable
+
+from src.etl import DOCS_PATH, read_docs
+from src.ue_properties import parse_class_paths, parse_item_amounts
+
+
+def regex_amounts(text: str) -> list[tuple[str, int]]:
+    """The previous parse_ingredients_or_products, returning full class names."""
+    class_names = re.findall(r"Desc_(\w+)_C", text)
+    amounts = re.findall(r"Amount=(\d+)", text)
+    return [(f"Desc_{c}_C", int(a)) for c, a in zip(class_names, amounts, strict=False)]
+
+
+def regex_building(text: str) -> str | None:
+    m = re.search(r"Build_(\w+)\.Build_(\w+)_C", text)
+    return f"Build_{m.group(2)}_C" if m else None
+
+
+def structured_amounts(text: str) -> list[tuple[str, int]]:
+    return [tuple(a) for a in parse_item_amounts(text)]
+
+
+def structured_building(text: str) -> str | None:
+    return next((p.name for p in parse_class_paths(text) if p.name.startswith("Build_")), None)
+
+
+def parse_all(
+    recipes: list[dict],
+    amounts: Callable[[str], list[tuple[str, int]]],
+    building: Callable[[str], str | None],
+) -> list[tuple]:
+    return [
+        (amounts(r.get("mIngredients", "")), amounts(r.get("mProduct", "")),
+         building(r.get("mProducedIn", "")))
+        for r in recipes
+    ]
+
+
+def timed(fn: Callable[[], object], repeat: int) -> float:
+    """Median milliseconds of `repeat` calls."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs", default=DOCS_PATH, help="path to Docs.json")
+    parser.add_argument("--repeat", type=int, default=20, help="timed passes per parser")
+    args = parser.parse_args()
+
+    recipes = read_docs(args.docs).recipes
+    regex = parse_all(recipes, regex_amounts, regex_building)
+    structured = parse_all(recipes, structured_amounts, structured_building)
+
+    dropped = misaligned = buildings_differ = 0
+    for old, new in zip(regex, structured, strict=True):
+        for old_parts, new_parts in zip(old[:2], new[:2], strict=True):
+            by_class = dict(new_parts)
+            dropped += len(new_parts) - len(old_parts)
+            misaligned += sum(by_class.get(c) != a for c, a in old_parts)
+        buildings_differ += old[2] != new[2]
+    entries = sum(len(r[0]) + len(r[1]) for r in structured)
+
+    print(f"{len(recipes)} recipe classes, {entries} item amounts, median of {args.repeat} passes")
+    print(f"{'parser':<12}{'ms/pass':>10}{'us/recipe':>11}")
+    for name, amounts, building in (
+        ("regex", regex_amounts, regex_building),
+        ("structured", structured_amounts, structured_building),
+    ):
+        ms = timed(lambda a=amounts, b=building: parse_all(recipes, a, b), args.repeat)
+        print(f"{name:<12}{ms:>10.2f}{ms * 1000 / len(recipes):>11.1f}")
+    print(f"regex: {dropped} amounts dropped, {misaligned} misaligned, "
+          f"{buildings_differ} buildings differ")
+
+
+if __name__ == "__main__":
+    main()
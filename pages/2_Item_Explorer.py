@@ -3,13 +3,13 @@ import os
 import streamlit as st
 from dotenv import load_dotenv
 
-from src.cache import cached_all_items, ensure_db_ready
-from src.database import get_engine, get_session
+from src.cache import cached_catalog, cached_engine, ensure_db_ready
+from src.database import get_session
 from src.queries import get_item_recipe_usage
 
 
 load_dotenv()
-engine = get_engine(os.getenv('DATABASE_URL'))
+engine = cached_engine(os.getenv('DATABASE_URL'))
 
 st.set_page_config(page_title="Item Explorer", page_icon="📦", layout="wide")
 ensure_db_ready(engine)
@@ -17,7 +17,8 @@ ensure_db_ready(engine)
 session = get_session(engine)
 
 try:
-    all_items = cached_all_items(session)
+    catalog = cached_catalog(engine)
+    all_items = catalog.items
 
     st.title("Satisfactory Item Explorer")
 
@@ -40,7 +41,7 @@ try:
     selected_label = st.selectbox("Select an item:", list(item_labels.keys()))
     if selected_label:
         selected_item_id = item_labels[selected_label]
-        selected = next(item for item in all_items if item['id'] == selected_item_id)
+        selected = catalog.items_by_id[selected_item_id]
 
         col1, col2, col3 = st.columns(3)
         with col1:
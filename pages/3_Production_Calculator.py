@@ -4,20 +4,25 @@ import plotly.graph_objects as go
 import streamlit as st
 from dotenv import load_dotenv
 
-from src.cache import cached_all_items, ensure_db_ready
-from src.database import get_engine, get_session
-from src.queries import get_all_groups, get_recipes_for_item
-from src.calculator import calculate_chain
+from src.cache import cached_catalog, cached_engine, cached_recipe_graph, ensure_db_ready
+from src.chain_cache import cached_chain
+from src.database import get_session
+from src.queries import get_all_groups
+from src.incremental import IncrementalChain
+from src.linear import solve_chain
+from src.optimizer import OBJECTIVES, optimize_chain
 from src.production import get_max_output
+from src.unit_costs import get_unit_cost
 
 
 load_dotenv()
-engine = get_engine(os.getenv('DATABASE_URL'))
+engine = cached_engine(os.getenv('DATABASE_URL'))
 
 st.set_page_config(page_title="Production Calculator", page_icon="🧮", layout="wide")
 ensure_db_ready(engine)
 
 session = get_session(engine)
+graph = cached_recipe_graph(engine)
 
 
 def collect_multi_recipe_items(node: dict, out: dict) -> None:
@@ -26,11 +31,11 @@ def collect_multi_recipe_items(node: dict, out: dict) -> None:
         return
     item_id = node['item_id']
     if item_id not in out:
-        candidates = get_recipes_for_item(session, item_id)
+        candidates = graph.recipes_for(item_id)
         if len(candidates) > 1:
             out[item_id] = {
                 "item_name": node['item_name'],
-                "candidates": [(r.id, f"{r.name} ({r.building.name})") for r in candidates],
+                "candidates": [(r.id, f"{r.name} ({r.building_name})") for r in candidates],
                 "current_id": node['recipe']['recipe_id'],
             }
     for dep in node.get('dependencies', {}).values():
@@ -105,10 +110,10 @@ def render_chain(node: dict, depth: int = 0) -> None:
 try:
     st.title("Production Calculator")
 
-    all_items = cached_all_items(session)
-    items_by_name = {item['name']: item['id'] for item in all_items}
-    items_by_id = {item['id']: item['name'] for item in all_items}
-    sorted_item_names = sorted(items_by_name.keys())
+    catalog = cached_catalog(engine)
+    items_by_name = catalog.item_ids_by_name
+    items_by_id = {item_id: item['name'] for item_id, item in catalog.items_by_id.items()}
+    sorted_item_names = list(catalog.item_names)
 
     tab_forward, tab_reverse, tab_max = st.tabs(
         ["Forward Calculator", "Reverse Calculator", "Max Output"]
@@ -135,7 +140,17 @@ try:
 
         if st.session_state.get("fwd_ran"):
             target_id = items_by_name[item_name]
-            chain = calculate_chain(session, target_id, target_rate, preferred_recipes=preferred)
+            # Keep the last chain around: switching one alternate recipe then only
+            # recomputes the subtrees under that item.
+            state = st.session_state.get("fwd_chain")
+            if (
+                state is None
+                or state.source is not graph
+                or (state.item_id, state.target_rate) != (target_id, target_rate)
+            ):
+                state = IncrementalChain(graph, target_id, target_rate, preferred)
+                st.session_state["fwd_chain"] = state
+            chain = state.update(preferred)
 
             if chain.get('is_raw_material'):
                 st.warning(f"{item_name} is a raw material - no recipe to expand.")
@@ -179,25 +194,62 @@ try:
                         if changed:
                             st.rerun()
 
+                # Let the LP optimizer pick every recipe at once.
+                o1, o2 = st.columns([3, 1])
+                with o1:
+                    objective = st.selectbox(
+                        "Optimise for:", OBJECTIVES, key="fwd_objective",
+                        format_func=lambda o: {
+                            "resources": "Fewest raw resources (scarcity-weighted)",
+                            "power": "Lowest power",
+                            "buildings": "Fewest buildings",
+                        }[o],
+                    )
+                with o2:
+                    st.write("")
+                    optimise = st.button("Optimise", key="fwd_optimise")
+                if optimise:
+                    plan = optimize_chain(graph, target_id, target_rate, objective)
+                    st.session_state["fwd_preferred_recipes"] = plan['preferred_recipes']
+                    # Drop the pickers' widget state so they follow the new choices.
+                    for key in [k for k in st.session_state if str(k).startswith("alt_pick_")]:
+                        del st.session_state[key]
+                    st.session_state["fwd_optimised"] = (
+                        f"Optimised for {objective}: {plan['objective_value']:.2f}"
+                    )
+                    st.rerun()
+                if st.session_state.get("fwd_optimised"):
+                    st.caption(st.session_state["fwd_optimised"])
+
+                # The matrix solver closes recipe loops and nets byproducts against
+                # inputs; the tree below still shows the per-path expansion.
+                totals = chain
+                if st.checkbox(
+                    "Close loops and net byproducts (matrix solver)", key="fwd_matrix"
+                ):
+                    totals = solve_chain(
+                        graph, target_id, target_rate, preferred_recipes=preferred
+                    )
+
                 st.subheader("Building Summary")
                 st.dataframe(
                     [{"building": b, "count (ideal)": round(c, 2)}
-                     for b, c in chain['building_summary'].items()],
+                     for b, c in totals['building_summary'].items()],
                     use_container_width=True,
                 )
 
                 st.subheader("Raw Materials")
                 st.dataframe(
                     [{"material": m, "rate": r}
-                     for m, r in chain['raw_materials'].items()],
+                     for m, r in totals['raw_materials'].items()],
                     use_container_width=True,
                 )
 
-                if chain['byproducts_totals']:
+                if totals['byproducts_totals']:
                     st.subheader("Byproducts")
                     st.dataframe(
                         [{"material": m, "rate": r}
-                         for m, r in chain['byproducts_totals'].items()],
+                         for m, r in totals['byproducts_totals'].items()],
                         use_container_width=True,
                     )
 
@@ -270,10 +322,10 @@ try:
 
         if st.button("Calculate", key="rev_calc") and available:
             target_id = items_by_name[target_name]
-            chain = calculate_chain(session, target_id, 1.0)
-            raw = chain['raw_materials']
+            unit_cost = get_unit_cost(session, target_id) or cached_chain(graph, target_id, 1.0)
+            raw = unit_cost['raw_materials']
 
-            if chain.get('is_raw_material'):
+            if unit_cost['is_raw_material']:
                 st.warning(f"{target_name} is a raw material.")
             elif not raw:
                 st.info("This recipe has no raw-material dependencies; output is unconstrained.")
@@ -1,5 +1,6 @@
 from .calculator import ProductionCalculator, calculate_chain, calculate_recipe_requirements
 from .database import create_tables, get_engine, get_session
+from .graph import RecipeGraph, load_recipe_graph
 from .queries import (
     get_all_buildings,
     get_all_items,
@@ -24,6 +25,7 @@ __all__ = [
     "ProductionCalculator",
     "ProductionNode",
     "RecipeDetails",
+    "RecipeGraph",
     "RecipeRequirements",
     "RecipeUsageEntry",
     "calculate_chain",
@@ -38,4 +40,5 @@ __all__ = [
     "get_recipe",
     "get_recipes_for_item",
     "get_session",
+    "load_recipe_graph",
 ]
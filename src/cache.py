@@ -1,24 +1,31 @@
 """
-Streamlit-cached wrappers around read-only queries.
+Streamlit-cached wrappers around read-only data.
 
-ETL-loaded data (items, recipes, buildings) doesn't change within a user session,
-so caching these saves noticeable work on every page rerun. The session argument
-is prefixed with `_` so Streamlit skips hashing it (SQLAlchemy sessions aren't
-hashable).
+Everything here is shared across sessions (via `st.cache_resource` or a registry
+of its own) instead of being a pickled copy per call:
+
+- the engine (otherwise a fresh connection pool on every rerun),
+- the static Catalog of items, recipes and buildings, keyed by the ETL generation
+  id so it reloads only when the ETL runs again,
+- the RecipeGraph the calculator walks (shared by `graph.load_recipe_graph`, which
+  reloads it per ETL generation itself).
+
+All three are immutable or thread-safe. Arguments prefixed with `_` are not hashed
+by Streamlit.
 """
 
 import streamlit as st
+from sqlalchemy import Engine
+
+from .catalog import Catalog
+from .database import get_etl_generation, shared_engine
+from .graph import RecipeGraph, load_recipe_graph
+
 
-from .queries import (
-    get_all_buildings as _get_all_buildings,
-)
-from .queries import (
-    get_all_items as _get_all_items,
-)
-from .queries import (
-    get_all_recipes as _get_all_recipes,
-)
-from .schemas import ItemDetails, RecipeDetails
+@st.cache_resource
+def cached_engine(database_url: str | None = None) -> Engine:
+    """The process-wide engine for `database_url` (default: DATABASE_URL)."""
+    return shared_engine(database_url)
 
 
 def ensure_db_ready(engine) -> None:
@@ -26,6 +33,7 @@ def ensure_db_ready(engine) -> None:
     Show a helpful error and halt the page if the ETL hasn't run.
 
     Call once at the top of each Streamlit page, right after creating the engine.
+    Databases built by an older ETL get any missing tables and indexes added in place.
     """
     from .database import is_etl_complete
 
@@ -37,18 +45,38 @@ def ensure_db_ready(engine) -> None:
         st.code("DATABASE_URL=sqlite:///satisfactory.db python -m src.etl", language="bash")
         st.info("Then refresh this page.")
         st.stop()
+    _upgraded_schema(engine)
 
 
-@st.cache_data(ttl=3600)
-def cached_all_items(_session) -> list[ItemDetails]:
-    return _get_all_items(_session)
+@st.cache_resource
+def _upgraded_schema(_engine) -> list[str]:
+    """Run the in-place schema upgrade once per process."""
+    from .database import upgrade_schema
 
+    return upgrade_schema(_engine)
 
-@st.cache_data(ttl=3600)
-def cached_all_recipes(_session) -> list[RecipeDetails]:
-    return _get_all_recipes(_session)
 
+def cached_catalog(engine: Engine) -> Catalog:
+    """
+    The shared Catalog for `engine`'s current ETL generation.
+
+    Costs one single-row query per call; the catalog itself is built once per
+    generation.
+    """
+    url = engine.url.render_as_string(hide_password=False)
+    return _catalog_for_generation(engine, url, get_etl_generation(engine))
 
-@st.cache_data(ttl=3600)
-def cached_all_buildings(_session) -> list[str]:
-    return _get_all_buildings(_session)
+
+@st.cache_resource(max_entries=4)
+def _catalog_for_generation(_engine: Engine, url: str, generation: str) -> Catalog:
+    return Catalog.load(_engine, generation)
+
+
+def cached_recipe_graph(engine: Engine) -> RecipeGraph:
+    """
+    The shared RecipeGraph for `engine`, reloaded when the ETL generation changes.
+
+    The graph registry already tracks the generation, so this is `load_recipe_graph`
+    under the name pages use.
+    """
+    return load_recipe_graph(engine)
@@ -1,75 +1,79 @@
 import math
+from collections import defaultdict
+from collections.abc import Iterator
+from typing import Literal, overload
 
 from sqlalchemy.orm import Session
 
-from .database import Recipe
+from .graph import RecipeGraph, RecipeSpec
 from .queries import get_item, get_recipe, get_recipes_for_item
-from .schemas import ProductionNode, RecipeRequirements, ResolvedItem
+from .schemas import (
+    ChainTotals,
+    ProductionNode,
+    RecipeRequirements,
+    RecipeTotal,
+    ResolvedItem,
+)
 
-SECONDS_PER_MINUTE = 60
 # In-game power scaling factor for clock-speed adjustments (Satisfactory wiki).
 CLOCK_POWER_EXPONENT = 1.321
+# Ideal counts within this much of an integer are treated as that integer, so float
+# noise (e.g. 3.0000000000000004 after scaling) doesn't cost an extra building.
+BUILDING_COUNT_EPSILON = 1e-9
 
 
-def _rate_per_minute(crafting_time: float, quantity: int) -> float:
-    """Items per minute produced by one building at 100% clock for this recipe."""
-    return (SECONDS_PER_MINUTE / crafting_time) * quantity
+def whole_buildings(num_ideal: float) -> int:
+    """Buildings needed to run `num_ideal` ideal buildings' worth of work (at least 1)."""
+    return max(1, math.ceil(num_ideal - BUILDING_COUNT_EPSILON))
 
 
-def _power_for(building_power: float, num_buildings: int, clock_speed: float) -> float:
+def power_for(building_power: float, num_buildings: int, clock_speed: float) -> float:
     """Total MW draw for N buildings running at clock_speed (%) using the in-game formula."""
     return building_power * num_buildings * (clock_speed / 100.0) ** CLOCK_POWER_EXPONENT
 
 
-def _compute_requirements(recipe: Recipe, item_id: int, target_rate: float) -> RecipeRequirements:
+def compute_requirements(
+    recipe: RecipeSpec, item_id: int, target_rate: float
+) -> RecipeRequirements:
     """
     Builds a RecipeRequirements for `recipe` producing `item_id` at `target_rate`/min.
 
     Rounds up to whole buildings and computes the clock speed needed so that the
     rounded building count hits the target rate exactly.
     """
-    output_ingredient = next(
-        (i for i in recipe.ingredients if i.is_output and i.item_id == item_id),
-        None,
-    )
-    if output_ingredient is None:
+    output_flow = next((f for f in recipe.outputs if f.item_id == item_id), None)
+    if output_flow is None:
         raise ValueError(f"Recipe {recipe.id} does not output item {item_id}")
 
-    per_building_rate = _rate_per_minute(recipe.crafting_time, output_ingredient.quantity)
-    num_ideal = target_rate / per_building_rate
-    num_rounded = max(1, math.ceil(num_ideal))
+    num_ideal = target_rate / output_flow.rate
+    num_rounded = whole_buildings(num_ideal)
     clock_speed = 100.0 * num_ideal / num_rounded
 
-    building_power = recipe.building.power_mw or 0.0
-    total_power = _power_for(building_power, num_rounded, clock_speed)
-
-    inputs: list[ResolvedItem] = []
-    byproducts: list[ResolvedItem] = []
-    for ing in recipe.ingredients:
-        # rate scales with ideal buildings (not rounded) because we clock-adjust
-        rate = _rate_per_minute(recipe.crafting_time, ing.quantity) * num_ideal
-        entry: ResolvedItem = {
-            "item_id": ing.item_id,
-            "item_name": ing.item.name,
-            "rate": rate,
-        }
-        if ing.is_output:
-            if ing.item_id != item_id:
-                byproducts.append(entry)
-        else:
-            inputs.append(entry)
+    building_power = recipe.building_power_mw
+    total_power = power_for(building_power, num_rounded, clock_speed)
+
+    # rates scale with ideal buildings (not rounded) because we clock-adjust
+    inputs: list[ResolvedItem] = [
+        {"item_id": f.item_id, "item_name": f.item_name, "rate": f.rate * num_ideal}
+        for f in recipe.inputs
+    ]
+    byproducts: list[ResolvedItem] = [
+        {"item_id": f.item_id, "item_name": f.item_name, "rate": f.rate * num_ideal}
+        for f in recipe.outputs
+        if f.item_id != item_id
+    ]
 
     output: ResolvedItem = {
         "item_id": item_id,
-        "item_name": output_ingredient.item.name,
+        "item_name": output_flow.item_name,
         "rate": target_rate,
     }
 
     return {
         "recipe_id": recipe.id,
         "recipe_name": recipe.name,
-        "building_id": recipe.building.id,
-        "building_name": recipe.building.name,
+        "building_id": recipe.building_id,
+        "building_name": recipe.building_name,
         "num_buildings_ideal": num_ideal,
         "num_buildings_rounded": num_rounded,
         "clock_speed": clock_speed,
@@ -81,12 +85,42 @@ def _compute_requirements(recipe: Recipe, item_id: int, target_rate: float) -> R
     }
 
 
-def _merge_sum(dst: dict[str, float], src: dict[str, float]) -> None:
+def merge_sum(dst: dict[str, float], src: dict[str, float]) -> None:
+    """Add each of `src`'s rates into `dst`, key by key."""
     for k, v in src.items():
         dst[k] = dst.get(k, 0.0) + v
 
 
-def _raw_node(item_id: int, item_name: str, target_rate: float) -> ProductionNode:
+def _item_name(source: Session | RecipeGraph, item_id: int) -> str:
+    if isinstance(source, RecipeGraph):
+        return source.item_name(item_id)
+    item = get_item(source, item_id)
+    return item.name if item else f"item_{item_id}"
+
+
+def _choose_recipe(
+    source: Session | RecipeGraph,
+    item_id: int,
+    preferred_recipes: dict[int, int] | None,
+) -> RecipeSpec | None:
+    """
+    The recipe used to make `item_id`: the preferred one if it produces the item,
+    otherwise the first candidate. None means the item is a raw material.
+    """
+    chosen_id = (preferred_recipes or {}).get(item_id)
+    if isinstance(source, RecipeGraph):
+        specs = source.recipes_for(item_id)
+        if not specs:
+            return None
+        return next((r for r in specs if r.id == chosen_id), specs[0])
+
+    recipes = get_recipes_for_item(source, item_id)
+    if not recipes:
+        return None
+    return RecipeSpec.from_orm(next((r for r in recipes if r.id == chosen_id), recipes[0]))
+
+
+def raw_node(item_id: int, item_name: str, target_rate: float) -> ProductionNode:
     """Terminal node for a raw material: contributes to raw_materials, no buildings/power."""
     return {
         "item_id": item_id,
@@ -100,98 +134,387 @@ def _raw_node(item_id: int, item_name: str, target_rate: float) -> ProductionNod
     }
 
 
+class ChainResolver:
+    """
+    Per-call recipe lookup shared by the chain walkers.
+
+    Each distinct item gets a dense slot the first time the walk reaches it; its
+    recipe, display name and per-building flows are resolved then and reused for
+    every later occurrence in the tree. `raw_rates` is the per-slot accumulation
+    buffer for raw-material demand, grown alongside the slots.
+    """
+
+    __slots__ = (
+        "_source",
+        "_preferred",
+        "_slots",
+        "item_ids",
+        "names",
+        "recipes",
+        "output_rates",
+        "inputs",
+        "byproducts",
+        "raw_rates",
+    )
+
+    def __init__(
+        self,
+        source: Session | RecipeGraph,
+        preferred_recipes: dict[int, int] | None,
+    ) -> None:
+        self._source = source
+        self._preferred = preferred_recipes
+        self._slots: dict[int, int] = {}
+        self.item_ids: list[int] = []
+        self.names: list[str] = []
+        self.recipes: list[RecipeSpec | None] = []
+        self.output_rates: list[float] = []
+        self.inputs: list[tuple[tuple[int, float], ...]] = []
+        self.byproducts: list[tuple[tuple[str, float], ...]] = []
+        self.raw_rates: list[float] = []
+
+    def slot(self, item_id: int) -> int:
+        slot = self._slots.get(item_id)
+        if slot is not None:
+            return slot
+        slot = self._slots[item_id] = len(self.item_ids)
+        recipe = _choose_recipe(self._source, item_id, self._preferred)
+        self.item_ids.append(item_id)
+        self.recipes.append(recipe)
+        self.raw_rates.append(0.0)
+        if recipe is None:
+            self.names.append(_item_name(self._source, item_id))
+            self.output_rates.append(0.0)
+            self.inputs.append(())
+            self.byproducts.append(())
+            return slot
+        output = next((f for f in recipe.outputs if f.item_id == item_id), None)
+        if output is None:
+            raise ValueError(f"Recipe {recipe.id} does not output item {item_id}")
+        self.names.append(output.item_name)
+        self.output_rates.append(output.rate)
+        self.inputs.append(tuple((f.item_id, f.rate) for f in recipe.inputs))
+        self.byproducts.append(
+            tuple((f.item_name, f.rate) for f in recipe.outputs if f.item_id != item_id)
+        )
+        return slot
+
+
+@overload
 def calculate_chain(
-    session: Session,
+    session: Session | RecipeGraph,
     item_id: int,
     target_rate: float,
     *,
     preferred_recipes: dict[int, int] | None = None,
-    _visited: frozenset[int] | None = None,
-) -> ProductionNode:
+    aggregate: Literal[False] = False,
+    tree: bool = True,
+) -> ProductionNode: ...
+
+
+@overload
+def calculate_chain(
+    session: Session | RecipeGraph,
+    item_id: int,
+    target_rate: float,
+    *,
+    preferred_recipes: dict[int, int] | None = None,
+    aggregate: Literal[True],
+    tree: bool = True,
+) -> ChainTotals: ...
+
+
+def calculate_chain(
+    session: Session | RecipeGraph,
+    item_id: int,
+    target_rate: float,
+    *,
+    preferred_recipes: dict[int, int] | None = None,
+    aggregate: bool = False,
+    tree: bool = True,
+) -> ProductionNode | ChainTotals:
     """
     Pure-functional production chain calculator.
 
     Returns a ProductionNode whose raw_materials/byproducts_totals/building_summary/
     power_mw_total fields are the sums for that node's subtree only. Intermediate
     nodes therefore carry correct per-subtree totals, not a shared accumulator.
+    An item that reappears on its own path (a recipe cycle) is cut as raw.
+
+    The walk uses an explicit stack, so chain depth is not bounded by Python's
+    recursion limit. With `tree=False` no nested nodes are built at all: totals are
+    accumulated directly and only the root node (with its `recipe`, without
+    `dependencies`) is returned. Use it when only the chain's totals are needed.
+
+    With `aggregate=True` the recipe graph is walked as a DAG instead: each item is
+    visited once and its demand summed over all consumers, and a flat ChainTotals is
+    returned. The tree view (default) is what `render_chain` and the Sankey diagram
+    consume.
 
     Args:
-        session: Active SQLAlchemy Session.
+        session: Active SQLAlchemy Session, or a RecipeGraph snapshot. With a
+            RecipeGraph no SQL is issued at all.
         item_id: Item to produce.
         target_rate: Desired output rate in items/min.
         preferred_recipes: Optional map of {item_id: recipe_id} to force a specific
             recipe when multiple produce the same item.
-        _visited: Internal cycle-detection set. Do not pass explicitly.
+        aggregate: Return aggregated ChainTotals instead of a nested ProductionNode.
+        tree: Build the nested `dependencies` tree (default). Totals are identical
+            either way.
 
     Returns:
-        A ProductionNode for the requested item.
+        A ProductionNode for the requested item, or ChainTotals if `aggregate`.
     """
-    visited: frozenset[int] = _visited if _visited is not None else frozenset()
+    if aggregate:
+        return _aggregate_chain(session, item_id, target_rate, preferred_recipes)
 
-    if item_id in visited:
-        # Cycle - terminate as raw to prevent infinite recursion.
-        fallback = get_item(session, item_id)
-        return _raw_node(item_id, fallback.name if fallback else f"item_{item_id}", target_rate)
+    resolver = ChainResolver(session, preferred_recipes)
+    root = resolver.slot(item_id)
+    if tree:
+        return walk_tree(resolver, root, target_rate)
+    return _walk_totals(resolver, root, target_rate)
 
-    recipes = get_recipes_for_item(session, item_id)
-    if not recipes:
-        item = get_item(session, item_id)
-        item_name = item.name if item else f"item_{item_id}"
-        return _raw_node(item_id, item_name, target_rate)
 
-    chosen_id = (preferred_recipes or {}).get(item_id)
-    recipe = next((r for r in recipes if r.id == chosen_id), recipes[0])
+def walk_tree(
+    resolver: ChainResolver, root: int, target_rate: float, path: int = 0
+) -> ProductionNode:
+    """
+    Build the nested chain depth-first with an explicit stack.
 
-    requirements = _compute_requirements(recipe, item_id, target_rate)
+    Each open frame is (node, iterator over its inputs, path bitmask including the
+    node). A child's totals are merged into its parent as soon as the child's own
+    subtree is complete, in input order - the same order a recursive walk would use.
+    `path` seeds the bitmask with the root's ancestors when rebuilding a subtree.
+    """
 
-    dependencies: dict[str, ProductionNode] = {}
-    raw_materials: dict[str, float] = {}
-    byproducts_totals: dict[str, float] = {
-        bp["item_name"]: bp["rate"] for bp in requirements["byproducts"]
-    }
-    building_summary: dict[str, float] = {
-        requirements["building_name"]: requirements["num_buildings_ideal"]
-    }
-    power_total: float = requirements["total_power_mw"]
-
-    next_visited = visited | {item_id}
-    for inp in requirements["inputs"]:
-        dep = calculate_chain(
-            session,
-            inp["item_id"],
-            inp["rate"],
-            preferred_recipes=preferred_recipes,
-            _visited=next_visited,
+    def enter(
+        slot: int, rate: float, path: int
+    ) -> tuple[ProductionNode, tuple[ProductionNode, Iterator[ResolvedItem], int] | None]:
+        recipe = resolver.recipes[slot]
+        bit = 1 << slot
+        if recipe is None or path & bit:
+            return raw_node(resolver.item_ids[slot], resolver.names[slot], rate), None
+        requirements = compute_requirements(recipe, resolver.item_ids[slot], rate)
+        node: ProductionNode = {
+            "item_id": resolver.item_ids[slot],
+            "item_name": requirements["output"]["item_name"],
+            "required_rate": rate,
+            "is_raw_material": False,
+            "recipe": requirements,
+            "dependencies": {},
+            "raw_materials": {},
+            "byproducts_totals": {bp["item_name"]: bp["rate"] for bp in requirements["byproducts"]},
+            "building_summary": {
+                requirements["building_name"]: requirements["num_buildings_ideal"]
+            },
+            "power_mw_total": requirements["total_power_mw"],
+        }
+        return node, (node, iter(requirements["inputs"]), path | bit)
+
+    def merge(parent: ProductionNode, child: ProductionNode) -> None:
+        merge_sum(parent["raw_materials"], child["raw_materials"])
+        merge_sum(parent["byproducts_totals"], child["byproducts_totals"])
+        merge_sum(parent["building_summary"], child["building_summary"])
+        parent["power_mw_total"] += child["power_mw_total"]
+
+    node, frame = enter(root, target_rate, path)
+    if frame is None:
+        return node
+    stack = [frame]
+    while stack:
+        parent, inputs, path = stack[-1]
+        inp = next(inputs, None)
+        if inp is None:
+            stack.pop()
+            if stack:
+                merge(stack[-1][0], parent)
+            continue
+        child, child_frame = enter(resolver.slot(inp["item_id"]), inp["rate"], path)
+        parent["dependencies"][inp["item_name"]] = child
+        if child_frame is None:
+            merge(parent, child)
+        else:
+            stack.append(child_frame)
+    return node
+
+
+def _walk_totals(resolver: ChainResolver, root: int, target_rate: float) -> ProductionNode:
+    """
+    Accumulate a chain's totals without materializing its tree.
+
+    Visits exactly the nodes `walk_tree` would, in the same order, but each visit
+    only adds into flat buffers: raw demand per item slot, byproducts and ideal
+    buildings per name, and power.
+    """
+    root_recipe = resolver.recipes[root]
+    if root_recipe is None:
+        return raw_node(resolver.item_ids[root], resolver.names[root], target_rate)
+
+    raw_rates = resolver.raw_rates
+    raw_order: dict[int, None] = {}
+    byproducts_totals: dict[str, float] = defaultdict(float)
+    building_summary: dict[str, float] = defaultdict(float)
+    power_total = 0.0
+
+    stack = [(root, target_rate, 0)]
+    while stack:
+        slot, rate, path = stack.pop()
+        bit = 1 << slot
+        recipe = resolver.recipes[slot]
+        if recipe is None or path & bit:
+            raw_rates[slot] += rate
+            raw_order[slot] = None
+            continue
+        num_ideal = rate / resolver.output_rates[slot]
+        num_rounded = whole_buildings(num_ideal)
+        power_total += power_for(
+            recipe.building_power_mw, num_rounded, 100.0 * num_ideal / num_rounded
         )
-        dependencies[inp["item_name"]] = dep
-        _merge_sum(raw_materials, dep["raw_materials"])
-        _merge_sum(byproducts_totals, dep["byproducts_totals"])
-        _merge_sum(building_summary, dep["building_summary"])
-        power_total += dep["power_mw_total"]
+        building_summary[recipe.building_name] += num_ideal
+        for name, per_building in resolver.byproducts[slot]:
+            byproducts_totals[name] += per_building * num_ideal
+        path |= bit
+        for child_id, per_building in reversed(resolver.inputs[slot]):
+            stack.append((resolver.slot(child_id), per_building * num_ideal, path))
 
     return {
-        "item_id": item_id,
-        "item_name": requirements["output"]["item_name"],
+        "item_id": resolver.item_ids[root],
+        "item_name": resolver.names[root],
         "required_rate": target_rate,
         "is_raw_material": False,
-        "recipe": requirements,
-        "dependencies": dependencies,
-        "raw_materials": raw_materials,
-        "byproducts_totals": byproducts_totals,
-        "building_summary": building_summary,
+        "recipe": compute_requirements(root_recipe, resolver.item_ids[root], target_rate),
+        "raw_materials": {resolver.names[slot]: raw_rates[slot] for slot in raw_order},
+        "byproducts_totals": dict(byproducts_totals),
+        "building_summary": dict(building_summary),
         "power_mw_total": power_total,
     }
 
 
+def _aggregate_chain(
+    source: Session | RecipeGraph,
+    item_id: int,
+    target_rate: float,
+    preferred_recipes: dict[int, int] | None,
+) -> ChainTotals:
+    """
+    DAG engine behind `calculate_chain(..., aggregate=True)`.
+
+    A depth-first pass resolves each reachable item's recipe exactly once and
+    records edges that close a cycle. Demand is then pushed down in topological
+    order, so an item shared by several consumers is expanded once with their
+    summed demand. A cycle-closing edge is treated as raw supply of the repeated
+    item, mirroring the tree calculator's visited-set cut.
+    """
+    recipes: dict[int, RecipeSpec | None] = {}
+    preorder: list[int] = []
+    postorder: list[int] = []
+    back_edges: set[tuple[int, int]] = set()
+
+    def resolve(iid: int) -> tuple[int, ...]:
+        recipe = _choose_recipe(source, iid, preferred_recipes)
+        recipes[iid] = recipe
+        preorder.append(iid)
+        return tuple(f.item_id for f in recipe.inputs) if recipe else ()
+
+    on_stack = {item_id}
+    stack = [(item_id, iter(resolve(item_id)))]
+    while stack:
+        iid, children = stack[-1]
+        for child in children:
+            if child in on_stack:
+                back_edges.add((iid, child))
+            elif child not in recipes:
+                on_stack.add(child)
+                stack.append((child, iter(resolve(child))))
+                break
+        else:
+            stack.pop()
+            on_stack.discard(iid)
+            postorder.append(iid)
+
+    topo = postorder[::-1]
+    depth = dict.fromkeys(topo, 0)
+    demand: dict[int, float] = defaultdict(float)
+    demand[item_id] = target_rate
+    cut_demand: dict[int, float] = defaultdict(float)
+    names: dict[int, str] = {}
+    raw_materials: dict[str, float] = defaultdict(float)
+    byproducts_totals: dict[str, float] = defaultdict(float)
+    building_summary: dict[str, float] = defaultdict(float)
+    recipe_ideal: dict[int, float] = defaultdict(float)
+    recipe_depth: dict[int, int] = {}
+
+    for iid in topo:
+        recipe = recipes[iid]
+        if recipe is None:
+            names[iid] = _item_name(source, iid)
+            raw_materials[names[iid]] += demand[iid]
+            continue
+        output = next(f for f in recipe.outputs if f.item_id == iid)
+        names[iid] = output.item_name
+        num_ideal = demand[iid] / output.rate
+        recipe_ideal[recipe.id] += num_ideal
+        recipe_depth[recipe.id] = max(recipe_depth.get(recipe.id, 0), depth[iid])
+        building_summary[recipe.building_name] += num_ideal
+        for f in recipe.inputs:
+            if (iid, f.item_id) in back_edges:
+                raw_materials[f.item_name] += f.rate * num_ideal
+                cut_demand[f.item_id] += f.rate * num_ideal
+            else:
+                demand[f.item_id] += f.rate * num_ideal
+                depth[f.item_id] = max(depth[f.item_id], depth[iid] + 1)
+        for f in recipe.outputs:
+            if f.item_id != iid:
+                byproducts_totals[f.item_name] += f.rate * num_ideal
+
+    recipe_totals: list[RecipeTotal] = []
+    for iid in preorder:
+        recipe = recipes[iid]
+        if recipe is None or recipe.id not in recipe_ideal:
+            continue
+        num_ideal = recipe_ideal.pop(recipe.id)
+        num_rounded = whole_buildings(num_ideal)
+        clock_speed = 100.0 * num_ideal / num_rounded
+        recipe_totals.append({
+            "recipe_id": recipe.id,
+            "recipe_name": recipe.name,
+            "building_name": recipe.building_name,
+            "num_buildings_ideal": num_ideal,
+            "num_buildings_rounded": num_rounded,
+            "clock_speed": clock_speed,
+            "total_power_mw": power_for(recipe.building_power_mw, num_rounded, clock_speed),
+            "depth": recipe_depth[recipe.id],
+        })
+    recipe_totals.sort(key=lambda r: -r["depth"])
+
+    return {
+        "item_id": item_id,
+        "item_name": names[item_id],
+        "required_rate": target_rate,
+        "is_raw_material": recipes[item_id] is None,
+        "item_rates": {names[iid]: demand[iid] + cut_demand[iid] for iid in topo},
+        "recipe_totals": recipe_totals,
+        "raw_materials": dict(raw_materials),
+        "byproducts_totals": dict(byproducts_totals),
+        "building_summary": dict(building_summary),
+        "power_mw_total": sum(r["total_power_mw"] for r in recipe_totals),
+    }
+
+
 class ProductionCalculator:
     """
     Thin backwards-compatible wrapper around `calculate_chain`.
 
     Kept so existing callers keep working. New code should call `calculate_chain`
-    directly - it's pure-functional and easier to test.
+    directly - it's pure-functional and easier to test. `session` may also be a
+    RecipeGraph, in which case calculations run without touching the database.
     """
 
-    def __init__(self, session: Session, preferred_recipes: dict[int, int] | None = None):
+    def __init__(
+        self,
+        session: Session | RecipeGraph,
+        preferred_recipes: dict[int, int] | None = None,
+    ):
         self.session = session
         self.preferred_recipes = preferred_recipes or {}
 
@@ -208,4 +531,4 @@ def calculate_recipe_requirements(
     recipe = get_recipe(session, recipe_id)
     if recipe is None:
         raise ValueError(f"Recipe {recipe_id} not found")
-    return _compute_requirements(recipe, item_id, target_rate)
+    return compute_requirements(RecipeSpec.from_orm(recipe), item_id, target_rate)
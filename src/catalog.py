@@ -0,0 +1,132 @@
+"""
+Immutable snapshot of the static ETL catalog for the UI.
+
+Items, recipes and buildings only change when the ETL runs, so pages share one
+`Catalog` per ETL generation instead of re-querying (or unpickling `st.cache_data`
+copies of) the same lists on every rerun. Lookups by name and id and the
+producer/consumer indexes are built once with it.
+
+The collections are tuples and read-only mappings; the item and recipe dicts inside
+them are shared by every session, so treat them as read-only too.
+"""
+
+from collections.abc import Mapping
+from types import MappingProxyType
+
+from sqlalchemy import Engine, select
+from sqlalchemy.orm import Session
+
+from .database import RecipeIngredient
+from .queries import get_all_buildings, get_all_items, get_all_recipes
+from .schemas import ItemDetails, RecipeDetails
+
+
+class Catalog:
+    """Items, recipes, buildings and their indexes for one ETL generation."""
+
+    __slots__ = (
+        "generation",
+        "items",
+        "recipes",
+        "buildings",
+        "item_names",
+        "items_by_id",
+        "item_ids_by_name",
+        "recipes_by_id",
+        "producers",
+        "consumers",
+    )
+
+    generation: str
+    items: tuple[ItemDetails, ...]
+    recipes: tuple[RecipeDetails, ...]
+    buildings: tuple[str, ...]
+    item_names: tuple[str, ...]                    # sorted, for pickers
+    items_by_id: Mapping[int, ItemDetails]
+    item_ids_by_name: Mapping[str, int]
+    recipes_by_id: Mapping[int, RecipeDetails]
+    producers: Mapping[int, tuple[int, ...]]       # item_id -> ids of recipes outputting it
+    consumers: Mapping[int, tuple[int, ...]]       # item_id -> ids of recipes consuming it
+
+    def __init__(
+        self,
+        generation: str,
+        items: list[ItemDetails],
+        recipes: list[RecipeDetails],
+        buildings: list[str],
+        ingredients: list[tuple[int, int, bool]],
+    ) -> None:
+        """
+        Args:
+            generation: ETL generation id the data was read at.
+            items, recipes, buildings: As returned by the get_all_* queries.
+            ingredients: (recipe_id, item_id, is_output) rows for the indexes.
+        """
+        known = {recipe["id"] for recipe in recipes}
+        producers: dict[int, list[int]] = {}
+        consumers: dict[int, list[int]] = {}
+        for recipe_id, item_id, is_output in sorted(ingredients):
+            if recipe_id not in known:
+                continue
+            index = producers if is_output else consumers
+            recipe_ids = index.setdefault(item_id, [])
+            if recipe_id not in recipe_ids:
+                recipe_ids.append(recipe_id)
+
+        set_ = object.__setattr__
+        set_(self, "generation", generation)
+        set_(self, "items", tuple(items))
+        set_(self, "recipes", tuple(recipes))
+        set_(self, "buildings", tuple(buildings))
+        set_(self, "item_names", tuple(sorted({item["name"] for item in items})))
+        set_(self, "items_by_id", MappingProxyType({item["id"]: item for item in items}))
+        set_(self, "item_ids_by_name",
+             MappingProxyType({item["name"]: item["id"] for item in items}))
+        set_(self, "recipes_by_id", MappingProxyType({r["id"]: r for r in recipes}))
+        set_(self, "producers",
+             MappingProxyType({k: tuple(v) for k, v in producers.items()}))
+        set_(self, "consumers",
+             MappingProxyType({k: tuple(v) for k, v in consumers.items()}))
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError("Catalog is immutable")
+
+    def __repr__(self) -> str:
+        return (
+            f"Catalog(generation={self.generation!r}, items={len(self.items)}, "
+            f"recipes={len(self.recipes)}, buildings={len(self.buildings)})"
+        )
+
+    @classmethod
+    def from_session(cls, session: Session, generation: str) -> "Catalog":
+        """Read the catalog in a fixed number of statements (see the get_all_* queries)."""
+        ingredients = [
+            (recipe_id, item_id, bool(is_output))
+            for recipe_id, item_id, is_output in session.execute(
+                select(
+                    RecipeIngredient.recipe_id,
+                    RecipeIngredient.item_id,
+                    RecipeIngredient.is_output,
+                )
+            ).all()
+        ]
+        return cls(
+            generation,
+            get_all_items(session),
+            get_all_recipes(session),
+            get_all_buildings(session),
+            ingredients,
+        )
+
+    @classmethod
+    def load(cls, engine: Engine, generation: str) -> "Catalog":
+        with Session(engine) as session:
+            return cls.from_session(session, generation)
+
+    def producers_of(self, item_id: int) -> list[RecipeDetails]:
+        """Recipes that output an item, in id order (the first is the default)."""
+        return [self.recipes_by_id[r] for r in self.producers.get(item_id, ())]
+
+    def consumers_of(self, item_id: int) -> list[RecipeDetails]:
+        """Recipes that take an item as an input, in id order."""
+        return [self.recipes_by_id[r] for r in self.consumers.get(item_id, ())]
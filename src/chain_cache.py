@@ -0,0 +1,122 @@
+"""
+LRU cache of unit-rate production-chain templates.
+
+A chain's shape - which recipe makes each item, where cycles are cut - does not
+depend on the target rate. So each chain is resolved once at 1 item/min into a
+`CompactChain` (a few KiB even for the largest trees), cached, and every later
+request for the same item just expands that template at the requested rate:
+O(nodes) arithmetic, no recipe lookups and no SQL.
+
+Templates are keyed by (item_id, frozen preferred_recipes, catalog version), so a
+re-ETL that produces a new RecipeGraph can never be served a stale chain.
+"""
+
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import NamedTuple
+
+from sqlalchemy.orm import Session
+
+from .compact import CompactChain, compact_chain
+from .graph import RecipeGraph, as_recipe_graph
+from .schemas import ProductionNode
+
+DEFAULT_MAXSIZE = 512
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class ChainTemplateCache:
+    """Bounded, thread-safe LRU of unit-rate chain templates."""
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self._templates: OrderedDict[Hashable, CompactChain] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(
+        graph: RecipeGraph,
+        item_id: int,
+        preferred_recipes: dict[int, int] | None = None,
+    ) -> Hashable:
+        return (item_id, frozenset((preferred_recipes or {}).items()), graph.version)
+
+    def template(
+        self,
+        graph: RecipeGraph,
+        item_id: int,
+        preferred_recipes: dict[int, int] | None = None,
+    ) -> CompactChain:
+        """
+        The cached compact chain for `item_id` at 1 item/min. Use `get` for the
+        expanded ProductionNode at a given rate.
+        """
+        key = self.key(graph, item_id, preferred_recipes)
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+                self.hits += 1
+                return template
+            self.misses += 1
+
+        # Computed outside the lock: RecipeGraph is immutable, and two threads racing
+        # on the same key just produce identical templates.
+        template = compact_chain(graph, item_id, 1.0, preferred_recipes=preferred_recipes)
+        with self._lock:
+            self._templates[key] = template
+            self._templates.move_to_end(key)
+            while len(self._templates) > self.maxsize:
+                self._templates.popitem(last=False)
+        return template
+
+    def get(
+        self,
+        graph: RecipeGraph,
+        item_id: int,
+        target_rate: float,
+        preferred_recipes: dict[int, int] | None = None,
+    ) -> ProductionNode:
+        """Same result as `calculate_chain(graph, item_id, target_rate, ...)`; a private copy."""
+        return self.template(graph, item_id, preferred_recipes).scaled(target_rate).to_dict()
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._templates))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._templates.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Process-wide default instance used by the dashboard and calculator pages.
+chain_templates = ChainTemplateCache()
+
+
+def cached_chain(
+    source: Session | RecipeGraph,
+    item_id: int,
+    target_rate: float,
+    *,
+    preferred_recipes: dict[int, int] | None = None,
+) -> ProductionNode:
+    """
+    Drop-in replacement for `calculate_chain` backed by the shared template cache.
+
+    A Session is resolved to its engine's shared RecipeGraph.
+    """
+    return chain_templates.get(as_recipe_graph(source), item_id, target_rate, preferred_recipes)
+
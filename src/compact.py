@@ -0,0 +1,394 @@
+"""
+Compact, array-backed production chains.
+
+A ProductionNode tree repeats every shared intermediate once per path and gives each
+node its own name-keyed totals dicts. `CompactChain` stores the same chain as a DAG
+of unit-rate subtree templates in flat arrays keyed by item and recipe ids:
+
+- a template is one (item, recipe) expansion at 1 item/min; identical subtrees
+  anywhere in the chain - at any proportional rate - are one template,
+- templates are stored in postorder (children first) and their children CSR-style:
+  `child_start` offsets into `child_template` and `child_rate`, the latter holding
+  each input's per-building rate,
+- a chain is just (shared store, root template, rate), so `scaled()` is O(1).
+
+Two occurrences of an item share a template when the same ancestors of theirs can
+be reached from the item: those are the only ancestors that can cause a cycle cut
+inside the subtree, so both expansions are identical.
+
+`to_dict()` expands back to the nested ProductionNode that `calculate_chain` returns,
+so `render_chain` and `chain_to_sankey` keep working; `recipe_loads()` gives the
+per-recipe building counts Factory rows are built from without expanding it.
+"""
+
+from array import array
+from collections import defaultdict
+from typing import NamedTuple
+
+from sqlalchemy.orm import Session
+
+from .calculator import (
+    ChainResolver,
+    compute_requirements,
+    merge_sum,
+    power_for,
+    raw_node,
+    whole_buildings,
+)
+from .graph import RecipeGraph, as_recipe_graph
+from .schemas import ProductionNode
+
+NO_RECIPE = -1
+
+
+class CompactTotals(NamedTuple):
+    """Whole-chain totals keyed by id rather than display name."""
+    raw_materials: dict[int, float]      # item_id -> items/min
+    byproducts: dict[int, float]         # item_id -> items/min
+    building_summary: dict[int, float]   # building_id -> ideal building count
+    power_mw_total: float
+
+
+class _ChainStore:
+    """Struct-of-arrays template DAG shared by a chain and all of its scaled copies."""
+
+    __slots__ = (
+        "graph",
+        "item_id",
+        "recipe_id",
+        "name",
+        "output_rate",
+        "child_start",
+        "child_template",
+        "child_rate",
+        "_unit_totals",
+        "_unit_recipe_loads",
+    )
+
+    def __init__(self, graph: RecipeGraph) -> None:
+        self.graph = graph
+        self.item_id = array("q")
+        self.recipe_id = array("q")
+        self.name: list[str] = []
+        self.output_rate = array("d")          # per building; 0 for raw templates
+        self.child_start = array("q", [0])
+        self.child_template = array("q")
+        self.child_rate = array("d")           # input's per-building rate
+        self._unit_totals: list[tuple[dict[int, float], dict[int, float], dict[int, float]]] = []
+        self._unit_recipe_loads: list[dict[int, tuple[float, int]]] = []
+
+    def __len__(self) -> int:
+        return len(self.item_id)
+
+    def children(self, template: int) -> range:
+        return range(self.child_start[template], self.child_start[template + 1])
+
+    def unit_totals(self) -> list[tuple[dict[int, float], dict[int, float], dict[int, float]]]:
+        """
+        (raw, byproducts, buildings) per template at 1 item/min, built bottom-up once.
+
+        Templates are stored in postorder, so a forward sweep sees every child before
+        its parents.
+        """
+        if self._unit_totals:
+            return self._unit_totals
+        totals: list = [None] * len(self)
+        for t in range(len(self)):
+            raw: dict[int, float] = defaultdict(float)
+            byproducts: dict[int, float] = defaultdict(float)
+            buildings: dict[int, float] = defaultdict(float)
+            if self.recipe_id[t] == NO_RECIPE:
+                raw[self.item_id[t]] = 1.0
+            else:
+                recipe = self.graph.recipe(self.recipe_id[t])
+                assert recipe is not None
+                num_ideal = 1.0 / self.output_rate[t]
+                buildings[recipe.building_id] += num_ideal
+                for f in recipe.outputs:
+                    if f.item_id != self.item_id[t]:
+                        byproducts[f.item_id] += f.rate * num_ideal
+                for k in self.children(t):
+                    scale = self.child_rate[k] * num_ideal
+                    child_raw, child_byproducts, child_buildings = totals[self.child_template[k]]
+                    for dst, src in ((raw, child_raw), (byproducts, child_byproducts),
+                                     (buildings, child_buildings)):
+                        for key, value in src.items():
+                            dst[key] += value * scale
+            totals[t] = (dict(raw), dict(byproducts), dict(buildings))
+        self._unit_totals = totals
+        return totals
+
+    def unit_recipe_loads(self) -> list[dict[int, tuple[float, int]]]:
+        """
+        recipe_id -> (ideal buildings at 1 item/min, deepest tree depth) per template,
+        built bottom-up once. Keys are in preorder of first occurrence, as a
+        depth-first walk of the expanded tree would meet them.
+        """
+        if self._unit_recipe_loads:
+            return self._unit_recipe_loads
+        loads: list[dict[int, tuple[float, int]]] = []
+        for t in range(len(self)):
+            recipe_id = self.recipe_id[t]
+            if recipe_id == NO_RECIPE:
+                loads.append({})
+                continue
+            num_ideal = 1.0 / self.output_rate[t]
+            own: dict[int, tuple[float, int]] = {recipe_id: (num_ideal, 0)}
+            for k in self.children(t):
+                scale = self.child_rate[k] * num_ideal
+                for rid, (load, depth) in loads[self.child_template[k]].items():
+                    total, deepest = own.get(rid, (0.0, 0))
+                    own[rid] = (total + load * scale, max(deepest, depth + 1))
+            loads.append(own)
+        self._unit_recipe_loads = loads
+        return loads
+
+
+class CompactChain:
+    """
+    A production chain as (shared template store, root template, rate).
+
+    Treat instances as immutable; `scaled` returns a new chain over the same store.
+    """
+
+    __slots__ = ("_store", "_root", "required_rate")
+
+    def __init__(self, store: _ChainStore, root: int, required_rate: float) -> None:
+        self._store = store
+        self._root = root
+        self.required_rate = required_rate
+
+    def __repr__(self) -> str:
+        return (
+            f"CompactChain(item_id={self.item_id}, rate={self.required_rate}, "
+            f"templates={self.template_count}, nodes={self.node_count})"
+        )
+
+    @property
+    def item_id(self) -> int:
+        return self._store.item_id[self._root]
+
+    @property
+    def is_raw_material(self) -> bool:
+        return self._store.recipe_id[self._root] == NO_RECIPE
+
+    @property
+    def template_count(self) -> int:
+        """Distinct subtrees stored."""
+        return len(self._store)
+
+    @property
+    def node_count(self) -> int:
+        """Nodes in the equivalent ProductionNode tree."""
+        store = self._store
+        counts = array("q", bytes(8 * len(store)))
+        for t in range(len(store)):
+            counts[t] = 1 + sum(counts[store.child_template[k]] for k in store.children(t))
+        return counts[self._root]
+
+    def scaled(self, factor: float) -> "CompactChain":
+        """The same chain at `factor` times the rate. O(1); shares all storage."""
+        return CompactChain(self._store, self._root, self.required_rate * factor)
+
+    def totals(self) -> CompactTotals:
+        """
+        Whole-chain totals. Raw materials, byproducts and buildings scale the shared
+        unit-rate template totals; power is summed over the expanded tree because
+        rounding each node up to whole buildings is not linear.
+        """
+        store = self._store
+        raw, byproducts, buildings = store.unit_totals()[self._root]
+        rate = self.required_rate
+        power = 0.0
+        stack = [(self._root, rate)]
+        while stack:
+            t, node_rate = stack.pop()
+            if store.recipe_id[t] == NO_RECIPE:
+                continue
+            recipe = store.graph.recipe(store.recipe_id[t])
+            assert recipe is not None
+            num_ideal = node_rate / store.output_rate[t]
+            num_rounded = whole_buildings(num_ideal)
+            power += power_for(
+                recipe.building_power_mw, num_rounded, 100.0 * num_ideal / num_rounded
+            )
+            stack.extend(
+                (store.child_template[k], store.child_rate[k] * num_ideal)
+                for k in store.children(t)
+            )
+        return CompactTotals(
+            raw_materials={k: v * rate for k, v in raw.items()},
+            byproducts={k: v * rate for k, v in byproducts.items()},
+            building_summary={k: v * rate for k, v in buildings.items()},
+            power_mw_total=power,
+        )
+
+    def recipe_loads(self) -> list[tuple[int, float]]:
+        """
+        (recipe_id, ideal building count) for each recipe in the chain, summed over
+        every node of the expanded tree that uses it: the factories a production
+        line is built with. Ordered deepest (closest to raw) first, ties in preorder.
+        Cycles are cut per path, exactly as in `calculate_chain`'s tree.
+        """
+        rate = self.required_rate
+        loads = self._store.unit_recipe_loads()[self._root]
+        return [
+            (recipe_id, load * rate)
+            for recipe_id, (load, _) in sorted(loads.items(), key=lambda kv: -kv[1][1])
+        ]
+
+    def to_dict(self) -> ProductionNode:
+        """
+        Expand into the nested ProductionNode `calculate_chain` would return for the
+        same item, rate and preferences - identical down to the float rounding.
+        """
+        store = self._store
+        graph = store.graph
+
+        def enter(t: int, rate: float) -> tuple[ProductionNode, list | None]:
+            if store.recipe_id[t] == NO_RECIPE:
+                return raw_node(store.item_id[t], store.name[t], rate), None
+            recipe = graph.recipe(store.recipe_id[t])
+            assert recipe is not None
+            requirements = compute_requirements(recipe, store.item_id[t], rate)
+            node: ProductionNode = {
+                "item_id": store.item_id[t],
+                "item_name": requirements["output"]["item_name"],
+                "required_rate": rate,
+                "is_raw_material": False,
+                "recipe": requirements,
+                "dependencies": {},
+                "raw_materials": {},
+                "byproducts_totals": {
+                    bp["item_name"]: bp["rate"] for bp in requirements["byproducts"]
+                },
+                "building_summary": {
+                    requirements["building_name"]: requirements["num_buildings_ideal"]
+                },
+                "power_mw_total": requirements["total_power_mw"],
+            }
+            pending = zip(requirements["inputs"], store.children(t), strict=True)
+            return node, [node, pending]
+
+        def merge(parent: ProductionNode, child: ProductionNode) -> None:
+            merge_sum(parent["raw_materials"], child["raw_materials"])
+            merge_sum(parent["byproducts_totals"], child["byproducts_totals"])
+            merge_sum(parent["building_summary"], child["building_summary"])
+            parent["power_mw_total"] += child["power_mw_total"]
+
+        root, frame = enter(self._root, self.required_rate)
+        if frame is None:
+            return root
+        stack = [frame]
+        while stack:
+            parent, pending = stack[-1]
+            entry = next(pending, None)
+            if entry is None:
+                stack.pop()
+                if stack:
+                    merge(stack[-1][0], parent)
+                continue
+            inp, k = entry
+            child, child_frame = enter(store.child_template[k], inp["rate"])
+            parent["dependencies"][inp["item_name"]] = child
+            if child_frame is None:
+                merge(parent, child)
+            else:
+                stack.append(child_frame)
+        return root
+
+
+def compact_chain(
+    source: Session | RecipeGraph,
+    item_id: int,
+    target_rate: float,
+    *,
+    preferred_recipes: dict[int, int] | None = None,
+) -> CompactChain:
+    """
+    Build a CompactChain for an item.
+
+    Args:
+        source: A RecipeGraph, or a Session whose engine's shared graph is used.
+        item_id: Item to produce.
+        target_rate: Desired output rate in items/min.
+        preferred_recipes: Optional map of {item_id: recipe_id}, as for calculate_chain.
+
+    Returns:
+        A CompactChain whose `to_dict()` equals
+        `calculate_chain(source, item_id, target_rate, preferred_recipes=...)`.
+    """
+    graph = as_recipe_graph(source)
+    resolver = ChainResolver(graph, preferred_recipes)
+    reach: dict[int, int] = {}
+
+    def reachable(slot: int) -> int:
+        """Bitmask of slots reachable from `slot` through its chosen recipe's inputs."""
+        mask = reach.get(slot)
+        if mask is None:
+            mask = 0
+            queue = [slot]
+            while queue:
+                for child_id, _ in resolver.inputs[queue.pop()]:
+                    child = resolver.slot(child_id)
+                    if not mask & (1 << child):
+                        mask |= 1 << child
+                        queue.append(child)
+            reach[slot] = mask
+        return mask
+
+    # Templates are numbered in creation order while walking and renumbered in
+    # postorder at the end, so every child precedes all of its parents.
+    templates: dict[tuple[int, int], int] = {}
+    created: list[tuple[int, int]] = []                # (slot, recipe id or NO_RECIPE)
+    rows: list[list[tuple[int, float]]] = []
+    postorder: list[int] = []
+
+    def template_for(slot: int, path: int) -> tuple[int, int | None]:
+        """(template, path including the item) - the path is None if nothing to expand."""
+        recipe = resolver.recipes[slot]
+        bit = 1 << slot
+        if recipe is None or path & bit:
+            key, recipe_id = (slot, -1), NO_RECIPE
+        else:
+            key, recipe_id = (slot, path & reachable(slot)), recipe.id
+        if key in templates:
+            return templates[key], None
+        templates[key] = t = len(created)
+        created.append((slot, recipe_id))
+        rows.append([])
+        if recipe_id == NO_RECIPE:
+            postorder.append(t)
+            return t, None
+        return t, path | bit
+
+    root_slot = resolver.slot(item_id)
+    root, root_path = template_for(root_slot, 0)
+    stack = [] if root_path is None else [(root, iter(resolver.inputs[root_slot]), root_path)]
+    while stack:
+        t, inputs, path = stack[-1]
+        entry = next(inputs, None)
+        if entry is None:
+            stack.pop()
+            postorder.append(t)
+            continue
+        child_id, per_building = entry
+        child_slot = resolver.slot(child_id)
+        child, child_path = template_for(child_slot, path)
+        rows[t].append((child, per_building))
+        if child_path is not None:
+            stack.append((child, iter(resolver.inputs[child_slot]), child_path))
+
+    store = _ChainStore(graph)
+    renumber = {old: new for new, old in enumerate(postorder)}
+    for old in postorder:
+        slot, recipe_id = created[old]
+        store.item_id.append(resolver.item_ids[slot])
+        store.recipe_id.append(recipe_id)
+        store.name.append(resolver.names[slot])
+        store.output_rate.append(resolver.output_rates[slot] if recipe_id != NO_RECIPE else 0.0)
+        for child, per_building in rows[old]:
+            store.child_template.append(renumber[child])
+            store.child_rate.append(per_building)
+        store.child_start.append(len(store.child_template))
+    return CompactChain(store, renumber[root], target_rate)
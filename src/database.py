@@ -1,8 +1,35 @@
 import enum
+import os
+import threading
+import uuid
+import weakref
 
-from sqlalchemy import Boolean, Column, Float, ForeignKey, Integer, String, create_engine
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    Engine,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    create_engine,
+    event,
+    inspect,
+    select,
+)
 from sqlalchemy import Enum as SQLEnum
-from sqlalchemy.orm import DeclarativeBase, relationship, sessionmaker
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import (
+    DeclarativeBase,
+    Mapped,
+    Session,
+    mapped_column,
+    relationship,
+    sessionmaker,
+)
+
+from .instrumentation import instrument
 
 
 class Base(DeclarativeBase):
@@ -21,51 +48,59 @@ class Purity(enum.Enum):
 class Item(Base):
     __tablename__ = 'items'
     
-    id = Column(Integer, primary_key=True)
-    class_name = Column(String(200), unique=True, nullable=False)
-    name = Column(String(200), nullable=False)
-    description = Column(String, default="")
-    form = Column(SQLEnum(ItemForm), default=ItemForm.SOLID)
-    stack_size_code = Column(String(50), nullable=True)
-    stack_size = Column(Integer, nullable=True)
-    energy_value = Column(Float, default=0)
-    radioactive_decay = Column(Float, default=0)
-    sink_points = Column(Integer, nullable=True)
-    fluid_color = Column(String(50), nullable=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    class_name: Mapped[str] = mapped_column(String(200), unique=True, nullable=False)
+    name: Mapped[str] = mapped_column(String(200), nullable=False)
+    description: Mapped[str] = mapped_column(String, default="", nullable=True)
+    form: Mapped[ItemForm] = mapped_column(SQLEnum(ItemForm), default=ItemForm.SOLID, nullable=True)
+    stack_size_code: Mapped[str | None] = mapped_column(String(50), nullable=True)
+    stack_size: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    energy_value: Mapped[float] = mapped_column(Float, default=0, nullable=True)
+    radioactive_decay: Mapped[float] = mapped_column(Float, default=0, nullable=True)
+    sink_points: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    fluid_color: Mapped[str | None] = mapped_column(String(50), nullable=True)
     
     ingredients = relationship("RecipeIngredient", back_populates="item")
 
 class Building(Base):
     __tablename__ = 'buildings'
 
-    id = Column(Integer, primary_key=True)
-    class_name = Column(String(200), unique=True, nullable=False)
-    name = Column(String(200), nullable=False)
-    description = Column(String, default="")
-    power_mw = Column(Float, default=0.0, nullable=False)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    class_name: Mapped[str] = mapped_column(String(200), unique=True, nullable=False)
+    name: Mapped[str] = mapped_column(String(200), nullable=False)
+    description: Mapped[str] = mapped_column(String, default="", nullable=True)
+    power_mw: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
 
     recipes = relationship("Recipe", back_populates="building")
 
 class Recipe(Base):
     __tablename__ = 'recipes'
     
-    id = Column(Integer, primary_key=True)
-    class_name = Column(String(200), unique=True, nullable=False)
-    name = Column(String(200), nullable=False)
-    crafting_time = Column(Float, nullable=False)
-    building_id = Column(Integer, ForeignKey('buildings.id'))
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    class_name: Mapped[str] = mapped_column(String(200), unique=True, nullable=False)
+    name: Mapped[str] = mapped_column(String(200), nullable=False)
+    crafting_time: Mapped[float] = mapped_column(Float, nullable=False)
+    building_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('buildings.id'), index=True, nullable=True
+    )
     
     building = relationship("Building", back_populates="recipes")
     ingredients = relationship("RecipeIngredient", back_populates="recipe", cascade="all, delete-orphan")
 
 class RecipeIngredient(Base):
     __tablename__ = 'recipe_ingredients'
+    __table_args__ = (
+        # get_recipes_for_item / the recipe graph: "which recipes output item X"
+        Index('ix_recipe_ingredients_item_id_is_output', 'item_id', 'is_output'),
+    )
     
-    id = Column(Integer, primary_key=True)
-    quantity = Column(Integer, nullable=False)
-    is_output = Column(Boolean, default=False)
-    recipe_id = Column(Integer, ForeignKey('recipes.id', ondelete='CASCADE'))
-    item_id = Column(Integer, ForeignKey('items.id'))
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False)
+    is_output: Mapped[bool] = mapped_column(Boolean, default=False, nullable=True)
+    recipe_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('recipes.id', ondelete='CASCADE'), index=True, nullable=True
+    )
+    item_id: Mapped[int] = mapped_column(Integer, ForeignKey('items.id'), nullable=True)
     
     recipe = relationship("Recipe", back_populates="ingredients")
     item = relationship("Item", back_populates="ingredients")
@@ -73,9 +108,9 @@ class RecipeIngredient(Base):
 class Group(Base):
     __tablename__ = 'groups'
 
-    id = Column(Integer, primary_key=True)
-    name = Column(String(200), nullable=False)
-    description = Column(String, default="")
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(200), nullable=False)
+    description: Mapped[str] = mapped_column(String, default="", nullable=True)
 
     production_lines = relationship("ProductionLine", back_populates="group")
     resource_nodes = relationship("ResourceNode", back_populates="group")
@@ -83,12 +118,14 @@ class Group(Base):
 class ProductionLine(Base):
     __tablename__ = 'production_lines'
 
-    id = Column(Integer, primary_key=True)
-    name = Column(String(200), nullable=False)
-    target_item_id = Column(Integer, ForeignKey('items.id'))
-    target_rate = Column(Float, nullable=False)
-    group_id = Column(Integer, ForeignKey('groups.id'), nullable=True)
-    is_active = Column(Boolean, default=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(200), nullable=False)
+    target_item_id: Mapped[int] = mapped_column(Integer, ForeignKey('items.id'), nullable=True)
+    target_rate: Mapped[float] = mapped_column(Float, nullable=False)
+    group_id: Mapped[int | None] = mapped_column(
+        Integer, ForeignKey('groups.id'), nullable=True, index=True
+    )
+    is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=True)
 
     group = relationship("Group", back_populates="production_lines")
     factories = relationship("Factory", back_populates="production_line")
@@ -97,42 +134,216 @@ class ProductionLine(Base):
 class Factory(Base):
     __tablename__ = 'factories'
 
-    id = Column(Integer, primary_key=True)
-    name = Column(String(200), nullable=False)
-    production_line_id = Column(Integer, ForeignKey('production_lines.id'))
-    recipe_id = Column(Integer, ForeignKey('recipes.id'))
-    building_count = Column(Integer, nullable=False)
-    clock_speed = Column(Float, default=100.0)
-    order = Column(Integer, default=0)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(200), nullable=False)
+    production_line_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('production_lines.id'), index=True, nullable=True
+    )
+    recipe_id: Mapped[int] = mapped_column(Integer, ForeignKey('recipes.id'), nullable=True)
+    building_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    clock_speed: Mapped[float] = mapped_column(Float, default=100.0, nullable=True)
+    order: Mapped[int] = mapped_column(Integer, default=0, nullable=True)
 
     production_line = relationship("ProductionLine", back_populates="factories")
     recipe = relationship("Recipe")
 
+class LineRequirement(Base):
+    """
+    Materialized chain totals for a production line, written by the production
+    mutators. One row per raw material (item_id, rate), plus one line-total row
+    (item_id NULL) carrying power_mw and building_count.
+    """
+    __tablename__ = 'line_requirements'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    line_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('production_lines.id', ondelete='CASCADE'), nullable=False, index=True
+    )
+    item_id: Mapped[int | None] = mapped_column(Integer, ForeignKey('items.id'), nullable=True)
+    rate: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    power_mw: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    building_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    catalog_version: Mapped[str] = mapped_column(String(16), nullable=False)
+
 class ResourceNode(Base):
     __tablename__ = 'resource_nodes'
     
-    id = Column(Integer, primary_key=True)
-    name = Column(String(200), nullable=False)
-    item_id = Column(Integer, ForeignKey('items.id'))
-    purity = Column(SQLEnum(Purity), default=Purity.NORMAL)
-    extraction_rate = Column(Float)
-    group_id = Column(Integer, ForeignKey('groups.id'))
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(200), nullable=False)
+    item_id: Mapped[int] = mapped_column(Integer, ForeignKey('items.id'), nullable=True)
+    purity: Mapped[Purity] = mapped_column(SQLEnum(Purity), default=Purity.NORMAL, nullable=True)
+    extraction_rate: Mapped[float] = mapped_column(Float, nullable=True)
+    group_id: Mapped[int | None] = mapped_column(Integer, ForeignKey('groups.id'), index=True)
 
     group = relationship("Group", back_populates="resource_nodes")
     item = relationship("Item")
 
-def get_engine(database_url):
-    return create_engine(database_url)
+class UnitCost(Base):
+    """Cost of producing 1 item/min under the default recipes, built by the ETL."""
+    __tablename__ = 'unit_costs'
+
+    item_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('items.id', ondelete='CASCADE'), primary_key=True
+    )
+    catalog_version: Mapped[str] = mapped_column(String(16), nullable=False)
+    is_raw_material: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    raw_materials: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
+    building_summary: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
+    building_count: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    power_mw: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+
+class CatalogMeta(Base):
+    """Key/value facts about the loaded catalog, such as the ETL generation id."""
+    __tablename__ = 'catalog_meta'
+
+    key: Mapped[str] = mapped_column(String(50), primary_key=True)
+    value: Mapped[str] = mapped_column(String, nullable=False)
+
+ETL_GENERATION_KEY = 'etl_generation'
+
+# Applied to every new file-backed SQLite connection. WAL lets Streamlit sessions read while a
+# write is in progress; NORMAL sync is durable in WAL mode short of power loss.
+SQLITE_PRAGMAS: dict[str, str | int] = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,          # negative = KiB, i.e. 64 MiB
+    "temp_store": "MEMORY",
+}
+
+def _is_memory_url(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+_POOL_ENV = {
+    "DATABASE_POOL_SIZE": ("pool_size", int),
+    "DATABASE_MAX_OVERFLOW": ("max_overflow", int),
+    "DATABASE_POOL_TIMEOUT": ("pool_timeout", float),
+    "DATABASE_POOL_RECYCLE": ("pool_recycle", int),
+}
+
+def _pool_options_from_env() -> dict:
+    """create_engine() pool arguments set through DATABASE_POOL_* environment variables."""
+    return {
+        option: cast(os.environ[var])
+        for var, (option, cast) in _POOL_ENV.items()
+        if os.environ.get(var)
+    }
+
+def get_engine(database_url, **engine_options):
+    """
+    Create a new engine. File-backed SQLite engines get SQLITE_PRAGMAS on connect.
+
+    Prefer `shared_engine` in application code; this always builds a fresh pool.
+    Every engine is instrumented for `instrumentation.record_queries`.
+    """
+    engine = create_engine(database_url, **engine_options)
+    if engine.url.get_backend_name() == "sqlite" and not _is_memory_url(engine.url):
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+    return instrument(engine)
+
+_engines: dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+_session_factories: "weakref.WeakKeyDictionary[Engine, sessionmaker]" = (
+    weakref.WeakKeyDictionary()
+)
+
+def shared_engine(database_url=None, **engine_options) -> Engine:
+    """
+    Return the process-wide engine for `database_url`, creating it on first use.
+
+    Args:
+        database_url: Defaults to the DATABASE_URL environment variable.
+        engine_options: create_engine() arguments, used only when the engine is
+            first created. Pool settings default to DATABASE_POOL_SIZE,
+            DATABASE_MAX_OVERFLOW, DATABASE_POOL_TIMEOUT and DATABASE_POOL_RECYCLE.
+
+    In-memory SQLite URLs are never cached: each would otherwise be one database
+    shared by every caller.
+    """
+    url = make_url(database_url or os.environ["DATABASE_URL"])
+    if _is_memory_url(url):
+        return get_engine(url, **engine_options)
+    key = url.render_as_string(hide_password=False)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            options = {**_pool_options_from_env(), **engine_options}
+            engine = _engines[key] = get_engine(url, **options)
+        return engine
+
+def dispose_engines() -> None:
+    """Dispose of and forget every shared engine (tests, or after replacing the DB file)."""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
 
 def create_tables(engine):
     Base.metadata.create_all(engine)
 
+def upgrade_schema(engine) -> list[str]:
+    """
+    Bring an existing database up to the current models without re-running the ETL.
+
+    Creates missing tables and any declared index that does not exist yet, and
+    (re)builds the derived unit_costs table if it is empty or stale; user data is
+    left untouched. Safe to run repeatedly.
+
+    Returns:
+        Names of the indexes created (empty if the schema was already current).
+    """
+    from .unit_costs import ensure_unit_costs  # unit_costs imports this module
+
+    Base.metadata.create_all(engine)  # new tables, with their indexes
+    created = []
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+            for index in sorted(table.indexes, key=lambda ix: str(ix.name)):
+                if index.name not in existing:
+                    index.create(conn)
+                    created.append(str(index.name))
+    with Session(engine) as session:
+        if ensure_unit_costs(session):
+            session.commit()
+    return created
+
 def get_session(engine):
-    Session = sessionmaker(bind=engine)
-    return Session()
+    """New Session from the engine's cached sessionmaker."""
+    factory = _session_factories.get(engine)
+    if factory is None:
+        factory = _session_factories[engine] = sessionmaker(bind=engine)
+    return factory()
+
+def get_etl_generation(bind) -> str:
+    """
+    Id of the ETL run that loaded the catalog; it changes every time the ETL runs.
+
+    `bind` is an Engine, or a Session / Connection to read inside its current
+    transaction. Databases loaded before generation ids existed report "0".
+    """
+    query = select(CatalogMeta.value).where(CatalogMeta.key == ETL_GENERATION_KEY)
+    if isinstance(bind, Engine):
+        with bind.connect() as conn:
+            value = conn.execute(query).scalar()
+    else:
+        value = bind.execute(query).scalar()
+    return value or "0"
+
+def new_etl_generation(session) -> str:
+    """Record a fresh ETL generation id (call at the end of an ETL run). Does not commit."""
+    value = uuid.uuid4().hex
+    session.merge(CatalogMeta(key=ETL_GENERATION_KEY, value=value))
+    return value
 
 def is_etl_complete(engine) -> bool:
     """True if the ETL has populated the schema (items, buildings, recipes tables exist)."""
-    from sqlalchemy import inspect
     tables = set(inspect(engine).get_table_names())
     return {"items", "buildings", "recipes"}.issubset(tables)
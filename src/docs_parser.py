@@ -0,0 +1,185 @@
+"""
+Streaming reader for the game's Docs.json.
+
+Docs.json is one top-level JSON array of sections, each
+`{"NativeClass": "...", "Classes": [...]}`. Real exports are UTF-16 with a BOM
+and far larger than anything the ETL needs, so instead of `json.load`-ing the
+whole document this module
+
+- detects the encoding from the BOM (or, without one, from the NUL pattern of
+  the leading "[" as RFC 4627 does),
+- decodes the file in chunks and hands one section at a time to the C JSON
+  decoder,
+- yields only the sections whose NativeClass the caller asked for.
+
+Decoded text is dropped as soon as its section is parsed, so peak memory is
+bounded by the largest single section rather than by the file.
+
+    for section in iter_sections("data/Docs.json", ("FGRecipe",)):
+        ...
+"""
+
+import codecs
+import io
+import json
+import os
+import re
+from collections.abc import Iterable, Iterator
+from typing import BinaryIO, cast
+
+CHUNK_SIZE = 1 << 20          # characters decoded per read
+
+# Longest BOMs first: the UTF-32 LE BOM starts with the UTF-16 LE one.
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+_WHITESPACE = re.compile(r"[ \t\r\n]*")
+_decoder = json.JSONDecoder()
+
+
+def _skip_whitespace(text: str, pos: int) -> int:
+    """Index of the first non-whitespace character at or after `pos`."""
+    match = _WHITESPACE.match(text, pos)
+    assert match is not None           # the pattern matches the empty string
+    return match.end()
+
+
+def detect_encoding(head: bytes) -> str:
+    """
+    Codec name for a JSON document starting with `head` (at least 4 bytes).
+
+    The "utf-8-sig" / "utf-16" / "utf-32" codecs consume their BOM.
+    """
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    nulls = tuple(b == 0 for b in head[:4])
+    if nulls == (True, True, True, False):
+        return "utf-32-be"
+    if nulls == (False, True, True, True):
+        return "utf-32-le"
+    if nulls[:2] == (True, False):
+        return "utf-16-be"
+    if nulls[:2] == (False, True):
+        return "utf-16-le"
+    return "utf-8"
+
+
+def _open_text(source: str | os.PathLike[str] | BinaryIO) -> tuple[io.TextIOWrapper, bool]:
+    """A decoding text stream over `source` and whether this module opened it."""
+    stream: BinaryIO
+    if isinstance(source, str | os.PathLike):
+        stream, opened = open(source, "rb"), True  # noqa: SIM115 - closed by iter_sections
+    else:
+        stream, opened = source, False
+    buffered = (
+        stream if isinstance(stream, io.BufferedReader | io.BufferedRandom)
+        else io.BufferedReader(cast(io.RawIOBase, stream))   # any file object with readinto()
+    )
+    encoding = detect_encoding(buffered.peek(4)[:4])
+    return io.TextIOWrapper(buffered, encoding=encoding, newline=""), opened
+
+
+def iter_array(text: io.TextIOBase, chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """
+    Decode the elements of a top-level JSON array of objects one at a time.
+
+    Each element is handed to the C decoder (`JSONDecoder.raw_decode`) from the
+    buffer; an element that runs past the end of the buffer fails to decode and
+    is retried once more text has been read (doubling the read while the same
+    element keeps failing). Decoded text is dropped from the buffer, so it only
+    ever holds about one element.
+
+    Raises:
+        ValueError: The document is not an array of objects, or is malformed or
+            truncated.
+    """
+    buf = ""
+    pos = 0
+    eof = False
+    read_size = chunk_size
+    state = "start"           # start -> value_or_end -> comma_or_end -> value -> ...
+
+    def fill() -> bool:
+        nonlocal buf, pos, eof
+        more = "" if eof else text.read(read_size)
+        eof = not more
+        buf, pos = buf[pos:] + more, 0
+        return not eof
+
+    while True:
+        pos = _skip_whitespace(buf, pos)
+        if pos == len(buf):
+            if not fill():
+                raise ValueError("Docs.json is truncated")
+            continue
+        c = buf[pos]
+        if state == "start":
+            if c != "[":
+                raise ValueError("Docs.json must be a JSON array")
+            pos += 1
+            state = "value_or_end"
+        elif c == "]" and state != "value":
+            pos += 1
+            break
+        elif state == "comma_or_end":
+            if c != ",":
+                raise ValueError(f"expected ',' between Docs.json sections, got {c!r}")
+            pos += 1
+            state = "value"
+        elif c != "{":
+            raise ValueError("Docs.json sections must be objects")
+        else:
+            try:
+                section, pos = _decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                read_size *= 2
+                if not fill():
+                    raise ValueError(f"invalid Docs.json section: {e}") from e
+                continue
+            read_size = chunk_size
+            state = "comma_or_end"
+            yield section
+    while buf[pos:].strip(" \t\r\n") == "":
+        if not fill():
+            return
+    raise ValueError("unexpected data after the Docs.json array")
+
+
+def iter_sections(
+    source: str | os.PathLike[str] | BinaryIO,
+    native_classes: Iterable[str] | None = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[dict]:
+    """
+    Stream the decoded sections of a Docs.json file.
+
+    Args:
+        source: A path, or a binary file object positioned at the start.
+        native_classes: Substrings of the NativeClass values to keep (as the ETL
+            matches them). None keeps every section.
+        chunk_size: Characters decoded per read.
+
+    Yields:
+        Each kept section as a dict, in file order.
+
+    Raises:
+        ValueError: The file is not a JSON array of objects, or a kept section
+            is not valid JSON.
+    """
+    wanted = None if native_classes is None else tuple(native_classes)
+    text, opened = _open_text(source)
+    try:
+        for section in iter_array(text, chunk_size):
+            native = section.get("NativeClass", "")
+            if wanted is None or any(n in native for n in wanted):
+                yield section
+    finally:
+        if opened:
+            text.close()
+        else:
+            text.detach()
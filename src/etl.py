@@ -1,232 +1,514 @@
+import argparse
+import hashlib
 import json
 import os
-import re
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import NamedTuple
 
 from dotenv import load_dotenv
+from sqlalchemy import bindparam, delete, exists, insert, select, update
 
 from .database import (
-    Base,
     Building,
+    CatalogMeta,
     Item,
+    ItemForm,
+    ProductionLine,
     Recipe,
     RecipeIngredient,
-    create_tables,
+    ResourceNode,
     get_engine,
+    get_etl_generation,
     get_session,
+    new_etl_generation,
+    upgrade_schema,
 )
+from .docs_parser import iter_sections
+from .graph import RecipeGraph
+from .instrumentation import record_queries
+from .production import rebuild_lines_for_recipes
+from .summary_cache import group_summaries
+from .ue_properties import parse_class_paths, parse_item_amounts
+from .unit_costs import build_unit_costs
 
 # Load environment variables
 load_dotenv()
 
-def load_json_data():
-    """Load the Docs.json file and return the data"""
-    with open('data/Docs.json', encoding='utf-8') as f:
-        data = json.load(f)
+DOCS_PATH = 'data/Docs.json'
+
+# NativeClass substrings of the Docs.json sections each loader reads.
+ITEM_NATIVE_CLASSES = ("ItemDescriptor", "FGResourceDescriptor")
+RECIPE_NATIVE_CLASSES = ("FGRecipe",)
+MANUFACTURER_NATIVE_CLASSES = (
+    "FGBuildableManufacturer",
+    "FGBuildableManufacturerVariablePower",
+)
+
+# catalog_meta keys: sha256 of the whole Docs.json, and "<key>:<section>" per ETL section.
+DOCS_FINGERPRINT_KEY = 'docs_sha256'
+SECTIONS = ("items", "recipes", "manufacturers")
+
+class DocsData(NamedTuple):
+    """The parts of Docs.json the ETL loads."""
+    items: list[dict]                   # item and resource descriptor classes
+    recipes: list[dict]                 # recipe classes
+    building_power: dict[str, float]    # manufacturer class name -> power_mw
+    fingerprints: dict[str, str]        # section -> sha256 of its classes (see SECTIONS)
+
+class TableDiff(NamedTuple):
+    """Class names a refresh added, changed and removed in one catalog table."""
+    added: list[str]
+    changed: list[str]
+    removed: list[str]
+
+    def is_empty(self):
+        return not (self.added or self.changed or self.removed)
+
+    def __str__(self):
+        return f"+{len(self.added)} ~{len(self.changed)} -{len(self.removed)}"
+
+class PhaseTiming(NamedTuple):
+    """Wall time and SQL statement count of one ETL phase."""
+    name: str
+    ms: float
+    statements: int
+
+class CatalogRefresh(NamedTuple):
+    """What one `refresh_catalog` run found and did."""
+    fingerprint: str                    # sha256 of Docs.json
+    sections: list[str]                 # sections whose fingerprint changed
+    diff: dict[str, TableDiff]          # "items" / "buildings" / "recipes" -> diff
+    kept_items: list[str]               # removed items kept because user state uses them
+    rebuilt_lines: list[int]            # lines whose factories were rebuilt
+    phases: list[PhaseTiming]           # in the order they ran
+
+    @property
+    def catalog_changed(self):
+        return any(not d.is_empty() for d in self.diff.values())
+
+def fingerprint_file(path):
+    """sha256 hex digest of a file's bytes."""
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+def read_docs(source=DOCS_PATH):
+    """
+    Read the sections the ETL needs from Docs.json in one streaming pass.
+
+    Every other section (schematics, buildables, customization, ...) is decoded
+    and dropped straight away, and manufacturer sections are reduced to their
+    power map, so only items and recipes are kept. Any encoding the game
+    exports (UTF-16 with a BOM, UTF-8) is accepted. Each kept section's classes
+    are fingerprinted as they arrive, so a refresh can tell which parts changed.
+
+    Args:
+        source: A path or binary file object, see docs_parser.iter_sections.
+
+    Returns:
+        DocsData.
+    """
+    data = DocsData([], [], {}, {})
+    hashes = {section: hashlib.sha256() for section in SECTIONS}
+    handlers = (
+        ("items", ITEM_NATIVE_CLASSES, data.items.extend),
+        ("recipes", RECIPE_NATIVE_CLASSES, data.recipes.extend),
+        ("manufacturers", MANUFACTURER_NATIVE_CLASSES,
+         lambda classes: data.building_power.update(get_building_power(classes))),
+    )
+    wanted = ITEM_NATIVE_CLASSES + RECIPE_NATIVE_CLASSES + MANUFACTURER_NATIVE_CLASSES
+    for section in iter_sections(source, wanted):
+        native = section["NativeClass"]
+        for name, native_classes, handle in handlers:
+            if any(n in native for n in native_classes):
+                handle(section["Classes"])
+                hashes[name].update(json.dumps(section["Classes"], sort_keys=True).encode())
+    data.fingerprints.update((name, h.hexdigest()) for name, h in hashes.items())
     return data
 
 def get_form(s):
-    return 'SOLID' if s == 'RF_SOLID' else 'LIQUID' if s == 'RF_LIQUID' else 'GAS' 
+    return 'SOLID' if s == 'RF_SOLID' else 'LIQUID' if s == 'RF_LIQUID' else 'GAS'
 
 def get_ss_value(s):
-    return 500 if s == 'SS_HUGE' else 200 if s == 'SS_BIG' else 100 if s == 'SS_MEDIUM' else 50 if s == 'SS_SMALL' else 1 if s == 'SS_ONE' else -1 
-
-def parse_ingredients_or_products(ingredient_string):
-    """
-    Parse strings like:
-    "((ItemClass=.../Desc_IronIngot.Desc_IronIngot_C',Amount=3))"
-    Returns list of tuples: [('Desc_IronIngot_C', 3)]
-    """
-    # Extract all class names and amounts
-    class_pattern = r"Desc_(\w+)_C"
-    amount_pattern = r"Amount=(\d+)"
-    
-    class_names = re.findall(class_pattern, ingredient_string)
-    amounts = re.findall(amount_pattern, ingredient_string)
-    
-    return list(zip(class_names, amounts, strict=False))
-
-def get_or_create_building(session, building_class_name):
-    """
-    Check if building exists, create if not.
-    Returns the building object.
-    """
-    building = session.query(Building).filter_by(class_name=building_class_name).first()
-    if not building:
-        # Extract a readable name from class name
-        # "Build_ConstructorMk1_C" -> "Constructor Mk1"
-        name = building_class_name.replace("Build_", "").replace("_C", "").replace("_", " ")
-        building = Building(
-            class_name=building_class_name,
-            name=name,
-            description="",
-            power_mw=0.0,
-        )
-        session.add(building)
-        session.flush()
-    return building
+    return 500 if s == 'SS_HUGE' else 200 if s == 'SS_BIG' else 100 if s == 'SS_MEDIUM' else 50 if s == 'SS_SMALL' else 1 if s == 'SS_ONE' else -1
 
+def building_name(building_class_name):
+    """Readable building name from its class: "Build_ConstructorMk1_C" -> "Constructor Mk1"."""
+    return building_class_name.replace("Build_", "").replace("_C", "").replace("_", " ")
 
-def load_building_power(session, data):
+def get_building_power(manufacturers):
     """
-    Populate Building.power_mw from FGBuildableManufacturer entries in Docs.json.
+    Map building class name -> power_mw from FGBuildableManufacturer class entries.
 
     Variable-power buildings (e.g. Particle Accelerator) use their estimated max
     as a pessimistic planning value.
     """
-    manufacturer_natives = (
-        "FGBuildableManufacturer",
-        "FGBuildableManufacturerVariablePower",
-    )
-    updates = 0
-    for entry in data:
-        native = entry.get("NativeClass", "")
-        if not any(n in native for n in manufacturer_natives):
+    power = {}
+    for building_data in manufacturers:
+        class_name = building_data.get("ClassName")
+        if not class_name:
             continue
-        for building_data in entry["Classes"]:
-            class_name = building_data.get("ClassName")
-            if not class_name:
-                continue
-            building = session.query(Building).filter_by(class_name=class_name).first()
-            if building is None:
-                continue
-            try:
-                if "mEstimatedMaximumPowerConsumption" in building_data:
-                    power = float(building_data["mEstimatedMaximumPowerConsumption"])
-                else:
-                    power = float(building_data.get("mPowerConsumption", 0) or 0)
-            except (TypeError, ValueError):
-                power = 0.0
-            building.power_mw = power
-            updates += 1
-    session.commit()
-    print(f"Set power_mw on {updates} buildings")
+        try:
+            if "mEstimatedMaximumPowerConsumption" in building_data:
+                power[class_name] = float(building_data["mEstimatedMaximumPowerConsumption"])
+            else:
+                power[class_name] = float(building_data.get("mPowerConsumption", 0) or 0)
+        except (TypeError, ValueError):
+            power[class_name] = 0.0
+    return power
+
+def _upsert(session, table, rows):
+    """
+    Make `table` hold `rows` (column dicts including class_name), matched by class_name.
+
+    New class names go in as one executemany and rows whose stored values differ
+    are updated as another; unchanged rows are not written at all. Stored rows
+    missing from `rows` are reported as removed but left for the caller to delete.
 
-def load_recipes(session, data):
-    """Load all recipes from JSON data"""
-    recipe_count = 0
+    Returns:
+        (TableDiff, dict mapping the class name of every row in `rows` -> id).
+    """
+    keys = list(rows[0]) if rows else ['class_name']
+    stored = {
+        row.class_name: row
+        for row in session.execute(select(table.c.id, *(table.c[k] for k in keys)))
+    }
+    added, changed = [], []
+    for row in rows:
+        old = stored.get(row['class_name'])
+        if old is None:
+            added.append(row)
+        elif any(old._mapping[k] != v for k, v in row.items()):
+            changed.append({**row, 'row_id': old.id})
+    if added:
+        session.execute(insert(table), added)
+    if changed:
+        session.execute(update(table).where(table.c.id == bindparam('row_id')), changed)
+
+    names = {row['class_name'] for row in rows}
+    ids = {
+        class_name: row_id
+        for class_name, row_id in session.execute(select(table.c.class_name, table.c.id))
+        if class_name in names
+    }
+    diff = TableDiff(
+        [row['class_name'] for row in added],
+        [row['class_name'] for row in changed],
+        [class_name for class_name in stored if class_name not in names],
+    )
+    return diff, ids
+
+def sync_items(session, items):
+    """
+    Upsert every item descriptor by class name (see _upsert). Does not commit.
+
+    Removed items are only reported here: recipes may still use them until
+    sync_recipes has run, see delete_removed_items.
+
+    Returns:
+        (TableDiff, dict mapping item class name -> id for the items in `items`).
+    """
+    rows = [
+        {
+            "class_name": item_data['ClassName'],
+            "name": item_data['mDisplayName'],
+            "description": item_data['mDescription'],
+            "form": ItemForm[get_form(item_data['mForm'])],
+            "stack_size_code": item_data['mStackSize'],
+            "stack_size": get_ss_value(item_data['mStackSize']),
+            "energy_value": float(item_data['mEnergyValue']),
+            "radioactive_decay": float(item_data['mRadioactiveDecay']),
+            "sink_points": int(item_data['mResourceSinkPoints']),
+            "fluid_color": item_data['mFluidColor'],
+        }
+        for item_data in items
+    ]
+    return _upsert(session, Item.__table__, rows)
+
+def _recipe_property(recipe_data, field, parse):
+    """`parse` applied to one property of a recipe class, naming both if it fails."""
+    try:
+        return parse(recipe_data.get(field, ""))
+    except ValueError as e:
+        raise ValueError(f"{recipe_data.get('ClassName', '<unnamed recipe>')}.{field}: {e}") from e
+
+def _recipe_entries(recipes_data):
+    """
+    (recipe row, building class, ingredients, products) for each loadable recipe class.
+
+    Raises:
+        ValueError: A property could not be parsed; the message names the recipe
+            class and the property.
+    """
+    recipes = []
     processed_recipes = set()
-    
-    # Find recipe entries
-    for entry in data:
-        if "FGRecipe" in entry.get("NativeClass", ""):
-            for recipe_data in entry["Classes"]:
-
-                # Skip if Build Gun recipe
-                if 'BuildGun' in recipe_data['mProducedIn']:
-                    continue
-
-                if not recipe_data['ClassName'].startswith('Recipe_'):
-                    continue
-
-                # Skip if recipe has been processed already
-                class_name = recipe_data['ClassName']
-                if class_name in processed_recipes:
-                    continue
-
-                processed_recipes.add(class_name)
-                # Extract building name from mProducedIn
-                produced_in = recipe_data.get("mProducedIn", "")
-                building_match = re.search(r"Build_(\w+)\.Build_(\w+)_C", produced_in)
-                if not building_match:
-                    continue  # Skip recipes without valid building
-                
-                building_class_name = f"Build_{building_match.group(2)}_C"
-                
-                # Get or create building
-                building = get_or_create_building(session, building_class_name)
-                
-                # Create recipe
-                recipe = Recipe(
-                    class_name=recipe_data["ClassName"],
-                    name=recipe_data["mDisplayName"],
-                    crafting_time=float(recipe_data["mManufactoringDuration"]),
-                    building_id=building.id
-                )
-                session.add(recipe)
-                session.flush()  # Get recipe.id before adding ingredients
-                
-                # Parse and add ingredients (inputs)
-                ingredients = parse_ingredients_or_products(recipe_data.get("mIngredients", ""))
-                for class_name_part, amount in ingredients:
-                    full_class_name = f"Desc_{class_name_part}_C"
-                    item = session.query(Item).filter_by(class_name=full_class_name).first()
-                    if item:
-                        ingredient = RecipeIngredient(
-                            quantity=int(amount),
-                            is_output=False,
-                            recipe_id=recipe.id,
-                            item_id=item.id
-                        )
-                        session.add(ingredient)
-                
-                # Parse and add products (outputs)
-                products = parse_ingredients_or_products(recipe_data.get("mProduct", ""))
-                for class_name_part, amount in products:
-                    full_class_name = f"Desc_{class_name_part}_C"
-                    item = session.query(Item).filter_by(class_name=full_class_name).first()
-                    if item:
-                        product = RecipeIngredient(
-                            quantity=int(amount),
-                            is_output=True,
-                            recipe_id=recipe.id,
-                            item_id=item.id
-                        )
-                        session.add(product)
-                
-                recipe_count += 1
-    
-    session.commit()
-    print(f"Loaded {recipe_count} recipes")
-
-def main():
-    # Setup database
-    engine = get_engine(os.getenv('DATABASE_URL'))
-    Base.metadata.drop_all(engine)
-    create_tables(engine)
-    session = get_session(engine)
-    
-    # Load JSON data
-    data = load_json_data()
-    
-    print(f"Loaded {len(data)} entries from JSON")
-    
-    for entry in data:
-        if 'ItemDescriptor' in entry['NativeClass'] or 'FGResourceDescriptor' in entry['NativeClass']:
-            for item_data in entry['Classes']:
-                # Insert directly, no fancy logic
-                name = item_data['mDisplayName']
-                class_name = item_data['ClassName']
-                description = item_data['mDescription']
-                form = get_form(item_data['mForm'])
-                stack_size_code = item_data['mStackSize']
-                stack_size = get_ss_value(stack_size_code)
-                energy_value = item_data['mEnergyValue']
-                radioactive_decay = item_data['mRadioactiveDecay']
-                sink_points = item_data['mResourceSinkPoints']
-                fluid_color = item_data['mFluidColor']
-                item = Item(class_name=class_name, name=name, description=description, 
-                            form=form, stack_size_code=stack_size_code, 
-                            stack_size=stack_size, energy_value=energy_value, 
-                            radioactive_decay=radioactive_decay, sink_points=sink_points, 
-                            fluid_color=fluid_color)
-                session.add(item)    
+    for recipe_data in recipes_data:
+        produced_in = [
+            path.name for path in _recipe_property(recipe_data, "mProducedIn", parse_class_paths)
+        ]
+        # Skip if Build Gun recipe
+        if any('BuildGun' in name for name in produced_in):
+            continue
+
+        class_name = recipe_data['ClassName']
+        if not class_name.startswith('Recipe_') or class_name in processed_recipes:
+            continue
+        processed_recipes.add(class_name)
+
+        # The first factory building it is made in (workbench / workshop entries are not)
+        building = next((name for name in produced_in if name.startswith('Build_')), None)
+        if building is None:
+            continue  # Skip recipes without valid building
+
+        recipes.append((
+            {
+                "class_name": class_name,
+                "name": recipe_data["mDisplayName"],
+                "crafting_time": float(recipe_data["mManufactoringDuration"]),
+            },
+            building,
+            _recipe_property(recipe_data, "mIngredients", parse_item_amounts),
+            _recipe_property(recipe_data, "mProduct", parse_item_amounts),
+        ))
+    return recipes
+
+def sync_recipes(session, recipes_data, item_ids, building_power):
+    """
+    Upsert recipes and the buildings they are made in, and rewrite changed ingredients.
+
+    A recipe counts as changed when its name, crafting time, building or
+    ingredient list differs from the stored one; only added and changed recipes
+    get their ingredient rows rewritten. Recipes and buildings no longer in
+    Docs.json are deleted. Ids of unchanged rows never move, so factories that
+    reference them stay valid. Does not commit.
+
+    Args:
+        session: An active SQLAlchemy Session.
+        recipes_data: Recipe class entries (DocsData.recipes).
+        item_ids: Item class name -> id, as returned by sync_items.
+        building_power: Building class name -> power_mw (DocsData.building_power).
+
+    Returns:
+        (buildings TableDiff, recipes TableDiff, ids of the recipes added, changed
+        or removed).
+    """
+    recipes = _recipe_entries(recipes_data)
+
+    # Buildings in first-use order, as the recipes reference them.
+    building_classes = list(dict.fromkeys(building for _, building, _, _ in recipes))
+    building_diff, building_ids = _upsert(session, Building.__table__, [
+        {
+            "class_name": building,
+            "name": building_name(building),
+            "description": "",
+            "power_mw": building_power.get(building, 0.0),
+        }
+        for building in building_classes
+    ])
+
+    removed_ids = dict(session.execute(select(Recipe.class_name, Recipe.id)).all())
+    recipe_diff, recipe_ids = _upsert(session, Recipe.__table__, [
+        {**row, "building_id": building_ids[building]} for row, building, _, _ in recipes
+    ])
+    removed_ids = [removed_ids[name] for name in recipe_diff.removed]
+
+    stored_parts = {}
+    for row in session.execute(
+        select(
+            RecipeIngredient.recipe_id,
+            RecipeIngredient.item_id,
+            RecipeIngredient.quantity,
+            RecipeIngredient.is_output,
+        ).order_by(RecipeIngredient.id)
+    ):
+        stored_parts.setdefault(row.recipe_id, []).append(tuple(row[1:]))
+    rewrite = set(recipe_diff.added) | set(recipe_diff.changed)
+    ingredient_rows = []
+    for row, _, ingredients, products in recipes:
+        recipe_id = recipe_ids[row["class_name"]]
+        parts = [
+            (item_ids[item_class], amount, is_output)
+            for amounts, is_output in ((ingredients, False), (products, True))
+            for item_class, amount in amounts
+            if item_class in item_ids
+        ]
+        if stored_parts.get(recipe_id, []) != parts:
+            rewrite.add(row["class_name"])
+        if row["class_name"] in rewrite:
+            ingredient_rows.extend(
+                {"quantity": quantity, "is_output": is_output, "recipe_id": recipe_id,
+                 "item_id": item_id}
+                for item_id, quantity, is_output in parts
+            )
+
+    rewrite_ids = [recipe_ids[name] for name in rewrite]
+    session.execute(
+        delete(RecipeIngredient).where(RecipeIngredient.recipe_id.in_(rewrite_ids + removed_ids))
+    )
+    if ingredient_rows:
+        session.execute(insert(RecipeIngredient.__table__), ingredient_rows)
+    if removed_ids:
+        session.execute(delete(Recipe).where(Recipe.id.in_(removed_ids)))
+    if building_diff.removed:
+        session.execute(delete(Building).where(Building.class_name.in_(building_diff.removed)))
+
+    added = set(recipe_diff.added)
+    recipe_diff = recipe_diff._replace(changed=[
+        row["class_name"] for row, _, _, _ in recipes
+        if row["class_name"] in rewrite and row["class_name"] not in added
+    ])
+    return building_diff, recipe_diff, set(rewrite_ids) | set(removed_ids)
+
+def delete_removed_items(session, class_names):
+    """
+    Delete removed items that nothing references any more. Does not commit.
 
+    Items still targeted by a production line or mined by a resource node are
+    kept so user state survives a patch that drops them.
+
+    Returns:
+        Class names of the items that were kept.
+    """
+    if not class_names:
+        return []
+    session.execute(
+        delete(Item).where(
+            Item.class_name.in_(class_names),
+            ~exists().where(ProductionLine.target_item_id == Item.id),
+            ~exists().where(ResourceNode.item_id == Item.id),
+            ~exists().where(RecipeIngredient.item_id == Item.id),
+        )
+    )
+    return list(session.scalars(select(Item.class_name).where(Item.class_name.in_(class_names))))
+
+def _stored_fingerprints(session):
+    return dict(session.execute(
+        select(CatalogMeta.key, CatalogMeta.value)
+        .where(CatalogMeta.key.startswith(DOCS_FINGERPRINT_KEY))
+    ).all())
+
+def refresh_catalog(session, path=DOCS_PATH, force=False):
+    """
+    Bring the catalog in line with Docs.json without touching user state, and commit.
+
+    Nothing is read past the file fingerprint when Docs.json is byte-identical
+    to the last refresh, and nothing is written when none of the ETL's sections
+    changed (a patch that only touched schematics, say). Otherwise items,
+    buildings and recipes are upserted by class name, only the production lines
+    whose chains touch an added, changed or removed recipe get their factories
+    rebuilt, and unit costs and the ETL generation are renewed. Groups, lines and
+    resource nodes are never dropped.
+
+    Everything, including the stored fingerprints, unit costs and the new
+    generation, is written in one transaction, so a refresh that fails part way
+    leaves the previous catalog and fingerprints in place and simply runs again.
+    Nothing is printed; phase timings are returned in CatalogRefresh.phases.
+
+    Args:
+        session: An active SQLAlchemy Session on a database with the current schema.
+        path: Path of Docs.json.
+        force: Diff every section even if the fingerprints are unchanged.
+
+    Returns:
+        CatalogRefresh.
+    """
+    phases = []
+    stored = _stored_fingerprints(session)
+    with _phase(phases, "fingerprint"):
+        fingerprint = fingerprint_file(path)
+    if not force and stored.get(DOCS_FINGERPRINT_KEY) == fingerprint:
+        return CatalogRefresh(fingerprint, [], {}, [], [], phases)
+
+    with _phase(phases, "read docs"):
+        docs = read_docs(path)
+    sections = [
+        section for section, digest in docs.fingerprints.items()
+        if force or stored.get(f"{DOCS_FINGERPRINT_KEY}:{section}") != digest
+    ]
+    refresh = CatalogRefresh(fingerprint, sections, {}, [], [], phases)
+    if sections:
+        with _phase(phases, "items"):
+            refresh.diff["items"], item_ids = sync_items(session, docs.items)
+        with _phase(phases, "recipes"):
+            refresh.diff["buildings"], refresh.diff["recipes"], touched = sync_recipes(
+                session, docs.recipes, item_ids, docs.building_power
+            )
+            refresh.kept_items.extend(delete_removed_items(session, refresh.diff["items"].removed))
+    if refresh.catalog_changed:
+        graph = RecipeGraph.from_session(session)
+        with _phase(phases, "lines"):
+            refresh.rebuilt_lines.extend(rebuild_lines_for_recipes(session, graph, touched))
+        with _phase(phases, "unit costs"):
+            build_unit_costs(session, graph)
+        new_etl_generation(session)
+
+    for key, value in ((DOCS_FINGERPRINT_KEY, fingerprint), *(
+        (f"{DOCS_FINGERPRINT_KEY}:{section}", digest)
+        for section, digest in docs.fingerprints.items()
+    )):
+        session.merge(CatalogMeta(key=key, value=value))
     session.commit()
 
-    load_recipes(session, data)
-    load_building_power(session, data)
+    if refresh.catalog_changed:
+        group_summaries.clear(session.get_bind())
+    return refresh
 
-    items = session.query(Item).all()
-    print(f"✅ Loaded {len(items)} items")
-    print(f"Example: {items[0].name} - {items[0].class_name}")
+@contextmanager
+def _phase(phases: list[PhaseTiming], name: str) -> Iterator[None]:
+    """Append a phase's wall time and SQL statement count to `phases` when it finishes."""
+    start = time.perf_counter()
+    with record_queries() as stats:
+        yield
+    phases.append(PhaseTiming(name, (time.perf_counter() - start) * 1000, stats.count))
 
-    recipes = session.query(Recipe).all()
-    print(f"✅ Loaded {len(recipes)} recipes")
-    print(f"Example: {recipes[0].name} - {recipes[0].crafting_time}")
+def _print_phases(phases):
+    for phase in phases:
+        print(f"  {phase.name:<12}{phase.ms:>9.1f} ms{phase.statements:>6} statements")
 
-    print("✅ ETL Complete!")
+def _print_refresh(refresh, limit=8):
+    _print_phases(refresh.phases)
+    if not refresh.sections:
+        print(f"Docs.json ETL sections unchanged (sha256 {refresh.fingerprint[:12]}), nothing to do")
+        return
+    print(f"Changed sections: {', '.join(refresh.sections)}")
+    for table, diff in refresh.diff.items():
+        print(f"  {table:<10}{diff!s:>16}")
+        for label, names in (("added", diff.added), ("changed", diff.changed),
+                             ("removed", diff.removed)):
+            if names:
+                more = f" (+{len(names) - limit} more)" if len(names) > limit else ""
+                print(f"    {label}: {', '.join(names[:limit])}{more}")
+    if refresh.kept_items:
+        print(f"Kept {len(refresh.kept_items)} removed item(s) still used by lines or nodes")
+    print(f"Rebuilt factories for {len(refresh.rebuilt_lines)} production line(s)")
 
-    session.close()
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Load Docs.json into the database, updating only what changed."
+    )
+    parser.add_argument("--docs", default=DOCS_PATH, help="path to Docs.json (default: %(default)s)")
+    parser.add_argument("--force", action="store_true",
+                        help="diff every section even if the fingerprints are unchanged")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    phases = []
+    with record_queries() as stats:
+        engine = get_engine(os.getenv('DATABASE_URL'))
+        with _phase(phases, "schema"):
+            upgrade_schema(engine)
+        _print_phases(phases)
+        with get_session(engine) as session:
+            refresh = refresh_catalog(session, args.docs, force=args.force)
+        generation = get_etl_generation(engine)
+
+    _print_refresh(refresh)
+    print(f"ETL generation {generation}")
+    print(
+        f"✅ ETL Complete in {time.perf_counter() - started:.2f} s, "
+        f"{stats.count} SQL statements ({stats.total_ms:.1f} ms in SQL)"
+    )
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
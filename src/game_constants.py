@@ -15,6 +15,41 @@ PURITY_MULTIPLIER: dict[str, float] = {
     "PURE": 2.0,
 }
 
+# Extractable resources (FGResourceDescriptor classes). Solvers treat these as raw
+# supply even when an unpackaging recipe technically "produces" them.
+RESOURCE_CLASS_NAMES: frozenset[str] = frozenset({
+    "Desc_Water_C",
+    "Desc_OreIron_C",
+    "Desc_Stone_C",
+    "Desc_Coal_C",
+    "Desc_Sulfur_C",
+    "Desc_LiquidOil_C",
+    "Desc_RawQuartz_C",
+    "Desc_OreCopper_C",
+    "Desc_OreGold_C",
+    "Desc_OreUranium_C",
+    "Desc_NitrogenGas_C",
+    "Desc_OreBauxite_C",
+})
+
+# Approximate map-wide extraction limits (items/min, Update 8) used to weight raw
+# resources by scarcity. Fluids are in the ETL's recipe units (1 m3 = 1000), and
+# Water is effectively unlimited.
+RESOURCE_MAP_LIMITS: dict[str, float] = {
+    "Desc_OreIron_C": 92_100.0,
+    "Desc_Stone_C": 69_300.0,
+    "Desc_Coal_C": 42_300.0,
+    "Desc_OreCopper_C": 36_900.0,
+    "Desc_OreGold_C": 15_000.0,
+    "Desc_RawQuartz_C": 13_500.0,
+    "Desc_OreBauxite_C": 12_300.0,
+    "Desc_Sulfur_C": 10_800.0,
+    "Desc_OreUranium_C": 2_100.0,
+    "Desc_LiquidOil_C": 12_600_000.0,
+    "Desc_NitrogenGas_C": 12_000_000.0,
+    "Desc_Water_C": float("inf"),
+}
+
 # Conveyor belts: tier name and max items/min throughput.
 BELT_TIERS: list[tuple[str, float]] = [
     ("Mk1", 60.0),
@@ -0,0 +1,300 @@
+"""
+Immutable in-memory snapshot of the recipe graph.
+
+`RecipeGraph` reads items, buildings, recipes and ingredients out of the ETL tables
+in a fixed handful of column-only SELECTs, then answers every calculator lookup from
+plain tuples. It holds no ORM instances and no Session, and nothing on it is mutated
+after construction, so a single instance can be shared freely across Streamlit
+sessions and worker threads.
+"""
+
+import hashlib
+import threading
+import weakref
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import NamedTuple
+
+from sqlalchemy import Connection, Engine, select
+from sqlalchemy.orm import Session
+
+from .database import Building, Item, Recipe, RecipeIngredient, get_etl_generation
+
+SECONDS_PER_MINUTE = 60
+
+
+class Flow(NamedTuple):
+    """One ingredient or product of a recipe, with its per-building rate."""
+    item_id: int
+    item_name: str
+    quantity: int
+    rate: float                       # items/min for one building at 100% clock
+
+
+class RecipeSpec(NamedTuple):
+    """Session-free view of a Recipe with everything the calculator reads."""
+    id: int
+    name: str
+    crafting_time: float
+    building_id: int
+    building_name: str
+    building_power_mw: float
+    inputs: tuple[Flow, ...]
+    outputs: tuple[Flow, ...]
+
+    @classmethod
+    def from_orm(cls, recipe: Recipe) -> "RecipeSpec":
+        """Snapshot an ORM Recipe (lazy-loads its ingredients and building)."""
+        inputs: list[Flow] = []
+        outputs: list[Flow] = []
+        for ing in recipe.ingredients:
+            flow = Flow(
+                ing.item_id,
+                ing.item.name,
+                ing.quantity,
+                _rate_per_minute(recipe.crafting_time, ing.quantity),
+            )
+            (outputs if ing.is_output else inputs).append(flow)
+        return cls(
+            id=recipe.id,
+            name=recipe.name,
+            crafting_time=recipe.crafting_time,
+            building_id=recipe.building.id,
+            building_name=recipe.building.name,
+            building_power_mw=recipe.building.power_mw or 0.0,
+            inputs=tuple(inputs),
+            outputs=tuple(outputs),
+        )
+
+
+def _rate_per_minute(crafting_time: float, quantity: int) -> float:
+    """Items per minute produced by one building at 100% clock for this recipe."""
+    return (SECONDS_PER_MINUTE / crafting_time) * quantity
+
+
+class RecipeGraph:
+    """
+    Integer-indexed, read-only recipe graph.
+
+    Items and recipes are stored in dense index order (sorted by primary key).
+    `producers[i]` lists the recipe indices that output item index `i`, in recipe-id
+    order so that `recipes_for(item_id)[0]` is the same default recipe that
+    `get_recipes_for_item` returns first. `net_rates[r]` is recipe `r`'s sparse
+    per-building rate vector: `(item_index, items/min)` pairs, negative for inputs.
+    """
+
+    __slots__ = (
+        "item_ids",
+        "item_names",
+        "item_class_names",
+        "item_index",
+        "recipes",
+        "recipe_index",
+        "producers",
+        "net_rates",
+        "version",
+    )
+
+    item_ids: tuple[int, ...]
+    item_names: tuple[str, ...]
+    item_class_names: tuple[str, ...]
+    item_index: Mapping[int, int]
+    recipes: tuple[RecipeSpec, ...]
+    recipe_index: Mapping[int, int]
+    producers: tuple[tuple[int, ...], ...]
+    net_rates: tuple[tuple[tuple[int, float], ...], ...]
+    version: str
+
+    def __init__(
+        self,
+        items: list[tuple[int, str, str]],
+        recipes: list[RecipeSpec],
+    ) -> None:
+        """
+        Args:
+            items: (id, class_name, name) rows for every item.
+            recipes: RecipeSpecs for every recipe. Order does not matter.
+        """
+        items = sorted(items)
+        recipes = sorted(recipes, key=lambda r: r.id)
+
+        set_ = object.__setattr__
+        set_(self, "item_ids", tuple(row[0] for row in items))
+        set_(self, "item_class_names", tuple(row[1] for row in items))
+        set_(self, "item_names", tuple(row[2] for row in items))
+        item_index = {item_id: idx for idx, item_id in enumerate(self.item_ids)}
+        set_(self, "item_index", MappingProxyType(item_index))
+        set_(self, "recipes", tuple(recipes))
+        set_(self, "recipe_index", MappingProxyType({r.id: idx for idx, r in enumerate(recipes)}))
+
+        producers: list[list[int]] = [[] for _ in items]
+        net_rates: list[tuple[tuple[int, float], ...]] = []
+        for r_idx, recipe in enumerate(recipes):
+            vector: dict[int, float] = {}
+            for flow in recipe.inputs:
+                i_idx = item_index[flow.item_id]
+                vector[i_idx] = vector.get(i_idx, 0.0) - flow.rate
+            for flow in recipe.outputs:
+                i_idx = item_index[flow.item_id]
+                vector[i_idx] = vector.get(i_idx, 0.0) + flow.rate
+                if r_idx not in producers[i_idx]:
+                    producers[i_idx].append(r_idx)
+            net_rates.append(tuple(sorted(vector.items())))
+        set_(self, "producers", tuple(tuple(p) for p in producers))
+        set_(self, "net_rates", tuple(net_rates))
+
+        digest = hashlib.sha1(repr((items, recipes)).encode("utf-8"))
+        set_(self, "version", digest.hexdigest()[:16])
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError("RecipeGraph is immutable")
+
+    def __repr__(self) -> str:
+        return (
+            f"RecipeGraph(items={len(self.item_ids)}, recipes={len(self.recipes)}, "
+            f"version={self.version!r})"
+        )
+
+    @classmethod
+    def from_session(cls, session: Session) -> "RecipeGraph":
+        """Build a snapshot from the ETL tables using four column-only SELECTs."""
+        items = [
+            (row.id, row.class_name, row.name)
+            for row in session.execute(select(Item.id, Item.class_name, Item.name))
+        ]
+        item_names = {item_id: name for item_id, _, name in items}
+        buildings = {
+            row.id: (row.name, row.power_mw or 0.0)
+            for row in session.execute(select(Building.id, Building.name, Building.power_mw))
+        }
+
+        flows: dict[int, tuple[list[Flow], list[Flow]]] = {}
+        recipe_rows = session.execute(
+            select(Recipe.id, Recipe.name, Recipe.crafting_time, Recipe.building_id)
+        ).all()
+        crafting_times = {row.id: row.crafting_time for row in recipe_rows}
+        for ingredient in session.execute(
+            select(
+                RecipeIngredient.recipe_id,
+                RecipeIngredient.item_id,
+                RecipeIngredient.quantity,
+                RecipeIngredient.is_output,
+            ).order_by(RecipeIngredient.id)
+        ):
+            if ingredient.recipe_id not in crafting_times:
+                continue
+            flow = Flow(
+                ingredient.item_id,
+                item_names.get(ingredient.item_id, f"item_{ingredient.item_id}"),
+                ingredient.quantity,
+                _rate_per_minute(crafting_times[ingredient.recipe_id], ingredient.quantity),
+            )
+            inputs, outputs = flows.setdefault(ingredient.recipe_id, ([], []))
+            (outputs if ingredient.is_output else inputs).append(flow)
+
+        recipes = []
+        for row in recipe_rows:
+            building_name, power = buildings.get(row.building_id, ("", 0.0))
+            inputs, outputs = flows.get(row.id, ([], []))
+            recipes.append(RecipeSpec(
+                id=row.id,
+                name=row.name,
+                crafting_time=row.crafting_time,
+                building_id=row.building_id,
+                building_name=building_name,
+                building_power_mw=power,
+                inputs=tuple(inputs),
+                outputs=tuple(outputs),
+            ))
+        return cls(items, recipes)
+
+    # --- Lookups ---
+
+    @property
+    def item_count(self) -> int:
+        return len(self.item_ids)
+
+    @property
+    def recipe_count(self) -> int:
+        return len(self.recipes)
+
+    def has_item(self, item_id: int) -> bool:
+        return item_id in self.item_index
+
+    def item_name(self, item_id: int) -> str:
+        """Display name for an item, or `item_<id>` if it isn't in the snapshot."""
+        idx = self.item_index.get(item_id)
+        return self.item_names[idx] if idx is not None else f"item_{item_id}"
+
+    def recipe(self, recipe_id: int) -> RecipeSpec | None:
+        idx = self.recipe_index.get(recipe_id)
+        return self.recipes[idx] if idx is not None else None
+
+    def recipes_for(self, item_id: int) -> tuple[RecipeSpec, ...]:
+        """Recipes that output `item_id`, default (lowest id) first. Empty for raw items."""
+        idx = self.item_index.get(item_id)
+        if idx is None:
+            return ()
+        return tuple(self.recipes[r] for r in self.producers[idx])
+
+
+# --- Process-wide snapshot registry ---
+
+class _Snapshot(NamedTuple):
+    generation: str                   # ETL generation the graph was loaded under
+    graph: RecipeGraph
+
+
+_graphs: "weakref.WeakKeyDictionary[Engine | Connection, _Snapshot]" = (
+    weakref.WeakKeyDictionary()
+)
+_graphs_lock = threading.Lock()
+
+
+def load_recipe_graph(
+    engine: Engine | Connection, session: Session | None = None
+) -> RecipeGraph:
+    """
+    Return the shared RecipeGraph for `engine`'s current ETL generation.
+
+    Every call reads the generation id (one single-row SELECT) and reloads the
+    graph when the ETL has run since it was built, in this process or another.
+    Safe to call from several threads at once; only one of them pays for a load.
+
+    Args:
+        engine: The engine (or connection) the graph is shared per.
+        session: Read the generation, and load the graph if needed, inside this
+            session's transaction rather than on a connection of its own.
+    """
+    generation = get_etl_generation(session if session is not None else engine)
+    with _graphs_lock:
+        snapshot = _graphs.get(engine)
+        if snapshot is None or snapshot.generation != generation:
+            if session is not None:
+                graph = RecipeGraph.from_session(session)
+            else:
+                with Session(engine) as own_session:
+                    graph = RecipeGraph.from_session(own_session)
+            snapshot = _graphs[engine] = _Snapshot(generation, graph)
+        return snapshot.graph
+
+
+def as_recipe_graph(source: Session | RecipeGraph) -> RecipeGraph:
+    """`source` itself if it is a RecipeGraph, else the shared graph for its engine."""
+    if isinstance(source, RecipeGraph):
+        return source
+    return load_recipe_graph(source.get_bind(), source)
+
+
+def invalidate_recipe_graph(engine: Engine | Connection | None = None) -> None:
+    """
+    Drop the cached snapshot for `engine` (or for every engine).
+
+    Not needed after an ETL run, which changes the generation; use it when the
+    catalog tables were edited some other way.
+    """
+    with _graphs_lock:
+        if engine is None:
+            _graphs.clear()
+        else:
+            _graphs.pop(engine, None)
@@ -0,0 +1,190 @@
+"""
+Incremental chain recomputation for recipe switches.
+
+Switching the recipe of one item only changes the subtrees rooted at that item's
+nodes. `IncrementalChain` keeps the last calculated chain together with an index of
+where each item occurs in it (item_id -> paths of dependency keys from the root), so
+a switch:
+
+- rebuilds just those subtrees, seeded with their ancestors as the cycle-cut path,
+- copies the nodes on the way up to the root and re-merges their raw materials,
+  byproducts, buildings and power from their children, in input order,
+- shares every untouched subtree with the previous chain, which stays valid.
+
+The result equals `calculate_chain` with the new preferences, down to the float
+rounding, because every re-merged node sums the same children in the same order.
+"""
+
+from sqlalchemy.orm import Session
+
+from .calculator import ChainResolver, calculate_chain, merge_sum, walk_tree
+from .graph import RecipeGraph
+from .schemas import ProductionNode
+
+NodePath = tuple[str, ...]
+
+
+class IncrementalChain:
+    """
+    A calculated production chain that can switch recipes without a full recompute.
+
+    Args:
+        source: A RecipeGraph, or an active Session (as for calculate_chain).
+        item_id: Item to produce.
+        target_rate: Desired output rate in items/min.
+        preferred_recipes: Optional map of {item_id: recipe_id}. Copied.
+    """
+
+    def __init__(
+        self,
+        source: Session | RecipeGraph,
+        item_id: int,
+        target_rate: float,
+        preferred_recipes: dict[int, int] | None = None,
+    ) -> None:
+        self.source = source
+        self.item_id = item_id
+        self.target_rate = target_rate
+        self._preferred = dict(preferred_recipes or {})
+        self.root: ProductionNode = calculate_chain(
+            source, item_id, target_rate, preferred_recipes=self._preferred
+        )
+        self._index: dict[int, list[NodePath]] = {}
+        self._add_to_index(self.root, ())
+
+    @property
+    def preferred_recipes(self) -> dict[int, int]:
+        return dict(self._preferred)
+
+    def paths(self, item_id: int) -> list[NodePath]:
+        """Dependency-key paths from the root to every node of an item."""
+        return list(self._index.get(item_id, ()))
+
+    def update(self, preferred_recipes: dict[int, int]) -> ProductionNode:
+        """
+        Move to a new set of preferences, switching only the items that differ.
+
+        Returns:
+            The new root node.
+        """
+        changed = {
+            item_id
+            for item_id in self._preferred.keys() | preferred_recipes.keys()
+            if self._preferred.get(item_id) != preferred_recipes.get(item_id)
+        }
+        self._preferred = dict(preferred_recipes)
+        return self._recompute(changed)
+
+    def switch_recipe(self, item_id: int, recipe_id: int | None) -> ProductionNode:
+        """
+        Use `recipe_id` for `item_id` (None restores the default) and recompute only
+        the subtrees under that item's nodes.
+
+        Returns:
+            The new root node. The previous root is left unchanged.
+        """
+        if recipe_id is None:
+            self._preferred.pop(item_id, None)
+        else:
+            self._preferred[item_id] = recipe_id
+        return self._recompute({item_id})
+
+    def _recompute(self, items: set[int]) -> ProductionNode:
+        resolver = ChainResolver(self.source, self._preferred)
+        replacements: dict[NodePath, ProductionNode] = {}
+        for item_id in items:
+            for path in self._index.get(item_id, ()):
+                if any(path[:n] in replacements for n in range(len(path))):
+                    continue  # already inside a rebuilt subtree
+                node = self._node_at(path)
+                if node["is_raw_material"]:
+                    continue  # no recipe, or cut on a cycle - stays raw either way
+                new_recipe = resolver.recipes[resolver.slot(item_id)]
+                if new_recipe is not None and new_recipe.id == node["recipe"]["recipe_id"]:
+                    continue
+                ancestors = 0
+                for ancestor in self._ancestors(path):
+                    ancestors |= 1 << resolver.slot(ancestor["item_id"])
+                replacements[path] = walk_tree(
+                    resolver, resolver.slot(item_id), node["required_rate"], ancestors
+                )
+        if not replacements:
+            return self.root
+
+        # A rebuilt subtree may contain an earlier replacement target; keep the outermost.
+        for path in [p for p in replacements if any(p[:n] in replacements for n in range(len(p)))]:
+            del replacements[path]
+
+        self.root = _rebuild(self.root, replacements)
+        self._index = {
+            item_id: kept
+            for item_id, paths in self._index.items()
+            if (kept := [p for p in paths if not _under_any(p, replacements)])
+        }
+        for path, node in replacements.items():
+            self._add_to_index(node, path)
+        return self.root
+
+    def _node_at(self, path: NodePath) -> ProductionNode:
+        node = self.root
+        for key in path:
+            node = node["dependencies"][key]
+        return node
+
+    def _ancestors(self, path: NodePath) -> list[ProductionNode]:
+        nodes = [self.root]
+        for key in path[:-1]:
+            nodes.append(nodes[-1]["dependencies"][key])
+        return nodes if path else []
+
+    def _add_to_index(self, node: ProductionNode, path: NodePath) -> None:
+        stack = [(node, path)]
+        while stack:
+            current, current_path = stack.pop()
+            self._index.setdefault(current["item_id"], []).append(current_path)
+            for key, child in current.get("dependencies", {}).items():
+                stack.append((child, current_path + (key,)))
+
+
+def _under_any(path: NodePath, prefixes: dict[NodePath, ProductionNode]) -> bool:
+    return any(path[:n] in prefixes for n in range(len(path) + 1))
+
+
+def _rebuild(root: ProductionNode, replacements: dict[NodePath, ProductionNode]) -> ProductionNode:
+    """
+    Copy the nodes on the paths to `replacements`, substitute the rebuilt subtrees,
+    and re-derive each copied node's totals from its own recipe and its children.
+    """
+    if () in replacements:
+        return replacements[()]
+    on_path = {path[:n] for path in replacements for n in range(len(path))}
+    copies: dict[NodePath, ProductionNode] = {}
+
+    # Deepest first, so every copied child is final before its parent is re-merged.
+    for path in sorted(on_path, key=len, reverse=True):
+        node = root
+        for key in path:
+            node = node["dependencies"][key]
+        requirements = node["recipe"]
+        copy: ProductionNode = {
+            **node,
+            "dependencies": {},
+            "raw_materials": {},
+            "byproducts_totals": {
+                bp["item_name"]: bp["rate"] for bp in requirements["byproducts"]
+            },
+            "building_summary": {
+                requirements["building_name"]: requirements["num_buildings_ideal"]
+            },
+            "power_mw_total": requirements["total_power_mw"],
+        }
+        for key, child in node["dependencies"].items():
+            child_path = path + (key,)
+            child = replacements.get(child_path) or copies.get(child_path) or child
+            copy["dependencies"][key] = child
+            merge_sum(copy["raw_materials"], child["raw_materials"])
+            merge_sum(copy["byproducts_totals"], child["byproducts_totals"])
+            merge_sum(copy["building_summary"], child["building_summary"])
+            copy["power_mw_total"] += child["power_mw_total"]
+        copies[path] = copy
+    return copies[()]
@@ -0,0 +1,158 @@
+"""
+SQL statement counting and timing.
+
+`get_engine` instruments every engine it builds: `before_cursor_execute` /
+`after_cursor_execute` listeners time each statement and hand it to whatever
+recorders are active in the current thread (or asyncio task). Nothing is stored
+while no recorder is active, so the listeners cost two clock reads per statement.
+
+    with record_queries() as stats:
+        get_global_summary(session)
+    assert stats.count <= 5
+    stats.slowest(3)         # [QueryRecord(statement, duration_ms, caller), ...]
+
+Each statement is attributed to the innermost calling function in one of
+ATTRIBUTED_MODULES (the query and production layers), e.g.
+"queries.get_all_groups", so a page rerun can be broken down by data-layer call.
+The dashboard's "Performance" panel renders the same numbers.
+"""
+
+import contextvars
+import math
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from types import FrameType
+from typing import NamedTuple
+
+from sqlalchemy import Connection, Engine, event
+
+# Modules whose functions statements are attributed to (innermost frame wins).
+ATTRIBUTED_MODULES = ("src.queries", "src.production")
+UNATTRIBUTED = "<other>"
+# Set on the statement's ExecutionContext, which is discarded with the statement
+# whether or not it succeeds.
+_START_ATTR = "_instrumentation_start"
+
+
+class QueryRecord(NamedTuple):
+    statement: str
+    duration_ms: float
+    caller: str
+
+
+class CallerStats(NamedTuple):
+    statements: int
+    total_ms: float
+
+
+class QueryStats:
+    """Statements recorded by one `record_queries` block, in execution order."""
+
+    def __init__(self) -> None:
+        self.records: list[QueryRecord] = []
+
+    def __repr__(self) -> str:
+        return (
+            f"QueryStats(count={self.count}, total_ms={self.total_ms:.2f}, "
+            f"p95_ms={self.p95_ms:.2f})"
+        )
+
+    @property
+    def count(self) -> int:
+        return len(self.records)
+
+    @property
+    def total_ms(self) -> float:
+        return sum(r.duration_ms for r in self.records)
+
+    @property
+    def p95_ms(self) -> float:
+        """95th-percentile statement time (nearest rank); 0.0 if nothing ran."""
+        if not self.records:
+            return 0.0
+        durations = sorted(r.duration_ms for r in self.records)
+        return durations[math.ceil(0.95 * len(durations)) - 1]
+
+    @property
+    def statements(self) -> list[str]:
+        return [r.statement for r in self.records]
+
+    def slowest(self, n: int = 5) -> list[QueryRecord]:
+        """The `n` slowest statements, slowest first."""
+        return sorted(self.records, key=lambda r: -r.duration_ms)[:n]
+
+    def by_caller(self) -> dict[str, CallerStats]:
+        """Statement count and total time per attributed caller, most expensive first."""
+        totals: dict[str, list] = {}
+        for r in self.records:
+            entry = totals.setdefault(r.caller, [0, 0.0])
+            entry[0] += 1
+            entry[1] += r.duration_ms
+        return {
+            caller: CallerStats(count, total_ms)
+            for caller, (count, total_ms) in sorted(totals.items(), key=lambda kv: -kv[1][1])
+        }
+
+
+_active: contextvars.ContextVar[tuple[QueryStats, ...]] = contextvars.ContextVar(
+    "active_query_stats", default=()
+)
+
+
+def _caller() -> str:
+    """`module.function` of the innermost frame in ATTRIBUTED_MODULES."""
+    frame: FrameType | None = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module in ATTRIBUTED_MODULES:
+            return f"{module.rsplit('.', 1)[-1]}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return UNATTRIBUTED
+
+
+def _before_cursor_execute(conn: Connection, cursor, statement, parameters, context, many):
+    if _active.get() and context is not None:
+        setattr(context, _START_ATTR, time.perf_counter())
+
+
+def _after_cursor_execute(conn: Connection, cursor, statement, parameters, context, many):
+    recorders = _active.get()
+    start = getattr(context, _START_ATTR, None)
+    if not recorders or start is None:
+        return
+    record = QueryRecord(statement, (time.perf_counter() - start) * 1000, _caller())
+    for stats in recorders:
+        stats.records.append(record)
+
+
+def instrument(engine: Engine) -> Engine:
+    """Attach the timing listeners to `engine` (idempotent). Returns the engine."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    return engine
+
+
+@contextmanager
+def record_queries(engine: Engine | None = None) -> Iterator[QueryStats]:
+    """
+    Record every statement run in this thread inside the block.
+
+    Args:
+        engine: An engine not built by `get_engine` to instrument first. Engines
+            from `get_engine` / `shared_engine` are already instrumented.
+
+    Yields:
+        A QueryStats that fills in as statements run. Blocks may nest; each sees
+        the statements run inside it.
+    """
+    if engine is not None:
+        instrument(engine)
+    stats = QueryStats()
+    token = _active.set((*_active.get(), stats))
+    try:
+        yield stats
+    finally:
+        _active.reset(token)
@@ -0,0 +1,237 @@
+"""
+Linear-algebra chain solver.
+
+Builds the item x recipe net-production matrix for the recipes a chain uses and
+solves for every recipe's activity level (ideal building count) in one vectorized
+NumPy solve. Unlike the tree and DAG calculators, which cut a cycle by treating the
+repeated item as raw, this closes recipe loops exactly (Recycled Rubber/Plastic) and
+nets byproducts against consumption anywhere in the chain (e.g. water from
+Aluminum Scrap feeding Alumina Solution).
+
+Extractable resources (`RESOURCE_CLASS_NAMES`) are raw supply unless the caller
+explicitly prefers a recipe for them. Unproductive loops - package/unpackage pairs
+that make nothing on net - leave the system singular; those are cut the same way
+the DAG calculator cuts cycles, by turning the repeated item into raw supply.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from .calculator import power_for, whole_buildings
+from .game_constants import RESOURCE_CLASS_NAMES
+from .graph import RecipeGraph, as_recipe_graph
+from .schemas import ChainTotals, RecipeTotal
+
+# Activities/balances smaller than this (relative to the target rate) are noise.
+_TOLERANCE = 1e-9
+# Condition numbers above this are treated as a singular (unproductive) loop.
+_MAX_CONDITION = 1e12
+
+
+def discover(
+    graph: RecipeGraph,
+    target: int,
+    preferred: dict[int, int],
+    raw: set[int],
+) -> tuple[dict[int, int | None], list[int], list[int], dict[int, int]]:
+    """
+    Depth-first walk over the chosen recipes from `target` (all item indices).
+
+    Returns (chosen recipe per item or None for raw, preorder, cycle-closing items in
+    discovery order, longest-path depth per item ignoring cycle-closing edges).
+    """
+    chosen: dict[int, int | None] = {}
+    preorder: list[int] = []
+    postorder: list[int] = []
+    back_edges: list[tuple[int, int]] = []
+
+    def resolve(idx: int) -> list[int]:
+        producers = graph.producers[idx]
+        recipe_idx: int | None = None
+        if producers and idx not in raw:
+            wanted = preferred.get(graph.item_ids[idx])
+            recipe_idx = next(
+                (r for r in producers if graph.recipes[r].id == wanted), producers[0]
+            )
+        chosen[idx] = recipe_idx
+        preorder.append(idx)
+        if recipe_idx is None:
+            return []
+        return [i for i, rate in graph.net_rates[recipe_idx] if rate < 0]
+
+    on_stack = {target}
+    stack = [(target, iter(resolve(target)))]
+    while stack:
+        idx, children = stack[-1]
+        for child in children:
+            if child in on_stack:
+                back_edges.append((idx, child))
+            elif child not in chosen:
+                on_stack.add(child)
+                stack.append((child, iter(resolve(child))))
+                break
+        else:
+            stack.pop()
+            on_stack.discard(idx)
+            postorder.append(idx)
+
+    cut = set(back_edges)
+    depth = dict.fromkeys(postorder, 0)
+    for idx in reversed(postorder):
+        recipe_idx = chosen[idx]
+        if recipe_idx is None:
+            continue
+        for child, rate in graph.net_rates[recipe_idx]:
+            if rate < 0 and (idx, child) not in cut:
+                depth[child] = max(depth[child], depth[idx] + 1)
+    return chosen, preorder, [child for _, child in back_edges], depth
+
+
+def solve_chain(
+    source: Session | RecipeGraph,
+    item_id: int,
+    target_rate: float,
+    *,
+    preferred_recipes: dict[int, int] | None = None,
+) -> ChainTotals:
+    """
+    Solve a production chain as a linear system.
+
+    Args:
+        source: A RecipeGraph, or a Session whose engine's shared graph is used.
+        item_id: Item to produce.
+        target_rate: Desired net output rate in items/min.
+        preferred_recipes: Optional map of {item_id: recipe_id}, as for calculate_chain.
+
+    Returns:
+        ChainTotals. `raw_materials` is the net external supply needed and
+        `byproducts_totals` the net surplus, both after byproducts have been
+        credited against consumption. `item_rates` is each item's gross consumption
+        (target demand included).
+    """
+    graph = as_recipe_graph(source)
+    preferred = preferred_recipes or {}
+    target = graph.item_index.get(item_id)
+    if target is None:
+        name = graph.item_name(item_id)
+        return {
+            "item_id": item_id,
+            "item_name": name,
+            "required_rate": target_rate,
+            "is_raw_material": True,
+            "item_rates": {name: target_rate},
+            "recipe_totals": [],
+            "raw_materials": {name: target_rate},
+            "byproducts_totals": {},
+            "building_summary": {},
+            "power_mw_total": 0.0,
+        }
+
+    raw = {
+        idx for idx, class_name in enumerate(graph.item_class_names)
+        if class_name in RESOURCE_CLASS_NAMES and graph.item_ids[idx] not in preferred
+    }
+    tolerance = _TOLERANCE * max(1.0, abs(target_rate))
+
+    while True:
+        chosen, preorder, cycle_items, depth = discover(graph, target, preferred, raw)
+
+        # Columns: each chosen recipe once. Its pivot row is the first item that chose it;
+        # any other item sharing that recipe is left unbalanced (surplus or deficit).
+        pivots: dict[int, int] = {}
+        for idx in preorder:
+            recipe_idx = chosen[idx]
+            if recipe_idx is not None and recipe_idx not in pivots:
+                pivots[recipe_idx] = idx
+        columns = list(pivots)
+        rows = list(dict.fromkeys(
+            [target] + [i for r in columns for i, _ in graph.net_rates[r]]
+        ))
+        row_of = {idx: n for n, idx in enumerate(rows)}
+
+        matrix = np.zeros((len(rows), len(columns)))
+        for col, recipe_idx in enumerate(columns):
+            for idx, rate in graph.net_rates[recipe_idx]:
+                matrix[row_of[idx], col] = rate
+        demand = np.zeros(len(rows))
+        demand[row_of[target]] = target_rate
+
+        active = list(range(len(columns)))
+        activity: np.ndarray = np.zeros(len(columns))
+        singular = False
+        while active:
+            balanced = [row_of[pivots[columns[c]]] for c in active]
+            system = matrix[np.ix_(balanced, active)]
+            if np.linalg.cond(system) > _MAX_CONDITION:
+                singular = True
+                break
+            solution = np.linalg.solve(system, demand[balanced])
+            negative = [c for c, x in zip(active, solution, strict=True) if x < -tolerance]
+            if not negative:
+                activity[active] = np.maximum(solution, 0.0)
+                break
+            # Byproducts already oversupply these recipes' items: switch them off.
+            active = [c for c in active if c not in negative]
+
+        remaining = [i for i in cycle_items if i not in raw]
+        if singular and remaining:
+            raw.add(remaining[0])
+            continue
+        if singular:
+            activity, *_ = np.linalg.lstsq(matrix, demand, rcond=None)
+            activity = np.maximum(activity, 0.0)
+        break
+
+    net = matrix @ activity - demand
+    consumption = -np.minimum(matrix, 0.0) @ activity + demand
+    balanced_rows = {row_of[pivots[columns[c]]] for c in range(len(columns)) if activity[c] > 0}
+
+    raw_materials: dict[str, float] = {}
+    byproducts_totals: dict[str, float] = {}
+    for n, idx in enumerate(rows):
+        if n in balanced_rows:
+            continue
+        if net[n] < -tolerance:
+            raw_materials[graph.item_names[idx]] = float(-net[n])
+        elif net[n] > tolerance:
+            byproducts_totals[graph.item_names[idx]] = float(net[n])
+
+    building_summary: dict[str, float] = defaultdict(float)
+    recipe_totals: list[RecipeTotal] = []
+    for col, recipe_idx in enumerate(columns):
+        num_ideal = float(activity[col])
+        if num_ideal <= tolerance:
+            continue
+        recipe = graph.recipes[recipe_idx]
+        num_rounded = whole_buildings(num_ideal)
+        clock_speed = 100.0 * num_ideal / num_rounded
+        building_summary[recipe.building_name] += num_ideal
+        recipe_totals.append({
+            "recipe_id": recipe.id,
+            "recipe_name": recipe.name,
+            "building_name": recipe.building_name,
+            "num_buildings_ideal": num_ideal,
+            "num_buildings_rounded": num_rounded,
+            "clock_speed": clock_speed,
+            "total_power_mw": power_for(recipe.building_power_mw, num_rounded, clock_speed),
+            "depth": depth.get(pivots[recipe_idx], 0),
+        })
+    recipe_totals.sort(key=lambda r: -r["depth"])
+
+    return {
+        "item_id": item_id,
+        "item_name": graph.item_names[target],
+        "required_rate": target_rate,
+        "is_raw_material": chosen[target] is None,
+        "item_rates": {
+            graph.item_names[idx]: float(consumption[n])
+            for n, idx in enumerate(rows) if consumption[n] > tolerance
+        },
+        "recipe_totals": recipe_totals,
+        "raw_materials": raw_materials,
+        "byproducts_totals": byproducts_totals,
+        "building_summary": dict(building_summary),
+        "power_mw_total": sum(r["total_power_mw"] for r in recipe_totals),
+    }
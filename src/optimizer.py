@@ -0,0 +1,350 @@
+"""
+Alternate-recipe optimizer.
+
+Chooses recipe activity levels for a target item and rate by linear programming:
+every recipe that can contribute to the target is a variable, every item it touches
+is a balance row, and a bundled dense two-phase simplex (NumPy only) minimises one
+of three objectives:
+
+- "resources": raw supply weighted by map scarcity (`RESOURCE_MAP_LIMITS`),
+- "power": building power at 100% clock,
+- "buildings": ideal building count.
+
+Extractable resources and items no recipe produces are raw supply; any item may end
+up as surplus. The result carries a `preferred_recipes` map that can be handed
+straight to `calculate_chain` or the Production Calculator page.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from .calculator import power_for, whole_buildings
+from .game_constants import RESOURCE_CLASS_NAMES, RESOURCE_MAP_LIMITS
+from .graph import RecipeGraph, as_recipe_graph
+from .linear import discover
+from .schemas import OptimizedPlan, RecipeTotal
+
+OBJECTIVES = ("resources", "power", "buildings")
+
+# Scarcity weight of the most plentiful solid (Iron Ore) is 1.
+_REFERENCE_LIMIT = RESOURCE_MAP_LIMITS["Desc_OreIron_C"]
+# Water and other unlimited resources still cost a little, so they aren't wasted.
+_FREE_RESOURCE_WEIGHT = 1e-6
+# Secondary objective terms, small enough never to outweigh the chosen objective.
+_TIE_BREAK = 1e-6
+_PIVOT_TOLERANCE = 1e-9
+_TOLERANCE = 1e-9
+_MAX_ITERATIONS = 50_000
+
+
+def scarcity_weight(class_name: str) -> float:
+    """
+    Cost of one unit of a raw item for the "resources" objective.
+
+    Mined resources cost inversely to their map-wide extraction limit. Items with no
+    known limit (hand-gathered Wood, Leaves, creature remains...) cost as much as the
+    scarcest mined resource.
+    """
+    limit = RESOURCE_MAP_LIMITS.get(class_name)
+    if limit is None:
+        limit = min(RESOURCE_MAP_LIMITS.values())
+    return max(_REFERENCE_LIMIT / limit, _FREE_RESOURCE_WEIGHT)
+
+
+# --- Simplex ---
+
+def _pivot(tableau: np.ndarray, basis: np.ndarray, row: int, col: int) -> None:
+    tableau[row] /= tableau[row, col]
+    factors = tableau[:, col].copy()
+    factors[row] = 0.0
+    tableau -= np.outer(factors, tableau[row])
+    basis[row] = col
+
+
+def _run_simplex(tableau: np.ndarray, basis: np.ndarray, num_cols: int) -> None:
+    """
+    Pivot until no column in `[0, num_cols)` has a negative reduced cost.
+
+    Uses Dantzig's rule, falling back to Bland's rule (which cannot cycle) once the
+    iteration count suggests the tableau is stalling on a degenerate vertex.
+    """
+    num_rows = len(basis)
+    bland_after = 4 * (num_rows + num_cols)
+    for iteration in range(_MAX_ITERATIONS):
+        reduced = tableau[-1, :num_cols]
+        if iteration < bland_after:
+            col = int(np.argmin(reduced))
+            if reduced[col] >= -_PIVOT_TOLERANCE:
+                return
+        else:
+            candidates = np.flatnonzero(reduced < -_PIVOT_TOLERANCE)
+            if not candidates.size:
+                return
+            col = int(candidates[0])
+
+        column = tableau[:num_rows, col]
+        rows = np.flatnonzero(column > _PIVOT_TOLERANCE)
+        if not rows.size:
+            raise ValueError("linear program is unbounded")
+        ratios = tableau[rows, -1] / column[rows]
+        ties = rows[ratios <= ratios.min() + _PIVOT_TOLERANCE]
+        _pivot(tableau, basis, int(ties[np.argmin(basis[ties])]), col)
+    raise RuntimeError("simplex did not converge")
+
+
+def simplex(cost: np.ndarray, matrix: np.ndarray, rhs: np.ndarray) -> np.ndarray | None:
+    """
+    Minimise `cost @ x` subject to `matrix @ x == rhs` and `x >= 0`.
+
+    Args:
+        cost: Objective coefficients, shape (n,).
+        matrix: Equality constraints, shape (m, n).
+        rhs: Right-hand side, shape (m,).
+
+    Returns:
+        An optimal x, or None if the constraints are infeasible.
+    """
+    matrix = np.array(matrix, dtype=float)
+    rhs = np.array(rhs, dtype=float)
+    flip = rhs < 0
+    matrix[flip] *= -1
+    rhs[flip] *= -1
+    num_rows, num_cols = matrix.shape
+
+    # Equilibrate rows then columns to unit magnitude. Recipe rates mix items/min with
+    # fluid mL/min, and an unscaled tableau loses too much precision to pivot reliably.
+    row_scale = np.abs(matrix).max(axis=1)
+    row_scale[row_scale == 0] = 1.0
+    matrix /= row_scale[:, None]
+    rhs /= row_scale
+    col_scale = np.abs(matrix).max(axis=0)
+    col_scale[col_scale == 0] = 1.0
+    matrix /= col_scale
+    cost = np.asarray(cost, dtype=float) / col_scale
+
+    # Phase 1: one artificial per row, minimise their sum.
+    tableau = np.zeros((num_rows + 1, num_cols + num_rows + 1))
+    tableau[:num_rows, :num_cols] = matrix
+    tableau[:num_rows, num_cols:-1] = np.eye(num_rows)
+    tableau[:num_rows, -1] = rhs
+    tableau[-1, :num_cols] = -matrix.sum(axis=0)
+    tableau[-1, -1] = -rhs.sum()
+    basis = np.arange(num_cols, num_cols + num_rows)
+    _run_simplex(tableau, basis, num_cols + num_rows)
+    if -tableau[-1, -1] > _TOLERANCE * max(1.0, rhs.sum()):
+        return None
+
+    # Drive zero-level artificials out of the basis. Rows where that's impossible are
+    # redundant and keep their artificial at zero; artificials never re-enter below.
+    for row in np.flatnonzero(basis >= num_cols).tolist():
+        candidates = np.flatnonzero(np.abs(tableau[row, :num_cols]) > _PIVOT_TOLERANCE)
+        if candidates.size:
+            _pivot(tableau, basis, row, int(candidates[0]))
+
+    # Phase 2: the real objective, expressed in terms of the non-basic variables.
+    tableau[-1] = 0.0
+    tableau[-1, :num_cols] = cost
+    for row, var in enumerate(basis):
+        if var < num_cols and cost[var]:
+            tableau[-1] -= cost[var] * tableau[row]
+    _run_simplex(tableau, basis, num_cols)
+
+    solution = np.zeros(num_cols + num_rows)
+    solution[basis] = tableau[:num_rows, -1]
+    return np.maximum(solution[:num_cols] / col_scale, 0.0)
+
+
+# --- Chain optimisation ---
+
+def _closure(graph: RecipeGraph, target: int, raw: set[int]) -> tuple[list[int], list[int]]:
+    """Recipe indices that can feed `target`, and every item index they touch."""
+    recipes: list[int] = []
+    seen_recipes: set[int] = set()
+    seen_items = {target}
+    queue = [target]
+    while queue:
+        idx = queue.pop()
+        if idx in raw:
+            continue
+        for recipe_idx in graph.producers[idx]:
+            if recipe_idx in seen_recipes:
+                continue
+            seen_recipes.add(recipe_idx)
+            recipes.append(recipe_idx)
+            for child, _ in graph.net_rates[recipe_idx]:
+                if child not in seen_items:
+                    seen_items.add(child)
+                    queue.append(child)
+    rows = [target] + sorted(seen_items - {target})
+    return recipes, rows
+
+
+def optimize_chain(
+    source: Session | RecipeGraph,
+    item_id: int,
+    target_rate: float,
+    objective: str = "resources",
+) -> OptimizedPlan:
+    """
+    Pick the recipe mix that makes `target_rate` of an item at the lowest cost.
+
+    Args:
+        source: A RecipeGraph, or a Session whose engine's shared graph is used.
+        item_id: Item to produce.
+        target_rate: Desired net output rate in items/min.
+        objective: "resources", "power" or "buildings".
+
+    Returns:
+        OptimizedPlan. `recipe_totals` lists every recipe the optimum runs (an item
+        may be split across several), `raw_materials` the raw supply and
+        `byproducts_totals` the surplus. `preferred_recipes` maps each produced item
+        to the recipe carrying most of its output.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"objective must be one of {OBJECTIVES}, got {objective!r}")
+
+    graph = as_recipe_graph(source)
+    target = graph.item_index.get(item_id)
+    if target is None:
+        name = graph.item_name(item_id)
+        return {
+            "item_id": item_id,
+            "item_name": name,
+            "required_rate": target_rate,
+            "is_raw_material": True,
+            "item_rates": {name: target_rate},
+            "recipe_totals": [],
+            "raw_materials": {name: target_rate},
+            "byproducts_totals": {},
+            "building_summary": {},
+            "power_mw_total": 0.0,
+            "objective": objective,
+            "objective_value": 0.0,
+            "preferred_recipes": {},
+        }
+
+    raw = {
+        idx for idx, class_name in enumerate(graph.item_class_names)
+        if class_name in RESOURCE_CLASS_NAMES or not graph.producers[idx]
+    }
+    columns, rows = _closure(graph, target, raw)
+    row_of = {idx: n for n, idx in enumerate(rows)}
+    supplied = [idx for idx in rows if idx in raw]
+    num_recipes, num_supplied, num_rows = len(columns), len(supplied), len(rows)
+
+    # Variables: [recipe activities | raw supply | surplus], one balance row per item.
+    matrix = np.zeros((num_rows, num_recipes + num_supplied + num_rows))
+    for col, recipe_idx in enumerate(columns):
+        for idx, rate in graph.net_rates[recipe_idx]:
+            matrix[row_of[idx], col] = rate
+    for n, idx in enumerate(supplied):
+        matrix[row_of[idx], num_recipes + n] = 1.0
+    matrix[:, num_recipes + num_supplied:] = -np.eye(num_rows)
+    demand = np.zeros(num_rows)
+    demand[0] = target_rate
+
+    weights = np.array([scarcity_weight(graph.item_class_names[idx]) for idx in supplied])
+    power = np.array([graph.recipes[r].building_power_mw for r in columns])
+    resource_cost = np.zeros(matrix.shape[1])
+    resource_cost[num_recipes:num_recipes + num_supplied] = weights
+    building_cost = np.zeros(matrix.shape[1])
+    building_cost[:num_recipes] = 1.0
+    power_cost = np.zeros(matrix.shape[1])
+    power_cost[:num_recipes] = power
+    primary = {
+        "resources": resource_cost,
+        "power": power_cost,
+        "buildings": building_cost,
+    }[objective]
+    cost = primary + _TIE_BREAK * (resource_cost + building_cost)
+
+    solution = simplex(cost, matrix, demand)
+    if solution is None:
+        raise ValueError(f"no feasible production plan for {graph.item_names[target]}")
+
+    activity = solution[:num_recipes]
+    supply = solution[num_recipes:num_recipes + num_supplied]
+    surplus = solution[num_recipes + num_supplied:]
+    tolerance = _TOLERANCE * max(1.0, abs(target_rate))
+    rate_tolerance = 1e-6 * max(1.0, abs(target_rate))
+
+    # Dominant producer of each item, and gross consumption per item.
+    best_output: dict[int, tuple[float, int]] = {}
+    consumption = np.zeros(num_rows)
+    consumption[0] = target_rate
+    for col, recipe_idx in enumerate(columns):
+        if activity[col] <= tolerance:
+            continue
+        for idx, rate in graph.net_rates[recipe_idx]:
+            flow = rate * activity[col]
+            if flow < 0:
+                consumption[row_of[idx]] -= flow
+            elif idx not in raw and flow > best_output.get(idx, (0.0, -1))[0]:
+                best_output[idx] = (flow, recipe_idx)
+    preferred_recipes = {
+        graph.item_ids[idx]: graph.recipes[recipe_idx].id
+        for idx, (_, recipe_idx) in best_output.items()
+    }
+
+    produced_raw = raw | {idx for idx in rows if idx not in best_output}
+    _, _, _, depth = discover(graph, target, preferred_recipes, produced_raw)
+
+    building_summary: dict[str, float] = defaultdict(float)
+    recipe_totals: list[RecipeTotal] = []
+    for col, recipe_idx in enumerate(columns):
+        num_ideal = float(activity[col])
+        if num_ideal <= tolerance:
+            continue
+        recipe = graph.recipes[recipe_idx]
+        num_rounded = whole_buildings(num_ideal)
+        clock_speed = 100.0 * num_ideal / num_rounded
+        building_summary[recipe.building_name] += num_ideal
+        recipe_totals.append({
+            "recipe_id": recipe.id,
+            "recipe_name": recipe.name,
+            "building_name": recipe.building_name,
+            "num_buildings_ideal": num_ideal,
+            "num_buildings_rounded": num_rounded,
+            "clock_speed": clock_speed,
+            "total_power_mw": power_for(recipe.building_power_mw, num_rounded, clock_speed),
+            "depth": max(
+                (depth[idx] for idx, rate in graph.net_rates[recipe_idx]
+                 if rate > 0 and idx in depth),
+                default=0,
+            ),
+        })
+    recipe_totals.sort(key=lambda r: -r["depth"])
+
+    raw_materials = {
+        graph.item_names[idx]: float(supply[n])
+        for n, idx in enumerate(supplied) if supply[n] > rate_tolerance
+    }
+    objective_value = {
+        "resources": float(weights @ supply),
+        "power": float(power @ activity),
+        "buildings": float(activity.sum()),
+    }[objective]
+
+    return {
+        "item_id": item_id,
+        "item_name": graph.item_names[target],
+        "required_rate": target_rate,
+        "is_raw_material": target in raw,
+        "item_rates": {
+            graph.item_names[idx]: float(consumption[n])
+            for n, idx in enumerate(rows) if consumption[n] > rate_tolerance
+        },
+        "recipe_totals": recipe_totals,
+        "raw_materials": raw_materials,
+        "byproducts_totals": {
+            graph.item_names[idx]: float(surplus[n])
+            for n, idx in enumerate(rows) if surplus[n] > rate_tolerance
+        },
+        "building_summary": dict(building_summary),
+        "power_mw_total": sum(r["total_power_mw"] for r in recipe_totals),
+        "objective": objective,
+        "objective_value": objective_value,
+        "preferred_recipes": preferred_recipes,
+    }
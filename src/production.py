@@ -1,18 +1,38 @@
-import math
-from typing import Any, TypeVar
+import gzip
+import io
+import json
+from collections.abc import Callable, Collection, Iterable, Iterator
+from typing import IO, Any, NamedTuple, TypeVar, cast
 
+from sqlalchemy import Select, Table, delete, exists, func, insert, select
 from sqlalchemy.orm import Session
 
-from .calculator import calculate_chain
-from .database import Factory, Group, Item, ProductionLine, Purity, ResourceNode
+from .calculator import whole_buildings
+from .chain_cache import cached_chain, chain_templates
+from .compact import CompactChain
+from .database import (
+    Base,
+    Factory,
+    Group,
+    Item,
+    LineRequirement,
+    ProductionLine,
+    Purity,
+    ResourceNode,
+)
+from .graph import RecipeGraph, as_recipe_graph
 from .queries import (
     get_all_groups,
+    get_all_production_lines,
     get_group,
     get_production_line,
     get_production_lines_for_group,
-    get_resource_nodes_for_group,
+    get_resource_totals,
+    get_resource_totals_by_group,
 )
-from .schemas import ProductionNode
+from .schemas import ProductionLineDetails
+from .summary_cache import group_summaries
+from .unit_costs import get_unit_cost
 
 _T = TypeVar("_T")
 
@@ -37,15 +57,9 @@ def get_group_resource_totals(session: Session, group_id: int) -> dict[str, floa
 
     Returns:
         A dict mapping item name to total extraction rate (items/min) across all
-        resource nodes in the group.
+        resource nodes in the group. Summed in SQL (one GROUP BY query).
     """
-    nodes = get_resource_nodes_for_group(session, group_id)
-    totals: dict[str, float] = {}
-
-    for node in nodes:
-        totals[node['item_name']] = totals.get(node['item_name'], 0) + node['extraction_rate']
-
-    return totals
+    return get_resource_totals(session, group_id)
 
 def get_max_output(
     session: Session,
@@ -56,7 +70,8 @@ def get_max_output(
     """
     Max achievable output rate for an item given a group's available resource nodes.
 
-    Runs the calculator at 1/min to get raw-material ratios, then finds the limiting
+    Reads the item's precomputed 1/min raw-material vector (see get_unit_cost; the
+    cached chain template when `preferred_recipes` is given), then finds the limiting
     material (bottleneck) among the group's extraction totals.
 
     Returns:
@@ -69,8 +84,12 @@ def get_max_output(
             - missing (list[str]): Raw materials the group doesn't supply at all.
     """
     group_totals = get_group_resource_totals(session, group_id)
-    node = calculate_chain(session, item_id, 1.0, preferred_recipes=preferred_recipes)
-    raw = node['raw_materials']
+    unit_cost = None if preferred_recipes else get_unit_cost(session, item_id)
+    if unit_cost is not None:
+        raw = unit_cost['raw_materials']
+    else:
+        node = cached_chain(session, item_id, 1.0, preferred_recipes=preferred_recipes)
+        raw = node['raw_materials']
 
     missing = [r for r in raw if r not in group_totals]
     if missing:
@@ -90,41 +109,28 @@ def get_resource_balance(session: Session, production_line_id: int) -> dict:
     Returns a dict keyed by raw-material name with {required, available, balance}
     entries; the special key "__line__" carries line-level totals: power_mw,
     building_count, and bottleneck (the most-deficient material, or None).
+
+    Requirements are read from the line's `line_requirements` rows; a line outside
+    any group has no supply. Never commits.
     """
-    balance: dict = {}
     production_line = _require(
         get_production_line(session, production_line_id), "ProductionLine", production_line_id
     )
-    group_totals = get_group_resource_totals(session, production_line.group_id)
-
-    chain = calculate_chain(
-        session, production_line.target_item_id, production_line.target_rate
-    )
-    raw_materials = chain['raw_materials']
-
-    for resource, required in raw_materials.items():
-        available = group_totals.get(resource, 0.0)
-        balance[resource] = {
-            'required': required,
-            'available': available,
-            'balance': available - required,
-        }
-
-    bottleneck = None
-    if balance:
-        bottleneck = min(balance, key=lambda m: balance[m]['balance'])
-
-    balance['__line__'] = {
-        'power_mw': chain['power_mw_total'],
-        'building_count': sum(math.ceil(c) for c in chain['building_summary'].values()),
-        'bottleneck': bottleneck,
-    }
-    return balance
+    group_id = production_line.group_id
+    group_totals = {} if group_id is None else get_group_resource_totals(session, group_id)
+    requirements = _read_line_requirements(session, [production_line.id])
+    return _line_balance(requirements[production_line.id], group_totals)
 
 def get_group_summary(session: Session, group_id: int) -> dict:
     """
     Aggregates all production and resource data for a group into a single summary dict.
 
+    Served from the write-versioned summary cache while no mutator has touched the
+    group; otherwise line requirements come from the `line_requirements` table in
+    one aggregate query, and no production chain is recalculated unless a line's
+    rows are stale (recomputed rows are flushed, never committed). The returned
+    dict may be shared: do not modify it.
+
     Args:
         session: An active SQLAlchemy Session.
         group_id: The primary key of the Group to summarize.
@@ -141,45 +147,37 @@ def get_group_summary(session: Session, group_id: int) -> dict:
             - overall_balance (dict[str, float]): Group resource totals minus combined
                 consumption of all production lines. Positive = surplus, negative = deficit.
     """
-    group = _require(get_group(session, group_id), "Group", group_id)
-    group_totals = get_group_resource_totals(session, group.id)
-    lines = []
-    overall_balance = group_totals.copy()
-    total_power_mw = 0.0
-    total_buildings = 0
-
-    for line in get_production_lines_for_group(session, group.id):
-        balance = get_resource_balance(session, line['id'])
-        line_meta = balance.pop('__line__', {'power_mw': 0.0, 'building_count': 0, 'bottleneck': None})
-        lines.append({
-            "details": line,
-            "balance": balance,
-            "power_mw": line_meta['power_mw'],
-            "building_count": line_meta['building_count'],
-            "bottleneck": line_meta['bottleneck'],
-        })
-
-        for mat, entry in balance.items():
-            overall_balance[mat] = overall_balance.get(mat, 0) - entry['required']
-
-        if line['is_active']:
-            total_power_mw += line_meta['power_mw']
-            total_buildings += line_meta['building_count']
+    bind = session.get_bind()
+    catalog_version = as_recipe_graph(session).version
+    version = group_summaries.version(bind, group_id)
+    summary = group_summaries.get(bind, group_id, version, catalog_version)
+    if summary is not None:
+        return summary
 
-    return {
-        "id": group.id,
-        "name": group.name,
-        "resource_totals": group_totals,
-        "production_lines": lines,
-        "overall_balance": overall_balance,
-        "total_power_mw": total_power_mw,
-        "total_buildings": total_buildings,
-    }
+    group = _require(get_group(session, group_id), "Group", group_id)
+    lines = get_production_lines_for_group(session, group.id)
+    requirements = _read_line_requirements(session, [line['id'] for line in lines])
+    summary = _summarize_group(
+        group.id,
+        group.name,
+        get_group_resource_totals(session, group.id),
+        lines,
+        [requirements[line['id']] for line in lines],
+    )
+    group_summaries.put(bind, group.id, version, catalog_version, summary)
+    return summary
 
 def get_global_summary(session: Session) -> dict:
     """
     Aggregates summaries for every group into a single global view.
 
+    Built from the cached per-group summaries (see get_group_summary): only groups
+    written since their summary was cached are recomputed, together, with one
+    query each for their lines, line requirements and resource totals. With
+    nothing dirty it runs two: the ETL-generation check behind the shared recipe
+    graph (which reloads the graph if the catalog changed) and the group list.
+    Never commits.
+
     Args:
         session: An active SQLAlchemy Session.
 
@@ -190,62 +188,270 @@ def get_global_summary(session: Session) -> dict:
                 extraction rate across all groups.
             - global_balance (dict[str, float]): Sum of each group's overall_balance,
                 i.e. network-wide surplus (positive) or deficit (negative) per material.
+            - production_line_count / active_line_count (int): Lines across all groups.
     """
-    summaries = [get_group_summary(session, g['id']) for g in get_all_groups(session)]
+    bind = session.get_bind()
+    catalog_version = as_recipe_graph(session).version
+    groups = get_all_groups(session)
+
+    cached: dict[int, dict] = {}
+    dirty: dict[int, int] = {}     # group_id -> write version read before recomputing
+    for group in groups:
+        version = group_summaries.version(bind, group['id'])
+        summary = group_summaries.get(bind, group['id'], version, catalog_version)
+        if summary is None:
+            dirty[group['id']] = version
+        else:
+            cached[group['id']] = summary
+
+    if dirty:
+        lines_by_group: dict[int, list[ProductionLineDetails]] = {gid: [] for gid in dirty}
+        for line in get_all_production_lines(session):
+            if line['group_id'] in lines_by_group:
+                lines_by_group[line['group_id']].append(line)
+        requirements = _read_line_requirements(
+            session,
+            None if len(dirty) == len(groups)
+            else [line['id'] for lines in lines_by_group.values() for line in lines],
+        )
+        totals_by_group = get_resource_totals_by_group(session)
+        for group in groups:
+            if group['id'] not in dirty:
+                continue
+            lines = lines_by_group[group['id']]
+            summary = _summarize_group(
+                group['id'],
+                group['name'],
+                totals_by_group.get(group['id'], {}),
+                lines,
+                [requirements[line['id']] for line in lines],
+            )
+            group_summaries.put(bind, group['id'], dirty[group['id']], catalog_version, summary)
+            cached[group['id']] = summary
 
-    global_totals: dict[str, float] = {}
+    summaries = [cached[group['id']] for group in groups]
+    global_resource_totals: dict[str, float] = {}
     global_balance: dict[str, float] = {}
     total_power_mw = 0.0
     total_buildings = 0
+    line_count = active_line_count = 0
     for summary in summaries:
         for mat, rate in summary['resource_totals'].items():
-            global_totals[mat] = global_totals.get(mat, 0.0) + rate
+            global_resource_totals[mat] = global_resource_totals.get(mat, 0.0) + rate
         for mat, bal in summary['overall_balance'].items():
             global_balance[mat] = global_balance.get(mat, 0.0) + bal
         total_power_mw += summary.get('total_power_mw', 0.0)
         total_buildings += summary.get('total_buildings', 0)
+        line_count += len(summary['production_lines'])
+        active_line_count += sum(
+            1 for line in summary['production_lines'] if line['details']['is_active']
+        )
 
     return {
         "groups": summaries,
-        "global_resource_totals": global_totals,
+        "global_resource_totals": global_resource_totals,
         "global_balance": global_balance,
         "total_power_mw": total_power_mw,
         "total_buildings": total_buildings,
+        "production_line_count": line_count,
+        "active_line_count": active_line_count,
     }
 
 
 # --- Helpers ---
 
-def _collect_factory_specs(chain: ProductionNode) -> list[dict]:
+class _LineRequirements(NamedTuple):
+    """One line's materialized requirements, as read back from `line_requirements`."""
+    raw_materials: dict[str, float]   # item name -> items/min
+    power_mw: float
+    building_count: int
+
+def _touch(session: Session, *group_ids: int | None) -> None:
+    """Bump the write version of groups a mutator changed (after its commit)."""
+    group_summaries.touch(session.get_bind(), *(g for g in group_ids if g is not None))
+
+def _table(model: type[Base]) -> Table:
+    """A model's Core table: plain executemany INSERTs skip the ORM bulk-insert overhead."""
+    return cast(Table, model.__table__)
+
+def _write_line_requirements(
+    session: Session, lines: Collection[ProductionLine], graph: RecipeGraph
+) -> None:
     """
-    Walks a production chain and aggregates per-recipe building requirements.
+    Replace the `line_requirements` rows of `lines` from their default-recipe chains.
+
+    Each line gets one row per raw material plus a line-total row (item_id NULL)
+    with its power and whole-building count, tagged with the RecipeGraph version
+    they were computed from. Chains come from the shared unit-rate templates, so
+    lines targeting the same item share one traversal. Does not commit.
 
-    When a recipe appears in multiple subtrees, its ideal building count is summed
-    and the highest depth wins for ordering. Returned list is ordered from deepest
-    (closest to raw) first to the target recipe last.
+    Resolve `graph` before the caller's first write: loading the shared graph uses
+    its own session, which must not run in the middle of this one's transaction.
     """
-    specs: dict[int, dict] = {}
+    if not lines:
+        return
+    session.execute(
+        delete(LineRequirement).where(LineRequirement.line_id.in_([line.id for line in lines]))
+    )
+    rows = [
+        {**row, "line_id": line.id}
+        for line in lines
+        for row in _line_requirement_rows(graph, line.target_item_id, line.target_rate)
+    ]
+    session.execute(insert(_table(LineRequirement)), rows)
+
+def _line_requirement_rows(graph: RecipeGraph, item_id: int, target_rate: float) -> list[dict]:
+    """
+    `line_requirements` insert parameters, less `line_id`, for a line targeting
+    `target_rate` of `item_id` (see _write_line_requirements).
+    """
+    totals = chain_templates.template(graph, item_id).scaled(target_rate).totals()
+    rows = [
+        {
+            "item_id": raw_id,
+            "rate": rate,
+            "power_mw": 0.0,
+            "building_count": 0,
+            "catalog_version": graph.version,
+        }
+        for raw_id, rate in totals.raw_materials.items()
+        if graph.has_item(raw_id)
+    ]
+    rows.append({
+        "item_id": None,
+        "rate": 0.0,
+        "power_mw": totals.power_mw_total,
+        "building_count": sum(whole_buildings(c) for c in totals.building_summary.values()),
+        "catalog_version": graph.version,
+    })
+    return rows
+
+def _refresh_line_requirements(session: Session, line_ids: Collection[int] | None) -> None:
+    """
+    Rewrite the requirements of lines (all lines when `line_ids` is None) that have
+    no line-total row for the current catalog: lines created before the table
+    existed, or computed from recipes the ETL has since changed.
+
+    Only flushes: the rows join the caller's transaction and persist with its next
+    commit, so the read-only getters built on this never commit (and never commit
+    the caller's unrelated pending writes). Until then, the summary cache keeps
+    the recomputed figures from being redone on every read.
+    """
+    graph = as_recipe_graph(session)
+    current = exists().where(
+        LineRequirement.line_id == ProductionLine.id,
+        LineRequirement.item_id.is_(None),
+        LineRequirement.catalog_version == graph.version,
+    )
+    stmt = select(ProductionLine).where(~current)
+    if line_ids is not None:
+        stmt = stmt.where(ProductionLine.id.in_(line_ids))
+    stale = session.scalars(stmt).all()
+    if stale:
+        _write_line_requirements(session, stale, graph)
+        session.flush()
+
+def _read_line_requirements(
+    session: Session, line_ids: Collection[int] | None = None
+) -> dict[int, _LineRequirements]:
+    """
+    Per-line requirements for `line_ids` (all lines when None), summed in SQL.
 
-    def visit(node: ProductionNode, depth: int) -> None:
-        if node.get('is_raw_material'):
-            return
-        req = node['recipe']
-        rid = req['recipe_id']
-        if rid in specs:
-            specs[rid]['num_ideal'] += req['num_buildings_ideal']
-            specs[rid]['depth'] = max(specs[rid]['depth'], depth)
+    One aggregate query, after a staleness check that recomputes only the lines
+    whose rows are missing or out of date.
+    """
+    if line_ids is not None and not line_ids:
+        return {}
+    _refresh_line_requirements(session, line_ids)
+    stmt = (
+        select(
+            LineRequirement.line_id,
+            Item.name,
+            func.sum(LineRequirement.rate),
+            func.sum(LineRequirement.power_mw),
+            func.sum(LineRequirement.building_count),
+        )
+        .outerjoin(Item, Item.id == LineRequirement.item_id)
+        .group_by(LineRequirement.line_id, Item.name)
+        .order_by(LineRequirement.line_id, func.min(LineRequirement.id))
+    )
+    if line_ids is not None:
+        stmt = stmt.where(LineRequirement.line_id.in_(line_ids))
+
+    raw: dict[int, dict[str, float]] = {}
+    line_totals: dict[int, tuple[float, int]] = {}
+    for line_id, name, rate, power_mw, building_count in session.execute(stmt):
+        if name is None:
+            line_totals[line_id] = (power_mw, building_count)
         else:
-            specs[rid] = {
-                'recipe_id': rid,
-                'recipe_name': req['recipe_name'],
-                'num_ideal': req['num_buildings_ideal'],
-                'depth': depth,
-            }
-        for dep in node.get('dependencies', {}).values():
-            visit(dep, depth + 1)
+            raw.setdefault(line_id, {})[name] = rate
+    return {
+        line_id: _LineRequirements(raw.get(line_id, {}), power_mw, building_count)
+        for line_id, (power_mw, building_count) in line_totals.items()
+    }
+
+def _line_balance(requirements: _LineRequirements, group_totals: dict[str, float]) -> dict:
+    """Balance dict for one line's requirements; see get_resource_balance."""
+    balance: dict = {}
+    for resource, required in requirements.raw_materials.items():
+        available = group_totals.get(resource, 0.0)
+        balance[resource] = {
+            'required': required,
+            'available': available,
+            'balance': available - required,
+        }
+
+    bottleneck = None
+    if balance:
+        bottleneck = min(balance, key=lambda m: balance[m]['balance'])
+
+    balance['__line__'] = {
+        'power_mw': requirements.power_mw,
+        'building_count': requirements.building_count,
+        'bottleneck': bottleneck,
+    }
+    return balance
+
+def _summarize_group(
+    group_id: int,
+    name: str,
+    group_totals: dict[str, float],
+    lines: list[ProductionLineDetails],
+    requirements: list[_LineRequirements],
+) -> dict:
+    """Assemble a get_group_summary dict from a group's lines and their requirements."""
+    summaries = []
+    overall_balance = group_totals.copy()
+    total_power_mw = 0.0
+    total_buildings = 0
 
-    visit(chain, 0)
-    return sorted(specs.values(), key=lambda s: -s['depth'])
+    for line, line_requirements in zip(lines, requirements, strict=True):
+        balance = _line_balance(line_requirements, group_totals)
+        line_meta = balance.pop('__line__')
+        summaries.append({
+            "details": line,
+            "balance": balance,
+            "power_mw": line_meta['power_mw'],
+            "building_count": line_meta['building_count'],
+            "bottleneck": line_meta['bottleneck'],
+        })
+
+        for mat, entry in balance.items():
+            overall_balance[mat] = overall_balance.get(mat, 0) - entry['required']
+
+        if line['is_active']:
+            total_power_mw += line_meta['power_mw']
+            total_buildings += line_meta['building_count']
+
+    return {
+        "id": group_id,
+        "name": name,
+        "resource_totals": group_totals,
+        "production_lines": summaries,
+        "overall_balance": overall_balance,
+        "total_power_mw": total_power_mw,
+        "total_buildings": total_buildings,
+    }
 
 def _build_factories(
     session: Session,
@@ -255,31 +461,38 @@ def _build_factories(
     """
     Runs the calculator for a line and persists Factory rows for each step.
 
-    For each recipe in the chain, creates a Factory with `building_count` = ceil of the
-    ideal count and `clock_speed` = the fractional percentage needed so the rounded
-    count hits the exact target rate. Does not commit.
+    Factories follow the chain tree `calculate_chain` returns (and that the line's
+    requirements and power are computed from): each recipe's ideal building count
+    is summed over the tree, cycles cut per path. For each recipe, creates a
+    Factory with `building_count` = ceil of the ideal count and `clock_speed` = the
+    fractional percentage needed so the rounded count hits the exact target rate.
+    Ordered deepest recipe first. Does not commit.
     """
-    from .calculator import calculate_chain
-
-    chain = calculate_chain(
-        session,
-        line.target_item_id,
-        line.target_rate,
-        preferred_recipes=preferred_recipes,
+    graph = as_recipe_graph(session)
+    chain = chain_templates.template(graph, line.target_item_id, preferred_recipes)
+    session.add_all(
+        Factory(**row)
+        for row in _factory_rows(graph, line.id, line.name, chain.scaled(line.target_rate))
     )
 
-    for order, spec in enumerate(_collect_factory_specs(chain), start=1):
-        num_ideal = spec['num_ideal']
-        num_rounded = max(1, math.ceil(num_ideal))
-        clock_speed = 100.0 * num_ideal / num_rounded
-        session.add(Factory(
-            name=f"{spec['recipe_name']} ({line.name})",
-            production_line_id=line.id,
-            recipe_id=spec['recipe_id'],
-            building_count=num_rounded,
-            clock_speed=clock_speed,
-            order=order,
-        ))
+def _factory_rows(
+    graph: RecipeGraph, line_id: int, line_name: str, chain: CompactChain
+) -> list[dict]:
+    """Factory insert parameters for a line's chain, deepest recipe first."""
+    rows = []
+    for order, (recipe_id, num_ideal) in enumerate(chain.recipe_loads(), start=1):
+        recipe = graph.recipe(recipe_id)
+        assert recipe is not None
+        num_rounded = whole_buildings(num_ideal)
+        rows.append({
+            "name": f"{recipe.name} ({line_name})",
+            "production_line_id": line_id,
+            "recipe_id": recipe_id,
+            "building_count": num_rounded,
+            "clock_speed": 100.0 * num_ideal / num_rounded,
+            "order": order,
+        })
+    return rows
 
 
 # --- Creation ---
@@ -303,6 +516,7 @@ def create_group(
     group = Group(name=name, description=description)
     session.add(group)
     session.commit()
+    _touch(session, group.id)
     return group
 
 def create_production_line(
@@ -329,6 +543,7 @@ def create_production_line(
     Returns:
         The newly created and committed ProductionLine.
     """
+    graph = as_recipe_graph(session)
     line = ProductionLine(
         name=name,
         target_item_id=item_id,
@@ -340,7 +555,9 @@ def create_production_line(
     session.flush()
 
     _build_factories(session, line)
+    _write_line_requirements(session, [line], graph)
     session.commit()
+    _touch(session, group_id)
     return line
 
 def add_resource_node(
@@ -374,6 +591,7 @@ def add_resource_node(
     )
     session.add(node)
     session.commit()
+    _touch(session, group_id)
     return node
 
 
@@ -387,8 +605,8 @@ def update_production_line_rate(
     """
     Updates a production line's target rate and regenerates its factory chain.
 
-    Deletes all existing Factory rows for the line, then reruns the calculator at
-    the new rate and persists fresh factories.
+    Deletes all existing Factory rows for the line (one DELETE), then reruns the
+    calculator at the new rate and persists fresh factories and line requirements.
 
     Args:
         session: An active SQLAlchemy Session.
@@ -398,16 +616,17 @@ def update_production_line_rate(
     Returns:
         The updated ProductionLine.
     """
+    graph = as_recipe_graph(session)
     line = _require(
         get_production_line(session, production_line_id), "ProductionLine", production_line_id
     )
-    for factory in list(line.factories):
-        session.delete(factory)
-    session.flush()
+    session.execute(delete(Factory).where(Factory.production_line_id == line.id))
 
     line.target_rate = new_rate
     _build_factories(session, line)
+    _write_line_requirements(session, [line], graph)
     session.commit()
+    _touch(session, line.group_id)
     return line
 
 def set_production_line_active(
@@ -431,6 +650,7 @@ def set_production_line_active(
     )
     line.is_active = is_active
     session.commit()
+    _touch(session, line.group_id)
     return line
 
 # --- Rename / update ---
@@ -447,6 +667,7 @@ def rename_group(
     if description is not None:
         group.description = description
     session.commit()
+    _touch(session, group_id)
     return group
 
 def rename_production_line(session: Session, production_line_id: int, name: str) -> ProductionLine:
@@ -456,6 +677,7 @@ def rename_production_line(session: Session, production_line_id: int, name: str)
     )
     line.name = name
     session.commit()
+    _touch(session, line.group_id)
     return line
 
 def update_resource_node(
@@ -477,6 +699,7 @@ def update_resource_node(
     if extraction_rate is not None:
         node.extraction_rate = extraction_rate
     session.commit()
+    _touch(session, node.group_id)
     return node
 
 
@@ -484,116 +707,452 @@ def update_resource_node(
 
 def delete_group(session: Session, group_id: int) -> None:
     """
-    Delete a group and everything it owns: production lines (+ their factories) and
-    resource nodes. Safe even if the group has no children.
+    Delete a group and everything it owns: production lines (+ their factories and
+    requirements) and resource nodes. Safe even if the group has no children.
+
+    Set-based: one DELETE per table, however large the group is.
     """
-    group = get_group(session, group_id)
-    if group is None:
-        return
-    for line in list(group.production_lines):
-        for factory in list(line.factories):
-            session.delete(factory)
-        session.delete(line)
-    for node in list(group.resource_nodes):
-        session.delete(node)
-    session.delete(group)
+    line_ids = select(ProductionLine.id).where(ProductionLine.group_id == group_id)
+    _delete_line_children(session, line_ids)
+    session.execute(delete(ProductionLine).where(ProductionLine.group_id == group_id))
+    session.execute(delete(ResourceNode).where(ResourceNode.group_id == group_id))
+    deleted = session.execute(delete(Group).where(Group.id == group_id)).rowcount
     session.commit()
+    if deleted:
+        _touch(session, group_id)
 
 def delete_production_line(session: Session, production_line_id: int) -> None:
-    """Delete a production line and its factories."""
-    line = get_production_line(session, production_line_id)
-    if line is None:
-        return
-    for factory in list(line.factories):
-        session.delete(factory)
-    session.delete(line)
+    """Delete a production line, its factories and its requirements (one DELETE each)."""
+    _delete_line_children(session, [production_line_id])
+    group_id = session.scalar(
+        delete(ProductionLine)
+        .where(ProductionLine.id == production_line_id)
+        .returning(ProductionLine.group_id)
+    )
     session.commit()
+    if group_id is not None:
+        _touch(session, group_id)
 
 def delete_resource_node(session: Session, node_id: int) -> None:
     """Delete a resource node."""
-    node = session.get(ResourceNode, node_id)
-    if node is None:
-        return
-    session.delete(node)
+    group_id = session.scalar(
+        delete(ResourceNode).where(ResourceNode.id == node_id).returning(ResourceNode.group_id)
+    )
     session.commit()
+    if group_id is not None:
+        _touch(session, group_id)
+
+def _delete_line_children(session: Session, line_ids: Select | list[int]) -> None:
+    """
+    Delete the factories and line requirements of `line_ids` (ids or an id
+    subquery) with one set-based DELETE per table. Does not commit.
+    """
+    session.execute(delete(LineRequirement).where(LineRequirement.line_id.in_(line_ids)))
+    session.execute(delete(Factory).where(Factory.production_line_id.in_(line_ids)))
 
 
 # --- Import / export ---
 
+# Version of the export dict and of the NDJSON header record.
+EXPORT_VERSION = 1
+# Records inserted per bulk write when importing; bounds import memory.
+IMPORT_BATCH_SIZE = 1000
+_GZIP_MAGIC = b"\x1f\x8b"
+# Record type -> the field naming its item's class.
+_ITEM_CLASS_KEYS = {"resource_node": "item_class", "production_line": "target_item_class"}
+
+
+def export_factory_records(
+    session: Session, batch_size: int = IMPORT_BATCH_SIZE
+) -> Iterator[dict]:
+    """
+    Stream all user-created state as flat records, the NDJSON export format.
+
+    The first record is a header, `{"type": "header", "version": 1}`. Then each
+    group yields a `{"type": "group", ...}` record followed by its
+    `"resource_node"` and `"production_line"` records, which carry the same fields
+    as the nodes and lines of export_factory_state. Groups, nodes and lines are
+    read through three `yield_per` cursors merged by group id, so memory stays
+    flat however large the state is. Nodes and lines without a group are not
+    exported.
+    """
+    yield {"type": "header", "version": EXPORT_VERSION}
+    groups = session.execute(
+        select(Group.id, Group.name, Group.description)
+        .order_by(Group.id)
+        .execution_options(yield_per=batch_size)
+    )
+    nodes = session.execute(
+        select(
+            ResourceNode.group_id,
+            ResourceNode.name,
+            Item.class_name,
+            ResourceNode.purity,
+            ResourceNode.extraction_rate,
+        )
+        .join(Item, Item.id == ResourceNode.item_id)
+        .where(ResourceNode.group_id.is_not(None))
+        .order_by(ResourceNode.group_id, ResourceNode.id)
+        .execution_options(yield_per=batch_size)
+    )
+    lines = session.execute(
+        select(
+            ProductionLine.group_id,
+            ProductionLine.name,
+            Item.class_name,
+            ProductionLine.target_rate,
+            ProductionLine.is_active,
+        )
+        .join(Item, Item.id == ProductionLine.target_item_id)
+        .where(ProductionLine.group_id.is_not(None))
+        .order_by(ProductionLine.group_id, ProductionLine.id)
+        .execution_options(yield_per=batch_size)
+    )
+    node_rows, line_rows = _GroupedRows(nodes), _GroupedRows(lines)
+
+    for group_id, name, description in groups:
+        yield {"type": "group", "name": name, "description": description or ""}
+        for group_node in node_rows.take_while(group_id):
+            _, node_name, item_class, purity, extraction_rate = group_node
+            yield {
+                "type": "resource_node",
+                "name": node_name,
+                "item_class": item_class,
+                "purity": purity.name if purity else "NORMAL",
+                "extraction_rate": extraction_rate,
+            }
+        for group_line in line_rows.take_while(group_id):
+            _, line_name, item_class, target_rate, is_active = group_line
+            yield {
+                "type": "production_line",
+                "name": line_name,
+                "target_item_class": item_class,
+                "target_rate": target_rate,
+                "is_active": is_active,
+            }
+
 def export_factory_state(session: Session) -> dict:
     """
     Serialize all user-created state (groups, production lines, resource nodes) to
     a JSON-safe dict. Items/recipes/buildings are left out - they come from ETL.
 
     Items are referenced by class_name so imports are portable across re-ETLs.
+    For large states prefer dump_factory_ndjson, which never holds the whole
+    state in memory.
     """
-    groups_out = []
-    for group in session.query(Group).all():
-        groups_out.append({
-            "name": group.name,
-            "description": group.description or "",
-            "production_lines": [
-                {
-                    "name": line.name,
-                    "target_item_class": line.target_item.class_name,
-                    "target_rate": line.target_rate,
-                    "is_active": line.is_active,
-                }
-                for line in group.production_lines
-            ],
-            "resource_nodes": [
-                {
-                    "name": node.name,
-                    "item_class": node.item.class_name,
-                    "purity": node.purity.name if node.purity else "NORMAL",
-                    "extraction_rate": node.extraction_rate,
-                }
-                for node in group.resource_nodes
-            ],
-        })
-    return {"version": 1, "groups": groups_out}
+    groups_out: list[dict] = []
+    for record in export_factory_records(session):
+        kind = record.pop("type")
+        if kind == "group":
+            groups_out.append({**record, "production_lines": [], "resource_nodes": []})
+        elif kind == "production_line":
+            groups_out[-1]["production_lines"].append(record)
+        elif kind == "resource_node":
+            groups_out[-1]["resource_nodes"].append(record)
+    return {"version": EXPORT_VERSION, "groups": groups_out}
+
+def dump_factory_ndjson(session: Session, fp: IO[bytes], *, compress: bool = False) -> int:
+    """
+    Write export_factory_records to a binary file as NDJSON, one record per line.
 
+    Args:
+        session: An active SQLAlchemy Session.
+        fp: Binary file object to write to.
+        compress: Gzip the output.
+
+    Returns:
+        The number of records written (including the header).
+    """
+    if compress:
+        with gzip.GzipFile(fileobj=fp, mode="wb") as gz:
+            return _write_ndjson(session, gz.write)
+    return _write_ndjson(session, fp.write)
+
+def _write_ndjson(session: Session, write: Callable[[bytes], object]) -> int:
+    count = 0
+    for record in export_factory_records(session):
+        write(json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n")
+        count += 1
+    return count
 
 def import_factory_state(session: Session, data: dict) -> dict:
     """
     Import groups/lines/nodes from an export dict. Appends to existing state
     (does not wipe). Returns a summary of what was imported or skipped.
+
+    See import_factory_records, which this feeds: one transaction, bulk inserts,
+    and a full rollback on any error.
+    """
+    def records() -> Iterator[dict]:
+        yield {"type": "header", "version": data.get("version", EXPORT_VERSION)}
+        for group_data in data.get("groups", []):
+            yield {
+                "type": "group",
+                "name": group_data["name"],
+                "description": group_data.get("description", ""),
+            }
+            for node_data in group_data.get("resource_nodes", []):
+                yield {"type": "resource_node", **node_data}
+            for line_data in group_data.get("production_lines", []):
+                yield {"type": "production_line", **line_data}
+
+    return import_factory_records(session, records())
+
+def load_factory_ndjson(session: Session, fp: IO[bytes]) -> dict:
+    """
+    Import an NDJSON export (gzipped or not, detected from the content) from a
+    binary file, reading it one line at a time. See import_factory_records.
+    """
+    buffered = (
+        fp if isinstance(fp, io.BufferedReader) else io.BufferedReader(cast(io.RawIOBase, fp))
+    )
+    text: io.TextIOWrapper
+    if buffered.peek(2)[:2] == _GZIP_MAGIC:
+        text = io.TextIOWrapper(gzip.GzipFile(fileobj=buffered, mode="rb"), encoding="utf-8")
+    else:
+        text = io.TextIOWrapper(buffered, encoding="utf-8")
+    return import_factory_records(session, (json.loads(line) for line in text if line.strip()))
+
+def import_factory_records(
+    session: Session, records: Iterable[dict], batch_size: int = IMPORT_BATCH_SIZE
+) -> dict:
+    """
+    Import a stream of export records (see export_factory_records), appending to
+    the existing state.
+
+    Records are consumed incrementally and written every `batch_size` records:
+    item class names are resolved once each, groups, nodes, lines, factories and
+    line requirements go in as executemany inserts, and each distinct (item, rate)
+    factory chain in a batch is calculated once. Only the open batch is held in
+    memory. The whole import is one transaction; on any error it is rolled back
+    and nothing is imported.
+
+    Raises:
+        ValueError: If the stream does not start with a supported header record,
+            or a node or line record precedes every group record.
+
+    Returns:
+        {"groups", "lines", "nodes"} counts and "skipped_items", the class names
+        of nodes and lines whose item is not in the database.
     """
     summary: dict[str, Any] = {"groups": 0, "lines": 0, "nodes": 0, "skipped_items": []}
-    for group_data in data.get("groups", []):
-        group = create_group(
-            session, group_data["name"], group_data.get("description", "")
-        )
-        summary["groups"] += 1
+    records = iter(records)
+    header = next(records, None)
+    if (
+        header is None
+        or header.get("type") != "header"
+        or header.get("version") != EXPORT_VERSION
+    ):
+        raise ValueError(f"Not a version {EXPORT_VERSION} factory export: {header!r}")
+
+    graph = as_recipe_graph(session)
+    group_ids: list[int] = []
+    item_ids: dict[str, int | None] = {}
+    batch: list[tuple[str, _PendingGroup, dict]] = []
+    group: _PendingGroup | None = None
+    try:
+        for record in records:
+            kind = record.get("type")
+            if kind == "group":
+                group = _PendingGroup(record)
+                batch.append((kind, group, record))
+            elif kind in ("resource_node", "production_line"):
+                if group is None:
+                    raise ValueError(f"{kind} record before any group record")
+                batch.append((kind, group, record))
+            if len(batch) >= batch_size:
+                group_ids += _import_batch(session, graph, batch, item_ids, summary)
+                batch.clear()
+        group_ids += _import_batch(session, graph, batch, item_ids, summary)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    _touch(session, *group_ids)
+    return summary
 
-        for node_data in group_data.get("resource_nodes", []):
-            item = session.query(Item).filter_by(class_name=node_data["item_class"]).first()
-            if item is None:
-                summary["skipped_items"].append(node_data["item_class"])
-                continue
-            add_resource_node(
-                session, group.id, node_data["name"], item.id,
-                node_data.get("purity", "NORMAL"),
-                node_data.get("extraction_rate", 0.0),
+class _PendingGroup:
+    """A group record being imported; `id` is set once its row is inserted."""
+    __slots__ = ("record", "id")
+
+    def __init__(self, record: dict) -> None:
+        self.record = record
+        self.id: int | None = None
+
+class _GroupedRows:
+    """Iterator over (group_id, ...) rows sorted by group id, consumed group by group."""
+    __slots__ = ("_rows", "_head")
+
+    _DONE = object()
+
+    def __init__(self, rows: Iterable) -> None:
+        self._rows = iter(rows)
+        self._head: Any = next(self._rows, self._DONE)
+
+    def take_while(self, group_id: int) -> Iterator:
+        """Yield the rows of `group_id`, skipping rows of earlier (orphaned) groups."""
+        while self._head is not self._DONE and self._head[0] <= group_id:
+            row, self._head = self._head, next(self._rows, self._DONE)
+            if row[0] == group_id:
+                yield row
+
+def _insert_ids(
+    session: Session, model: type[Group] | type[ProductionLine], rows: list[dict]
+) -> list[int]:
+    """
+    Insert `rows` and return their new ids in row order.
+
+    Uses INSERT .. RETURNING with `sort_by_parameter_order`, so the ids come back
+    matched to their parameter sets whatever else writes to the table. Dialects
+    with an insertmanyvalues sentinel (PostgreSQL) batch the rows; on SQLite,
+    which has none for autoincrement keys, SQLAlchemy runs one INSERT per row.
+    """
+    if not rows:
+        return []
+    stmt = insert(model).returning(model.id, sort_by_parameter_order=True)
+    return list(session.scalars(stmt, rows))
+
+
+def _import_batch(
+    session: Session,
+    graph: RecipeGraph,
+    batch: list[tuple[str, _PendingGroup, dict]],
+    item_ids: dict[str, int | None],
+    summary: dict[str, Any],
+) -> list[int]:
+    """Bulk-insert one batch of import records and return the new group ids. Does not commit."""
+    unknown = {
+        record[_ITEM_CLASS_KEYS[kind]]
+        for kind, _, record in batch
+        if kind in _ITEM_CLASS_KEYS and record[_ITEM_CLASS_KEYS[kind]] not in item_ids
+    }
+    if unknown:
+        found = {
+            class_name: item_id
+            for class_name, item_id in session.execute(
+                select(Item.class_name, Item.id).where(Item.class_name.in_(unknown))
             )
-            summary["nodes"] += 1
-
-        for line_data in group_data.get("production_lines", []):
-            item = session.query(Item).filter_by(
-                class_name=line_data["target_item_class"]
-            ).first()
-            if item is None:
-                summary["skipped_items"].append(line_data["target_item_class"])
+        }
+        item_ids.update({name: found.get(name) for name in unknown})
+
+    new_groups = [group for kind, group, _ in batch if kind == "group"]
+    group_ids = _insert_ids(session, Group, [
+        {"name": g.record["name"], "description": g.record.get("description", "")}
+        for g in new_groups
+    ])
+    for group, group_id in zip(new_groups, group_ids, strict=True):
+        group.id = group_id
+    summary["groups"] += len(new_groups)
+
+    node_rows, line_rows = [], []
+    for kind, group, record in batch:
+        if kind == "resource_node":
+            item_id = item_ids[record["item_class"]]
+            if item_id is None:
+                summary["skipped_items"].append(record["item_class"])
+                continue
+            node_rows.append({
+                "name": record["name"],
+                "item_id": item_id,
+                "purity": Purity(record.get("purity", "NORMAL")),
+                "extraction_rate": record.get("extraction_rate", 0.0),
+                "group_id": group.id,
+            })
+        elif kind == "production_line":
+            item_id = item_ids[record["target_item_class"]]
+            if item_id is None:
+                summary["skipped_items"].append(record["target_item_class"])
                 continue
-            line = create_production_line(
-                session, group.id, line_data["name"], item.id,
-                line_data.get("target_rate", 60.0),
+            line_rows.append({
+                "name": record["name"],
+                "target_item_id": item_id,
+                "target_rate": record.get("target_rate", 60.0),
+                "group_id": group.id,
+                "is_active": record.get("is_active", True),
+            })
+
+    if node_rows:
+        session.execute(insert(_table(ResourceNode)), node_rows)
+    summary["nodes"] += len(node_rows)
+
+    line_ids = _insert_ids(session, ProductionLine, line_rows)
+    chains: dict[tuple[int, float], tuple[CompactChain, list[dict]]] = {}
+    factory_rows: list[dict] = []
+    requirement_rows: list[dict] = []
+    for line_id, row in zip(line_ids, line_rows, strict=True):
+        item_id, rate = target = (row["target_item_id"], row["target_rate"])
+        if target not in chains:
+            chains[target] = (
+                chain_templates.template(graph, item_id).scaled(rate),
+                _line_requirement_rows(graph, item_id, rate),
             )
-            if not line_data.get("is_active", True):
-                set_production_line_active(session, line.id, False)
-            summary["lines"] += 1
+        chain, requirements = chains[target]
+        factory_rows.extend(_factory_rows(graph, line_id, row["name"], chain))
+        requirement_rows.extend({**r, "line_id": line_id} for r in requirements)
+    if factory_rows:
+        session.execute(insert(_table(Factory)), factory_rows)
+    if requirement_rows:
+        session.execute(insert(_table(LineRequirement)), requirement_rows)
+    summary["lines"] += len(line_rows)
+    return group_ids
+
+
+# --- Catalog refresh ---
+
+def rebuild_lines_for_recipes(
+    session: Session, graph: RecipeGraph, recipe_ids: Collection[int]
+) -> list[int]:
+    """
+    Bring stored lines up to date after the ETL changed some recipes.
 
-    return summary
+    A line's factories are rebuilt when they use one of `recipe_ids` (a changed or
+    removed recipe) or when its default chain under `graph` does (a changed or
+    added recipe); other lines keep their factory rows untouched. Chains are
+    computed once per distinct (target, rate). Every line's requirements are then
+    rewritten for `graph`. Does not commit.
+
+    Args:
+        session: An active SQLAlchemy Session.
+        graph: Snapshot of the refreshed catalog, read through this session.
+        recipe_ids: Ids of the recipes the refresh added, changed or removed.
+
+    Returns:
+        Ids of the lines whose factories were rebuilt, ascending.
+    """
+    lines = session.scalars(select(ProductionLine).order_by(ProductionLine.id)).all()
+    if not lines:
+        return []
+    recipe_ids = set(recipe_ids)
+    stale = set(session.scalars(
+        select(Factory.production_line_id).where(Factory.recipe_id.in_(recipe_ids)).distinct()
+    ))
+    chains: dict[tuple[int, float], CompactChain] = {}
+
+    def chain(line: ProductionLine) -> CompactChain:
+        target = (line.target_item_id, line.target_rate)
+        if target not in chains:
+            chains[target] = chain_templates.template(graph, line.target_item_id).scaled(
+                line.target_rate
+            )
+        return chains[target]
+
+    rebuilt = [
+        line for line in lines
+        if line.id in stale
+        or any(recipe_id in recipe_ids for recipe_id, _ in chain(line).recipe_loads())
+    ] if recipe_ids else []
+    if rebuilt:
+        session.execute(
+            delete(Factory).where(Factory.production_line_id.in_([line.id for line in rebuilt]))
+        )
+        rows = [
+            row for line in rebuilt for row in _factory_rows(graph, line.id, line.name, chain(line))
+        ]
+        if rows:
+            session.execute(insert(_table(Factory)), rows)
+    _write_line_requirements(session, lines, graph)
+    return [line.id for line in rebuilt]
 
 
 # --- Starter data ---
@@ -1,5 +1,5 @@
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 from .database import (
     Building,
@@ -45,6 +45,26 @@ def _serialize_item(item: Item) -> ItemDetails:
     }
 
 
+def _serialize_production_line(line: ProductionLine) -> ProductionLineDetails:
+    """
+    Serializes a ProductionLine ORM object (with its target item loaded).
+
+    Args:
+        line: The ProductionLine ORM instance to serialize.
+
+    Returns:
+        A ProductionLineDetails dict.
+    """
+    return {
+        "id": line.id,
+        "name": line.name,
+        "target_item_id": line.target_item_id,
+        "target_item_name": line.target_item.name,
+        "target_rate": line.target_rate,
+        "is_active": line.is_active,
+        "group_id": line.group_id
+    }
+
 # --- Item Queries ---
 
 def get_item(session: Session, item_id: int) -> Item | None:
@@ -112,7 +132,10 @@ def get_item_recipe_usage(
 
 def get_recipe(session: Session, recipe_id: int) -> Recipe | None:
     """
-    Retrieves a single Recipe by its ID.
+    Retrieves a single Recipe by its ID, with its building, ingredients and their
+    items eager-loaded so `get_recipe_details` issues no further SQL.
+
+    Statements: 2 (recipe + building, then ingredients + items).
 
     Args:
         session: An active SQLAlchemy Session.
@@ -121,7 +144,14 @@ def get_recipe(session: Session, recipe_id: int) -> Recipe | None:
     Returns:
         The matching Recipe ORM instance, or None if not found.
     """
-    return session.execute(select(Recipe).where(Recipe.id == recipe_id)).scalar()
+    return session.execute(
+        select(Recipe)
+        .options(
+            joinedload(Recipe.building),
+            selectinload(Recipe.ingredients).joinedload(RecipeIngredient.item),
+        )
+        .where(Recipe.id == recipe_id)
+    ).scalar()
 
 def get_recipe_details(recipe: Recipe) -> RecipeDetails:
     """
@@ -161,16 +191,45 @@ def get_all_recipes(session: Session) -> list[RecipeDetails]:
     """
     Retrieves all recipes in the database as serialized dicts.
 
+    Statements: 2, however many recipes there are - one column-only SELECT for the
+    recipes and their buildings, one for every ingredient with its item name.
+
     Args:
         session: An active SQLAlchemy Session.
 
     Returns:
-        A list of RecipeDetails dicts for every Recipe in the database.
+        A list of RecipeDetails dicts for every Recipe in the database, ordered by id.
     """
-    return [
-        get_recipe_details(recipe) for recipe in 
-            session.execute(select(Recipe)).scalars().all()
-    ]
+    recipes: dict[int, RecipeDetails] = {
+        recipe_id: {
+            "id": recipe_id,
+            "name": name,
+            "building": building,
+            "crafting_time": crafting_time,
+            "inputs": [],
+            "outputs": [],
+        }
+        for recipe_id, name, building, crafting_time in session.execute(
+            select(Recipe.id, Recipe.name, Building.name, Recipe.crafting_time)
+            .join(Recipe.building)
+            .order_by(Recipe.id)
+        )
+    }
+    for recipe_id, item_name, quantity, is_output in session.execute(
+        select(
+            RecipeIngredient.recipe_id,
+            Item.name,
+            RecipeIngredient.quantity,
+            RecipeIngredient.is_output,
+        )
+        .join(RecipeIngredient.item)
+        .order_by(RecipeIngredient.id)
+    ):
+        recipe = recipes.get(recipe_id)
+        if recipe is not None:
+            entry: IngredientEntry = {"name": item_name, "quantity": quantity}
+            recipe["outputs" if is_output else "inputs"].append(entry)
+    return list(recipes.values())
 
 def get_recipes_for_item(session: Session, item_id: int) -> list[Recipe]:
     """
@@ -181,15 +240,17 @@ def get_recipes_for_item(session: Session, item_id: int) -> list[Recipe]:
         item_id: The primary key of the Item to find recipes for.
 
     Returns:
-        A list of Recipe ORM instances that output the specified item.
+        A list of Recipe ORM instances that output the specified item, ordered by id so
+        the first entry (the calculator's default) is stable across query plans.
         Returns an empty list if the item has no producing recipes (i.e. it is a raw material).
     """
-    return session.execute(select(Recipe)
-                           .join(Recipe.ingredients)
-                           .where(
-                               RecipeIngredient.item_id == item_id,
-                               RecipeIngredient.is_output.is_(True)
-                           )).scalars().all()
+    return list(session.execute(select(Recipe)
+                                .join(Recipe.ingredients)
+                                .where(
+                                    RecipeIngredient.item_id == item_id,
+                                    RecipeIngredient.is_output.is_(True)
+                                )
+                                .order_by(Recipe.id)).scalars())
 
 
 # --- Building Queries ---
@@ -226,22 +287,45 @@ def get_all_groups(session: Session) -> list[GroupSummary]:
     """
     Retrieves all groups with aggregate counts for production lines and resource nodes.
 
+    Statements: 1 - the counts are GROUP BY subqueries outer-joined to the groups.
+
     Args:
         session: An active SQLAlchemy Session.
 
     Returns:
-        A list of GroupSummary dicts for every Group in the database.
+        A list of GroupSummary dicts for every Group in the database, ordered by id.
     """
-    groups = session.execute(select(Group)).scalars().all()
+    line_counts = (
+        select(ProductionLine.group_id, func.count().label("n"))
+        .group_by(ProductionLine.group_id)
+        .subquery()
+    )
+    node_counts = (
+        select(ResourceNode.group_id, func.count().label("n"))
+        .group_by(ResourceNode.group_id)
+        .subquery()
+    )
+    rows = session.execute(
+        select(
+            Group.id,
+            Group.name,
+            Group.description,
+            func.coalesce(line_counts.c.n, 0),
+            func.coalesce(node_counts.c.n, 0),
+        )
+        .outerjoin(line_counts, line_counts.c.group_id == Group.id)
+        .outerjoin(node_counts, node_counts.c.group_id == Group.id)
+        .order_by(Group.id)
+    ).all()
     return [
         {
-            "id": group.id,
-            "name": group.name,
-            "description": group.description,
-            "production_line_count": len(group.production_lines),
-            "resource_node_count": len(group.resource_nodes)
+            "id": group_id,
+            "name": name,
+            "description": description,
+            "production_line_count": line_count,
+            "resource_node_count": node_count,
         }
-        for group in groups
+        for group_id, name, description, line_count, node_count in rows
     ]
 
 
@@ -266,6 +350,8 @@ def get_production_lines_for_group(session: Session, group_id: int) -> list[Prod
     """
     Retrieves all production lines belonging to a group as serialized dicts.
 
+    Statements: 1 (target items joined in).
+
     Args:
         session: An active SQLAlchemy Session.
         group_id: The primary key of the Group to query.
@@ -274,26 +360,38 @@ def get_production_lines_for_group(session: Session, group_id: int) -> list[Prod
         A list of ProductionLineDetails dicts for every ProductionLine in the group.
     """
     lines = session.execute(
-        select(ProductionLine).where(ProductionLine.group_id == group_id)
+        select(ProductionLine)
+        .options(joinedload(ProductionLine.target_item))
+        .where(ProductionLine.group_id == group_id)
     ).scalars().all()
 
-    return [
-        {
-            "id": line.id,
-            "name": line.name,
-            "target_item_id": line.target_item_id,
-            "target_item_name": line.target_item.name,
-            "target_rate": line.target_rate,
-            "is_active": line.is_active,
-            "group_id": line.group_id
-        }
-        for line in lines
-    ]
+    return [_serialize_production_line(line) for line in lines]
+
+def get_all_production_lines(session: Session) -> list[ProductionLineDetails]:
+    """
+    Retrieves every production line as serialized dicts.
+
+    Statements: 1 (target items joined in).
+
+    Args:
+        session: An active SQLAlchemy Session.
+
+    Returns:
+        A list of ProductionLineDetails dicts ordered by id.
+    """
+    lines = session.execute(
+        select(ProductionLine)
+        .options(joinedload(ProductionLine.target_item))
+        .order_by(ProductionLine.id)
+    ).scalars().all()
+    return [_serialize_production_line(line) for line in lines]
 
 def get_factories_for_production_line(session: Session, production_line_id: int) -> list[FactoryDetails]:
     """
     Retrieves all factories within a production line, ordered by their processing order.
 
+    Statements: 1 (recipes and their buildings joined in).
+
     Args:
         session: An active SQLAlchemy Session.
         production_line_id: The primary key of the ProductionLine to query.
@@ -303,6 +401,7 @@ def get_factories_for_production_line(session: Session, production_line_id: int)
     """
     factories = session.execute(
         select(Factory)
+        .options(joinedload(Factory.recipe).joinedload(Recipe.building))
         .where(Factory.production_line_id == production_line_id)
         .order_by(Factory.order)
     ).scalars().all()
@@ -328,6 +427,8 @@ def get_resource_nodes_for_group(session: Session, group_id: int) -> list[Resour
     """
     Retrieves all resource nodes in a group.
 
+    Statements: 1 (items joined in).
+
     Args:
         session: An active SQLAlchemy Session.
         group_id: The primary key of the Group to query.
@@ -337,6 +438,7 @@ def get_resource_nodes_for_group(session: Session, group_id: int) -> list[Resour
     """
     nodes = session.execute(
         select(ResourceNode)
+        .options(joinedload(ResourceNode.item))
         .where(ResourceNode.group_id == group_id)
     ).scalars().all()
 
@@ -351,3 +453,48 @@ def get_resource_nodes_for_group(session: Session, group_id: int) -> list[Resour
         }
         for node in nodes
     ]
+
+def get_resource_totals(session: Session, group_id: int) -> dict[str, float]:
+    """
+    Sums a group's resource-node extraction rates per item name in SQL.
+
+    Statements: 1 (GROUP BY item name).
+
+    Args:
+        session: An active SQLAlchemy Session.
+        group_id: The primary key of the Group to aggregate.
+
+    Returns:
+        A dict mapping item name to total extraction rate (items/min), in the order
+        each material's first node was added.
+    """
+    query = (
+        select(Item.name, func.sum(ResourceNode.extraction_rate))
+        .join(ResourceNode.item)
+        .group_by(Item.name)
+        .where(ResourceNode.group_id == group_id)
+        .order_by(func.min(ResourceNode.id))
+    )
+    return {name: total for name, total in session.execute(query).all()}
+
+def get_resource_totals_by_group(session: Session) -> dict[int, dict[str, float]]:
+    """
+    Per-group resource totals for every group, in one GROUP BY query.
+
+    Args:
+        session: An active SQLAlchemy Session.
+
+    Returns:
+        A dict mapping group id to {item name: total extraction rate}. Groups
+        without resource nodes are absent.
+    """
+    totals: dict[int, dict[str, float]] = {}
+    for group_id, name, total in session.execute(
+        select(ResourceNode.group_id, Item.name, func.sum(ResourceNode.extraction_rate))
+        .join(ResourceNode.item)
+        .where(ResourceNode.group_id.is_not(None))
+        .group_by(ResourceNode.group_id, Item.name)
+        .order_by(ResourceNode.group_id, func.min(ResourceNode.id))
+    ).all():
+        totals.setdefault(group_id, {})[name] = total
+    return totals
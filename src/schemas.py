@@ -46,6 +46,52 @@ class ProductionNode(TypedDict):
     power_mw_total: float
 
 
+class RecipeTotal(TypedDict):
+    """One recipe's aggregated load across an entire chain."""
+    recipe_id: int
+    recipe_name: str
+    building_name: str
+    num_buildings_ideal: float        # summed over every consumer of the recipe's output
+    num_buildings_rounded: int
+    clock_speed: float
+    total_power_mw: float
+    depth: int                        # longest path from the target (0 = target recipe)
+
+
+class ChainTotals(TypedDict):
+    """
+    Aggregated (DAG) view of a production chain. Each item and recipe appears once,
+    with demand summed across all of its consumers, instead of once per tree path.
+    """
+    item_id: int
+    item_name: str
+    required_rate: float
+    is_raw_material: bool
+    item_rates: dict[str, float]      # total demand per item, target and raws included
+    recipe_totals: list[RecipeTotal]  # deepest (closest to raw) first, target last
+    raw_materials: dict[str, float]
+    byproducts_totals: dict[str, float]
+    building_summary: dict[str, float]
+    power_mw_total: float             # per aggregated recipe, i.e. as factories are built
+
+
+class OptimizedPlan(ChainTotals):
+    """ChainTotals for the recipe mix picked by the optimizer."""
+    objective: str                    # "resources", "power" or "buildings"
+    objective_value: float
+    preferred_recipes: dict[int, int] # item_id -> recipe carrying most of its output
+
+
+class UnitCostDetails(TypedDict):
+    """Cost of producing 1 item/min under the default recipes. Scales linearly."""
+    item_id: int
+    is_raw_material: bool
+    raw_materials: dict[str, float]
+    building_summary: dict[str, float]  # building name -> ideal count
+    building_count: float               # sum of building_summary
+    power_mw: float                     # ideal buildings at 100% clock (no rounding)
+
+
 class IngredientEntry(TypedDict):
     name: str
     quantity: int
@@ -0,0 +1,103 @@
+"""
+Write-versioned cache of group summaries.
+
+Each group has a write version drawn from one process-wide, monotonically
+increasing counter. The production mutators bump the version of exactly the
+groups they touch, after their commit; a cached summary is served only while its
+group's version is unchanged, so editing one group leaves every other group's
+summary cached. `get_global_summary` assembles the network view from these
+per-group entries and recomputes only the dirty ones.
+
+Entries are kept per engine (tests and tools open several databases in one
+process) and are dropped when the recipe catalog changes. Writes made outside
+`production.py` - another process, raw SQL - are not seen; call `clear` after them.
+
+Cached summaries are shared between callers: treat them as read-only.
+"""
+
+import itertools
+import threading
+import weakref
+
+from sqlalchemy import Connection, Engine
+
+_Bind = Engine | Connection
+
+
+class _EngineSummaries:
+    __slots__ = ("versions", "entries", "catalog_version")
+
+    def __init__(self) -> None:
+        self.versions: dict[int, int] = {}                  # group_id -> write version
+        self.entries: dict[int, tuple[int, dict]] = {}      # group_id -> (version, summary)
+        self.catalog_version: str | None = None
+
+
+class GroupSummaryCache:
+    """Thread-safe per-engine store of group summaries keyed by (group id, write version)."""
+
+    def __init__(self) -> None:
+        self._engines: weakref.WeakKeyDictionary[_Bind, _EngineSummaries] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _state(self, bind: _Bind, catalog_version: str | None = None) -> _EngineSummaries:
+        state = self._engines.get(bind)
+        if state is None:
+            state = self._engines[bind] = _EngineSummaries()
+        if catalog_version is not None and state.catalog_version != catalog_version:
+            state.entries.clear()
+            state.catalog_version = catalog_version
+        return state
+
+    def version(self, bind: _Bind, group_id: int) -> int:
+        """Current write version of a group (0 if it was never written here)."""
+        with self._lock:
+            return self._state(bind).versions.get(group_id, 0)
+
+    def touch(self, bind: _Bind, *group_ids: int) -> None:
+        """Mark groups as written: their cached summaries are stale from now on."""
+        with self._lock:
+            state = self._state(bind)
+            for group_id in group_ids:
+                state.versions[group_id] = next(self._counter)
+                state.entries.pop(group_id, None)
+
+    def get(self, bind: _Bind, group_id: int, version: int, catalog_version: str) -> dict | None:
+        """The summary cached for `group_id` at `version`, or None."""
+        with self._lock:
+            entry = self._state(bind, catalog_version).entries.get(group_id)
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(
+        self, bind: _Bind, group_id: int, version: int, catalog_version: str, summary: dict
+    ) -> None:
+        """
+        Store a summary computed after reading `version`. If the group was written
+        since, the entry is stale on arrival and is not stored.
+        """
+        with self._lock:
+            state = self._state(bind, catalog_version)
+            if state.versions.get(group_id, 0) == version:
+                state.entries[group_id] = (version, summary)
+
+    def clear(self, bind: _Bind | None = None) -> None:
+        """Drop every cached summary for `bind` (or for every engine)."""
+        with self._lock:
+            if bind is None:
+                states = list(self._engines.values())
+            else:
+                states = [self._engines[bind]] if bind in self._engines else []
+            for state in states:
+                state.entries.clear()
+
+
+group_summaries = GroupSummaryCache()
@@ -0,0 +1,180 @@
+"""
+Parser for the Unreal Engine property text found in Docs.json values.
+
+Struct and array properties are exported in UE's text form, e.g. a recipe's
+ingredients and the buildings it is made in:
+
+    ((ItemClass=/Script/Engine.BlueprintGeneratedClass'"/Game/.../Desc_IronIngot.Desc_IronIngot_C"',Amount=3),(...))
+    ("/Game/.../Build_SmelterMk1.Build_SmelterMk1_C","/Script/FactoryGame.FGBuildableAutomatedWorkBench")
+
+`parse_value` tokenizes such a string in one left-to-right pass and builds the
+value it describes: a parenthesized list of `Key=value` fields becomes a dict, any
+other parenthesized list a tuple, and everything else a str (quoted strings are
+unquoted). `parse_item_amounts` and `parse_class_paths` turn the two shapes the
+ETL reads into typed tuples, keeping every class whatever its prefix (Desc_, BP_,
+Build_, ...) and pairing each class with its own amount.
+"""
+
+import re
+from typing import NamedTuple
+
+UEValue = str | tuple["UEValue", ...] | dict[str, "UEValue"]
+
+_QUOTED = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+# One token: punctuation, a struct field name with its "=", a quoted string, or a
+# bare atom (which may embed quoted strings, as object references like
+# Class'"/Game/Path.Name_C"' do).
+_TOKEN = re.compile(
+    rf'\s*(?:(?P<punct>[(),])|(?P<key>\w+)\s*=|(?P<quoted>{_QUOTED})'
+    rf'|(?P<atom>[^\s(),="][^(),="]*(?:{_QUOTED}[^(),="]*)*))'
+)
+_ESCAPE = re.compile(r"\\(.)")
+
+
+class ItemAmount(NamedTuple):
+    """One `(ItemClass=...,Amount=N)` entry of an ingredient or product list."""
+    class_name: str                  # e.g. "Desc_IronIngot_C", "BP_ItemDescriptorPortableMiner_C"
+    amount: int
+
+
+class ObjectPath(NamedTuple):
+    """An object path split at its last dot: "/Game/.../Build_X" + "Build_X_C"."""
+    package: str
+    name: str
+
+
+class _List:
+    """A parenthesized list being parsed: bare items or Key=value fields, never both."""
+    __slots__ = ("items", "fields", "key")
+
+    def __init__(self, key: str | None) -> None:
+        self.items: list[UEValue] = []
+        self.fields: dict[str, UEValue] = {}
+        self.key = key                     # field name this list is the value of
+
+    def add(self, key: str | None, value: UEValue, pos: int) -> None:
+        if key is None and not self.fields:
+            self.items.append(value)
+        elif key is not None and not self.items:
+            self.fields[key] = value
+        else:
+            raise ValueError(f"struct mixes Key=value fields and bare values at {pos}")
+
+    def value(self) -> UEValue:
+        return self.fields if self.fields else tuple(self.items)
+
+
+def parse_value(text: str) -> UEValue:
+    """
+    Parse one UE exported-text value in a single pass over its tokens.
+
+    Returns:
+        A dict for `(Key=value,...)`, a tuple for any other `(a,b,...)`, else the
+        string (unquoted if it was quoted). "" parses to "".
+
+    Raises:
+        ValueError: Unbalanced parentheses, a struct mixing `Key=value` and bare
+            elements, or text left over after the value.
+    """
+    stack: list[_List] = []
+    key: str | None = None                 # field name awaiting its value
+    expect_value = True                    # after "(" / "," / "=", or at the start
+    result: UEValue | None = None
+    value: UEValue
+    value_key: str | None
+    pos = 0
+    match = _TOKEN.match
+    while (m := match(text, pos)) is not None:
+        pos = m.end()
+        kind = m.lastgroup
+        assert kind is not None            # every alternative is a named group
+        token, start = m.group(kind), m.start(kind)
+        if result is not None:
+            raise ValueError(f"unexpected {token!r} at {start} after the value")
+        if kind == "punct":
+            if token == "(":
+                if not expect_value:
+                    raise ValueError(f"unexpected '(' at {start}")
+                stack.append(_List(key))
+                key = None
+                continue
+            if not stack or key is not None or (
+                expect_value and not (token == ")" and not stack[-1].items and not stack[-1].fields)
+            ):
+                raise ValueError(f"unexpected {token!r} at {start}")
+            if token == ",":
+                expect_value = True
+                continue
+            closed = stack.pop()
+            value, value_key = closed.value(), closed.key
+        elif not expect_value or (kind == "key" and (not stack or key is not None)):
+            raise ValueError(f"unexpected {token!r} at {start}")
+        elif kind == "key":
+            key = m.group("key")
+            continue
+        else:
+            value = token.rstrip() if kind == "atom" else _ESCAPE.sub(r"\1", token[1:-1])
+            value_key, key = key, None
+        expect_value = False
+        if stack:
+            stack[-1].add(value_key, value, start)
+        else:
+            result = value
+    if text[pos:].strip():
+        raise ValueError(f"unexpected {text[pos:pos + 20]!r} at {pos}")
+    if stack or key is not None:
+        raise ValueError("unexpected end of property text")
+    return "" if result is None else result
+
+
+def object_path(reference: str) -> ObjectPath:
+    """
+    Split an object path or reference (`Type'"/Game/Path.Name_C"'`, `Type'/Path.Name'`,
+    `"/Game/Path.Name_C"`) into package and object name.
+    """
+    if "'" in reference:
+        reference = reference.split("'", 1)[1].rstrip("'")
+    package, _, name = reference.strip('"').rpartition(".")
+    return ObjectPath(package, name)
+
+
+def parse_item_amounts(text: str) -> list[ItemAmount]:
+    """
+    Parse an `mIngredients` / `mProduct` value into (class name, amount) pairs, in order.
+
+    Raises:
+        ValueError: The text is not a list of `(ItemClass=...,Amount=N)` structs.
+    """
+    value = parse_value(text)
+    if value == "":
+        return []
+    if not isinstance(value, tuple):
+        raise ValueError(f"expected a list of item amounts, got {text[:40]!r}")
+    amounts = []
+    for entry in value:
+        item_class = entry.get("ItemClass") if isinstance(entry, dict) else None
+        amount = entry.get("Amount") if isinstance(entry, dict) else None
+        if not isinstance(item_class, str) or not isinstance(amount, str):
+            raise ValueError(f"expected (ItemClass=...,Amount=N), got {entry!r}")
+        amounts.append(ItemAmount(object_path(item_class).name, int(amount)))
+    return amounts
+
+
+def parse_class_paths(text: str) -> list[ObjectPath]:
+    """
+    Parse a path array such as `mProducedIn` into ObjectPaths, in order.
+
+    Raises:
+        ValueError: The text is not a list of paths.
+    """
+    value = parse_value(text)
+    if value == "":
+        return []
+    if not isinstance(value, tuple):
+        raise ValueError(f"expected a list of object paths, got {text[:40]!r}")
+    paths = []
+    for path in value:
+        if not isinstance(path, str):
+            raise ValueError(f"expected an object path, got {path!r}")
+        paths.append(object_path(path))
+    return paths
@@ -0,0 +1,126 @@
+"""
+Precomputed per-item unit costs.
+
+The ETL stores, for every item, the raw materials, ideal buildings and power needed
+to make 1 item/min under the default recipes (`unit_costs` table). Each row is
+tagged with the RecipeGraph version it was computed from. Only the ETL
+(`etl.refresh_catalog`) and `database.upgrade_schema` write the table; a lookup
+is a primary-key SELECT plus the shared RecipeGraph's generation check, and
+returns None for rows computed from a different catalog, so edited recipes never
+serve stale costs and callers fall back to the chain calculator.
+
+All values are linear in the rate. Power is the ideal figure (fractional buildings
+at 100% clock); the calculator's rounded-up power is not linear and is not stored.
+"""
+
+import weakref
+
+from sqlalchemy import Connection, Engine, delete, inspect, select
+from sqlalchemy.orm import Session
+
+from .calculator import calculate_chain
+from .database import UnitCost
+from .graph import RecipeGraph, as_recipe_graph
+from .schemas import UnitCostDetails
+
+# Binds the unit_costs table has been seen on (it is never dropped once created).
+_has_table: "weakref.WeakKeyDictionary[Engine | Connection, bool]" = weakref.WeakKeyDictionary()
+
+
+def build_unit_costs(session: Session, graph: RecipeGraph | None = None) -> int:
+    """
+    Rebuild the unit_costs table for every item in the catalog. Does not commit.
+
+    Args:
+        session: An active SQLAlchemy Session on a database with the current schema.
+        graph: Catalog snapshot to compute from. Defaults to a fresh snapshot of the
+            session's database rather than the shared one, which may predate the ETL.
+
+    Returns:
+        The number of rows written.
+    """
+    if graph is None:
+        graph = RecipeGraph.from_session(session)
+    building_power = {r.building_name: r.building_power_mw for r in graph.recipes}
+
+    rows = []
+    for item_id in graph.item_ids:
+        chain = calculate_chain(graph, item_id, 1.0, tree=False)
+        buildings = chain["building_summary"]
+        rows.append(UnitCost(
+            item_id=item_id,
+            catalog_version=graph.version,
+            is_raw_material=chain["is_raw_material"],
+            raw_materials=chain["raw_materials"],
+            building_summary=buildings,
+            building_count=sum(buildings.values()),
+            power_mw=sum(count * building_power[name] for name, count in buildings.items()),
+        ))
+    session.execute(delete(UnitCost))
+    session.add_all(rows)
+    return len(rows)
+
+
+def _table_exists(session: Session) -> bool:
+    bind = session.get_bind()
+    if not _has_table.get(bind):
+        _has_table[bind] = inspect(session.connection()).has_table(UnitCost.__tablename__)
+    return _has_table[bind]
+
+
+def get_unit_cost(session: Session, item_id: int) -> UnitCostDetails | None:
+    """
+    Cost of producing 1 item/min of an item under the default recipes.
+
+    Read-only: never creates, rebuilds or commits anything.
+
+    Statements: 2 (the row, and the ETL generation behind the shared RecipeGraph),
+    plus a table-existence check until the table has been seen on this engine.
+
+    Args:
+        session: An active SQLAlchemy Session.
+        item_id: Item to look up.
+
+    Returns:
+        A UnitCostDetails dict (multiply by the target rate), or None if the item
+        does not exist, the table is missing or not yet built, or the row was
+        computed from a different catalog than the current one.
+    """
+    if not _table_exists(session):
+        return None
+    row = session.execute(
+        select(
+            UnitCost.catalog_version,
+            UnitCost.is_raw_material,
+            UnitCost.raw_materials,
+            UnitCost.building_summary,
+            UnitCost.building_count,
+            UnitCost.power_mw,
+        ).where(UnitCost.item_id == item_id)
+    ).first()
+    if row is None or row.catalog_version != as_recipe_graph(session).version:
+        return None
+    return UnitCostDetails(
+        item_id=item_id,
+        is_raw_material=row.is_raw_material,
+        raw_materials=dict(row.raw_materials),
+        building_summary=dict(row.building_summary),
+        building_count=row.building_count,
+        power_mw=row.power_mw,
+    )
+
+
+def ensure_unit_costs(session: Session) -> bool:
+    """
+    Rebuild the unit_costs table if it is empty or was computed from a different
+    catalog. Does not commit; for `database.upgrade_schema`.
+
+    Returns:
+        True if the table was rebuilt.
+    """
+    graph = RecipeGraph.from_session(session)
+    stored = session.scalars(select(UnitCost.catalog_version).limit(1)).first()
+    if stored == graph.version:
+        return False
+    build_unit_costs(session, graph)
+    return True
@@ -1,12 +1,16 @@
+import io
 import json
 import os
+import time
+from contextlib import ExitStack
 
 import streamlit as st
 from dotenv import load_dotenv
 
-from src.cache import cached_all_items, ensure_db_ready
-from src.database import get_engine, get_session, Purity
+from src.cache import cached_catalog, cached_engine, ensure_db_ready
+from src.database import get_session, Purity
 from src.game_constants import MINER_TIERS, default_extraction_rate, minimum_belt_tier
+from src.instrumentation import QueryStats, record_queries
 from src.queries import (
     get_all_groups,
     get_factories_for_production_line,
@@ -20,10 +24,12 @@ from src.production import (
     delete_group,
     delete_production_line,
     delete_resource_node,
+    dump_factory_ndjson,
     export_factory_state,
     get_global_summary,
     get_group_summary,
     import_factory_state,
+    load_factory_ndjson,
     rename_group,
     rename_production_line,
     set_production_line_active,
@@ -33,13 +39,50 @@ from src.production import (
 
 
 load_dotenv()
-engine = get_engine(os.getenv('DATABASE_URL'))
+engine = cached_engine(os.getenv('DATABASE_URL'))
 
 st.set_page_config(page_title="Satisfactory Dashboard", page_icon="🏭", layout="wide")
 ensure_db_ready(engine)
 
 session = get_session(engine)
 
+# Started before any query so the panel covers the whole rerun.
+rerun_started = time.perf_counter()
+profiling = ExitStack()
+query_stats = (
+    profiling.enter_context(record_queries())
+    if st.session_state.get("show_performance") else None
+)
+
+
+def _render_performance_panel(stats: QueryStats, rerun_ms: float) -> None:
+    with st.expander("Performance", expanded=True):
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("SQL statements", stats.count)
+        col2.metric("SQL time", f"{stats.total_ms:.1f} ms")
+        col3.metric("p95 statement", f"{stats.p95_ms:.2f} ms")
+        col4.metric("Rerun time", f"{rerun_ms:.1f} ms")
+        st.markdown("**By caller**")
+        st.dataframe(
+            [
+                {"caller": caller, "statements": c.statements, "total_ms": round(c.total_ms, 2)}
+                for caller, c in stats.by_caller().items()
+            ],
+            use_container_width=True,
+        )
+        st.markdown("**Slowest statements**")
+        st.dataframe(
+            [
+                {
+                    "ms": round(r.duration_ms, 2),
+                    "caller": r.caller,
+                    "statement": " ".join(r.statement.split())[:200],
+                }
+                for r in stats.slowest(10)
+            ],
+            use_container_width=True,
+        )
+
 
 def _balance_emoji(balance: float) -> str:
     if balance >= 0:
@@ -49,9 +92,9 @@ def _balance_emoji(balance: float) -> str:
 
 try:
     groups = get_all_groups(session)
-    all_items = cached_all_items(session)
-    items_by_name = {item['name']: item['id'] for item in all_items}
-    sorted_item_names = sorted(items_by_name.keys())
+    catalog = cached_catalog(engine)
+    items_by_name = catalog.item_ids_by_name
+    sorted_item_names = list(catalog.item_names)
 
     # --- Modals ---
 
@@ -285,11 +328,31 @@ try:
             mime="application/json",
             use_container_width=True,
         )
-        uploaded = st.file_uploader("Import factory (.json)", type=["json"])
+        # The streaming export walks every line, so build it only when asked for
+        # and drop it once downloaded rather than on every rerun.
+        if st.button("Prepare export (.ndjson.gz)", use_container_width=True):
+            ndjson_buffer = io.BytesIO()
+            dump_factory_ndjson(session, ndjson_buffer, compress=True)
+            st.session_state["ndjson_export"] = ndjson_buffer.getvalue()
+        if "ndjson_export" in st.session_state:
+            st.download_button(
+                "Export factory (.ndjson.gz)",
+                st.session_state["ndjson_export"],
+                file_name="satisfactory_factory.ndjson.gz",
+                mime="application/gzip",
+                on_click=lambda: st.session_state.pop("ndjson_export", None),
+                use_container_width=True,
+            )
+        uploaded = st.file_uploader(
+            "Import factory (.json, .ndjson, .ndjson.gz)", type=["json", "ndjson", "gz"]
+        )
         if uploaded is not None:
             try:
-                imported_data = json.loads(uploaded.getvalue().decode("utf-8"))
-                result = import_factory_state(session, imported_data)
+                if uploaded.name.endswith((".ndjson", ".gz")):
+                    result = load_factory_ndjson(session, uploaded)
+                else:
+                    imported_data = json.loads(uploaded.getvalue().decode("utf-8"))
+                    result = import_factory_state(session, imported_data)
                 st.success(
                     f"Imported: {result['groups']} groups, "
                     f"{result['lines']} lines, {result['nodes']} nodes."
@@ -300,9 +363,16 @@ try:
                         "not present in the database."
                     )
                 st.rerun()
-            except (json.JSONDecodeError, KeyError) as exc:
+            except (ValueError, KeyError, OSError) as exc:
                 st.error(f"Could not parse file: {exc}")
 
+        st.divider()
+        st.toggle(
+            "Performance panel",
+            key="show_performance",
+            help="Count and time the SQL statements of each rerun.",
+        )
+
     # --- Main: title + global overview ---
 
     st.title("Satisfactory Factory Dashboard")
@@ -316,7 +386,7 @@ try:
     with m2:
         st.metric(
             "Production Lines",
-            sum(len(g['production_lines']) for g in summary['groups']),
+            summary['production_line_count'],
         )
     with m3:
         st.metric("Buildings (active)", summary['total_buildings'])
@@ -491,4 +561,8 @@ try:
             st.write("No resource nodes in this group.")
 
 finally:
+    profiling.close()
     session.close()
+
+if query_stats is not None:
+    _render_performance_panel(query_stats, (time.perf_counter() - rerun_started) * 1000)
@@ -1,9 +1,14 @@
 """Calculator unit tests - pure-functional, deterministic, no Streamlit."""
 
 import math
+import sys
+
+import pytest
 
 from src.calculator import calculate_chain, calculate_recipe_requirements
-from src.database import Item, Recipe
+from src.compact import compact_chain
+from src.database import Item, Recipe, RecipeIngredient
+from src.graph import Flow, RecipeGraph, RecipeSpec
 
 
 def _item(session, class_name: str) -> Item:
@@ -125,3 +130,122 @@ class TestCalculateChain:
         except AttributeError:
             # acceptable: no such item, get_item returns None -> AttributeError on .name
             pass
+
+
+class TestTraversal:
+    def test_totals_only_matches_tree(self, seeded_session):
+        screw = _item(seeded_session, 'Desc_Screw_C')
+        cast = _recipe(seeded_session, 'Recipe_Alternate_Screw_C')
+        for class_name, preferred in (
+            ('Desc_IronPlate_C', None),
+            ('Desc_Screw_C', None),
+            ('Desc_Screw_C', {screw.id: cast.id}),
+            ('Desc_Fuel_C', None),
+        ):
+            item = _item(seeded_session, class_name)
+            tree = calculate_chain(seeded_session, item.id, 45.0, preferred_recipes=preferred)
+            flat = calculate_chain(
+                seeded_session, item.id, 45.0, preferred_recipes=preferred, tree=False
+            )
+
+            assert 'dependencies' not in flat
+            assert flat['recipe'] == tree['recipe']
+            for key in ('raw_materials', 'byproducts_totals', 'building_summary'):
+                assert flat[key] == pytest.approx(tree[key])
+            assert math.isclose(flat['power_mw_total'], tree['power_mw_total'])
+
+    def test_cycle_cut_at_repeated_item(self):
+        # A <- B <- A: the second A on the path is treated as raw.
+        graph = RecipeGraph(
+            [(1, 'Desc_A_C', 'A'), (2, 'Desc_B_C', 'B')],
+            [_spec(10, (1, 'A'), (2, 'B')), _spec(11, (2, 'B'), (1, 'A'))],
+        )
+        for tree in (True, False):
+            node = calculate_chain(graph, 1, 5.0, tree=tree)
+            assert node['raw_materials'] == {'A': 5.0}
+            assert node['building_summary'] == pytest.approx({'Constructor': 10.0})
+
+    def test_chain_deeper_than_recursion_limit(self):
+        depth = sys.getrecursionlimit() + 200
+        graph = RecipeGraph(
+            [(i, f'Desc_Part{i}_C', f'Part {i}') for i in range(depth + 1)],
+            [_spec(1000 + i, (i, f'Part {i}'), (i + 1, f'Part {i + 1}')) for i in range(depth)],
+        )
+
+        node = calculate_chain(graph, 0, 2.0)
+        assert node['raw_materials'] == {f'Part {depth}': 2.0}
+        assert node['building_summary'] == pytest.approx({'Constructor': 2.0 * depth})
+        flat = calculate_chain(graph, 0, 2.0, tree=False)
+        assert flat['power_mw_total'] == pytest.approx(node['power_mw_total'])
+
+
+def _spec(recipe_id: int, output: tuple[int, str], input_: tuple[int, str]) -> RecipeSpec:
+    """1 input -> 1 output every 60s (1/min) in a 4 MW Constructor."""
+    return RecipeSpec(
+        id=recipe_id, name=f'Recipe {recipe_id}', crafting_time=60.0,
+        building_id=1, building_name='Constructor', building_power_mw=4.0,
+        inputs=(Flow(*input_, 1, 1.0),), outputs=(Flow(*output, 1, 1.0),),
+    )
+
+
+class TestAggregateChain:
+    def _add_reinforced_plate(self, session) -> Item:
+        """6 Iron Plate + 12 Screw -> 1 Reinforced Iron Plate in 12s. Both need Iron Ingot."""
+        rip = Item(class_name='Desc_IronPlateReinforced_C', name='Reinforced Iron Plate')
+        session.add(rip)
+        session.flush()
+        recipe = Recipe(
+            class_name='Recipe_IronPlateReinforced_C', name='Reinforced Iron Plate',
+            crafting_time=12.0,
+            building_id=_recipe(session, 'Recipe_IronPlate_C').building_id,
+        )
+        session.add(recipe)
+        session.flush()
+        session.add_all([
+            RecipeIngredient(recipe_id=recipe.id, item_id=_item(session, 'Desc_IronPlate_C').id,
+                             quantity=6, is_output=False),
+            RecipeIngredient(recipe_id=recipe.id, item_id=_item(session, 'Desc_Screw_C').id,
+                             quantity=12, is_output=False),
+            RecipeIngredient(recipe_id=recipe.id, item_id=rip.id, quantity=1, is_output=True),
+        ])
+        session.commit()
+        return rip
+
+    def test_totals_match_tree(self, seeded_session):
+        for class_name in ('Desc_IronPlate_C', 'Desc_Screw_C', 'Desc_Fuel_C'):
+            item = _item(seeded_session, class_name)
+            tree = calculate_chain(seeded_session, item.id, 45.0)
+            flat = calculate_chain(seeded_session, item.id, 45.0, aggregate=True)
+            for key in ('raw_materials', 'byproducts_totals', 'building_summary'):
+                assert flat[key] == pytest.approx(tree[key])
+            assert math.isclose(flat['power_mw_total'], tree['power_mw_total'])
+
+    def test_shared_intermediate_expanded_once(self, seeded_session):
+        rip = self._add_reinforced_plate(seeded_session)
+        tree = calculate_chain(seeded_session, rip.id, 5.0)
+        flat = calculate_chain(seeded_session, rip.id, 5.0, aggregate=True)
+
+        # 30 plate/min needs 45 ingot; 60 screw/min needs 15 rod -> 15 ingot
+        assert math.isclose(flat['item_rates']['Iron Ingot'], 60.0)
+        ingot_totals = [r for r in flat['recipe_totals'] if r['recipe_name'] == 'Iron Ingot']
+        assert len(ingot_totals) == 1
+        assert math.isclose(ingot_totals[0]['num_buildings_ideal'], 2.0)
+        assert flat['raw_materials'] == pytest.approx(tree['raw_materials'])
+        assert flat['building_summary'] == pytest.approx(tree['building_summary'])
+
+    def test_recipe_totals_match_tree_loads(self, seeded_session):
+        rip = self._add_reinforced_plate(seeded_session)
+        flat = calculate_chain(seeded_session, rip.id, 5.0, aggregate=True)
+
+        loads = compact_chain(seeded_session, rip.id, 5.0).recipe_loads()
+        assert [r['recipe_id'] for r in flat['recipe_totals']] == [rid for rid, _ in loads]
+        assert [r['num_buildings_ideal'] for r in flat['recipe_totals']] == pytest.approx(
+            [load for _, load in loads]
+        )
+
+    def test_raw_target(self, seeded_session):
+        ore = _item(seeded_session, 'Desc_OreIron_C')
+        flat = calculate_chain(seeded_session, ore.id, 60.0, aggregate=True)
+        assert flat['is_raw_material'] is True
+        assert flat['raw_materials'] == {'Iron Ore': 60.0}
+        assert flat['recipe_totals'] == []
@@ -0,0 +1,53 @@
+"""Catalog snapshot tests - contents, indexes, immutability and ETL generations."""
+
+import pytest
+
+from src.catalog import Catalog
+from src.database import Item, get_etl_generation, new_etl_generation
+from src.queries import get_all_items, get_all_recipes
+
+
+def _item(session, class_name: str) -> Item:
+    return session.query(Item).filter_by(class_name=class_name).one()
+
+
+@pytest.fixture()
+def catalog(seeded_session) -> Catalog:
+    return Catalog.from_session(seeded_session, "gen-1")
+
+
+class TestCatalog:
+    def test_matches_queries(self, seeded_session, catalog):
+        assert catalog.generation == "gen-1"
+        assert list(catalog.items) == get_all_items(seeded_session)
+        assert list(catalog.recipes) == get_all_recipes(seeded_session)
+        assert catalog.item_names == tuple(sorted(i['name'] for i in catalog.items))
+
+    def test_lookups(self, seeded_session, catalog):
+        plate = _item(seeded_session, 'Desc_IronPlate_C')
+        assert catalog.item_ids_by_name['Iron Plate'] == plate.id
+        assert catalog.items_by_id[plate.id]['name'] == 'Iron Plate'
+
+    def test_producer_and_consumer_indexes(self, seeded_session, catalog):
+        screw = _item(seeded_session, 'Desc_Screw_C')
+        ingot = _item(seeded_session, 'Desc_IronIngot_C')
+        assert [r['name'] for r in catalog.producers_of(screw.id)] == ['Screw', 'Cast Screw']
+        assert {r['name'] for r in catalog.consumers_of(ingot.id)} >= {
+            'Iron Plate', 'Iron Rod', 'Cast Screw',
+        }
+        ore = _item(seeded_session, 'Desc_OreIron_C')
+        assert catalog.producers_of(ore.id) == []
+
+    def test_immutable(self, catalog):
+        with pytest.raises(AttributeError):
+            catalog.items = ()
+        with pytest.raises(TypeError):
+            catalog.item_ids_by_name['Iron Plate'] = 0
+
+
+def test_etl_generation(engine, seeded_session):
+    assert get_etl_generation(engine) == "0"
+    first = new_etl_generation(seeded_session)
+    seeded_session.commit()
+    assert get_etl_generation(engine) == first
+    assert new_etl_generation(seeded_session) != first
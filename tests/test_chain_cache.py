@@ -0,0 +1,91 @@
+"""Template cache tests - scaled templates must match a fresh calculation."""
+
+import math
+
+import pytest
+
+from src.calculator import calculate_chain, whole_buildings
+from src.chain_cache import ChainTemplateCache
+from src.database import Item, Recipe
+from src.graph import RecipeGraph
+
+
+def _item(session, class_name: str) -> Item:
+    return session.query(Item).filter_by(class_name=class_name).one()
+
+
+def _assert_same_chain(actual, expected):
+    assert actual['item_id'] == expected['item_id']
+    assert actual['is_raw_material'] == expected['is_raw_material']
+    assert math.isclose(actual['required_rate'], expected['required_rate'])
+    assert math.isclose(actual['power_mw_total'], expected['power_mw_total'])
+    for key in ('raw_materials', 'byproducts_totals', 'building_summary'):
+        assert actual[key] == pytest.approx(expected[key])
+    if expected['is_raw_material']:
+        return
+    for key in ('num_buildings_rounded', 'recipe_id'):
+        assert actual['recipe'][key] == expected['recipe'][key]
+    assert math.isclose(actual['recipe']['clock_speed'], expected['recipe']['clock_speed'])
+    assert actual['dependencies'].keys() == expected['dependencies'].keys()
+    for name, dep in expected['dependencies'].items():
+        _assert_same_chain(actual['dependencies'][name], dep)
+
+
+@pytest.fixture()
+def graph(seeded_session) -> RecipeGraph:
+    return RecipeGraph.from_session(seeded_session)
+
+
+class TestScaling:
+    @pytest.mark.parametrize("rate", [0.5, 20.0, 37.5, 60.0, 1234.0])
+    def test_scaled_template_matches_fresh_chain(self, seeded_session, graph, rate):
+        screw = _item(seeded_session, 'Desc_Screw_C')
+        cache = ChainTemplateCache()
+        _assert_same_chain(cache.get(graph, screw.id, rate), calculate_chain(graph, screw.id, rate))
+
+    def test_rounding_rederived(self, seeded_session, graph):
+        """20 ingot/min at unit rate x 20 must round to 1 building @ 66.7%, not 0.67."""
+        ingot = _item(seeded_session, 'Desc_IronIngot_C')
+        node = ChainTemplateCache().get(graph, ingot.id, 20.0)
+        assert node['recipe']['num_buildings_rounded'] == 1
+        assert math.isclose(node['recipe']['clock_speed'], 100.0 * 2 / 3)
+
+    def test_results_are_private_copies(self, seeded_session, graph):
+        plate = _item(seeded_session, 'Desc_IronPlate_C')
+        cache = ChainTemplateCache()
+        first = cache.get(graph, plate.id, 60.0)
+        first['raw_materials']['Iron Ore'] = -1.0
+        assert cache.get(graph, plate.id, 60.0)['raw_materials'] == {'Iron Ore': 90.0}
+
+
+class TestLru:
+    def test_hits_misses_and_preferred_key(self, seeded_session, graph):
+        screw = _item(seeded_session, 'Desc_Screw_C')
+        cast = seeded_session.query(Recipe).filter_by(class_name='Recipe_Alternate_Screw_C').one()
+        cache = ChainTemplateCache()
+
+        cache.get(graph, screw.id, 40.0)
+        cache.get(graph, screw.id, 80.0)
+        alt = cache.get(graph, screw.id, 40.0, {screw.id: cast.id})
+
+        assert alt['recipe']['recipe_name'] == "Cast Screw"
+        info = cache.info()
+        assert (info.hits, info.misses, info.currsize) == (1, 2, 2)
+
+    def test_evicts_least_recently_used(self, seeded_session, graph):
+        ids = [_item(seeded_session, c).id for c in ('Desc_IronPlate_C', 'Desc_IronRod_C', 'Desc_Screw_C')]
+        cache = ChainTemplateCache(maxsize=2)
+        cache.get(graph, ids[0], 1.0)
+        cache.get(graph, ids[1], 1.0)
+        cache.get(graph, ids[0], 1.0)   # refresh ids[0]
+        cache.get(graph, ids[2], 1.0)   # evicts ids[1]
+
+        assert cache.info().currsize == 2
+        cache.get(graph, ids[1], 1.0)
+        assert cache.info().misses == 4
+
+
+def test_whole_buildings_ignores_float_noise():
+    assert whole_buildings(3.0000000000000004) == 3
+    assert whole_buildings(3.01) == 4
+    assert whole_buildings(0.2) == 1
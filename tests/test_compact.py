@@ -0,0 +1,147 @@
+"""Compact chain tests - to_dict parity, template sharing and id-keyed totals."""
+
+import math
+
+import pytest
+
+from src.calculator import calculate_chain
+from src.compact import compact_chain
+from src.database import Building, Item, Recipe, RecipeIngredient
+from src.graph import Flow, RecipeGraph, RecipeSpec
+
+
+def _item(session, class_name: str) -> Item:
+    return session.query(Item).filter_by(class_name=class_name).one()
+
+
+@pytest.fixture()
+def frame_session(seeded_session):
+    """
+    Adds "Frame": 2 Iron Plate + 2 Iron Rod + 8 Screw -> 1 Frame in 60s. Iron Ingot
+    (and the Rod subtree, via Screw) then appears under several parents.
+    """
+    s = seeded_session
+    frame = Item(class_name='Desc_Frame_C', name='Frame')
+    s.add(frame)
+    s.flush()
+    constructor = s.query(Building).filter_by(class_name='Build_ConstructorMk1_C').one()
+    recipe = Recipe(class_name='Recipe_Frame_C', name='Frame', crafting_time=60.0,
+                    building_id=constructor.id)
+    s.add(recipe)
+    s.flush()
+    for class_name, qty in (('Desc_IronPlate_C', 2), ('Desc_IronRod_C', 2), ('Desc_Screw_C', 8)):
+        s.add(RecipeIngredient(recipe_id=recipe.id, item_id=_item(s, class_name).id,
+                               quantity=qty, is_output=False))
+    s.add(RecipeIngredient(recipe_id=recipe.id, item_id=frame.id, quantity=1, is_output=True))
+    s.commit()
+    return s
+
+
+@pytest.fixture()
+def graph(frame_session) -> RecipeGraph:
+    return RecipeGraph.from_session(frame_session)
+
+
+class TestCompactChain:
+    @pytest.mark.parametrize("class_name", [
+        'Desc_OreIron_C', 'Desc_IronPlate_C', 'Desc_Screw_C', 'Desc_Fuel_C', 'Desc_Frame_C',
+    ])
+    def test_to_dict_matches_calculate_chain(self, frame_session, graph, class_name):
+        item = _item(frame_session, class_name)
+        chain = compact_chain(graph, item.id, 42.0)
+        assert chain.to_dict() == calculate_chain(graph, item.id, 42.0)
+        assert chain.scaled(0.5).to_dict() == calculate_chain(graph, item.id, 21.0)
+
+    def test_preferred_recipes(self, frame_session, graph):
+        screw = _item(frame_session, 'Desc_Screw_C')
+        cast = frame_session.query(Recipe).filter_by(class_name='Recipe_Alternate_Screw_C').one()
+        preferred = {screw.id: cast.id}
+        chain = compact_chain(graph, screw.id, 40.0, preferred_recipes=preferred)
+        assert chain.to_dict() == calculate_chain(graph, screw.id, 40.0, preferred_recipes=preferred)
+
+    def test_shared_subtrees_stored_once(self, frame_session, graph):
+        frame = _item(frame_session, 'Desc_Frame_C')
+        chain = compact_chain(graph, frame.id, 1.0)
+
+        # Frame -> Plate -> Ingot -> Ore, Rod -> Ingot -> Ore, Screw -> Rod -> Ingot -> Ore
+        assert chain.node_count == len(_flatten(chain.to_dict())) == 11
+        # Frame, Plate, Rod, Screw, Ingot, Ore
+        assert chain.template_count == 6
+
+    def test_totals_keyed_by_id(self, frame_session, graph):
+        frame = _item(frame_session, 'Desc_Frame_C')
+        chain = compact_chain(graph, frame.id, 3.0)
+        totals = chain.totals()
+        tree = chain.to_dict()
+
+        ore = _item(frame_session, 'Desc_OreIron_C')
+        assert totals.raw_materials == pytest.approx({ore.id: tree['raw_materials']['Iron Ore']})
+        assert sum(totals.building_summary.values()) == pytest.approx(
+            sum(tree['building_summary'].values())
+        )
+        assert math.isclose(totals.power_mw_total, tree['power_mw_total'])
+
+    def test_recipe_loads_match_tree(self, frame_session, graph):
+        frame = _item(frame_session, 'Desc_Frame_C')
+        loads = compact_chain(graph, frame.id, 5.0).recipe_loads()
+        expected = _tree_recipe_loads(calculate_chain(graph, frame.id, 5.0))
+        assert [rid for rid, _ in loads] == [rid for rid, _ in expected]
+        assert [load for _, load in loads] == pytest.approx([load for _, load in expected])
+
+
+def test_cycle_cut_depends_on_path():
+    """
+    C needs A and B, and A <-> B form a loop. A's subtree under C is cut at the
+    second A; A's subtree under B is cut at B instead. Neither may share a template.
+    """
+    def spec(recipe_id, output, inputs):
+        return RecipeSpec(
+            id=recipe_id, name=f'R{recipe_id}', crafting_time=60.0, building_id=1,
+            building_name='Constructor', building_power_mw=4.0,
+            inputs=tuple(Flow(i, n, 1, 1.0) for i, n in inputs),
+            outputs=(Flow(*output, 1, 1.0),),
+        )
+
+    graph = RecipeGraph(
+        [(1, 'Desc_A_C', 'A'), (2, 'Desc_B_C', 'B'), (3, 'Desc_C_C', 'C')],
+        [spec(10, (1, 'A'), [(2, 'B')]), spec(11, (2, 'B'), [(1, 'A')]),
+         spec(12, (3, 'C'), [(1, 'A'), (2, 'B')])],
+    )
+    chain = compact_chain(graph, 3, 2.0)
+    assert chain.to_dict() == calculate_chain(graph, 3, 2.0)
+    # C; A -> B -> A(cut); B -> A -> B(cut): nothing can be shared
+    assert chain.template_count == chain.node_count == 7
+    assert chain.totals().raw_materials == pytest.approx({1: 2.0, 2: 2.0})
+
+    # Loads follow the tree: A runs under C and under B, and B likewise, so each
+    # needs 4 buildings. An aggregate DAG cuts the loop once and sizes them 2 and 4.
+    loads = chain.recipe_loads()
+    expected = _tree_recipe_loads(calculate_chain(graph, 3, 2.0))
+    assert [rid for rid, _ in loads] == [rid for rid, _ in expected] == [10, 11, 12]
+    assert [load for _, load in loads] == pytest.approx([load for _, load in expected])
+    assert [load for _, load in loads] == pytest.approx([4.0, 4.0, 2.0])
+
+
+def _tree_recipe_loads(tree) -> list[tuple[int, float]]:
+    """Reference walk of a calculate_chain tree: ideal buildings summed per recipe, deepest first."""
+    loads: dict[int, list] = {}
+
+    def visit(node, depth):
+        if node.get('is_raw_material'):
+            return
+        req = node['recipe']
+        entry = loads.setdefault(req['recipe_id'], [0.0, depth])
+        entry[0] += req['num_buildings_ideal']
+        entry[1] = max(entry[1], depth)
+        for dep in node.get('dependencies', {}).values():
+            visit(dep, depth + 1)
+
+    visit(tree, 0)
+    return [(rid, load) for rid, (load, _) in sorted(loads.items(), key=lambda kv: -kv[1][1])]
+
+
+def _flatten(node) -> list:
+    nodes = [node]
+    for dep in node.get('dependencies', {}).values():
+        nodes.extend(_flatten(dep))
+    return nodes
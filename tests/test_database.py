@@ -0,0 +1,43 @@
+"""Engine registry tests - sharing, in-memory exclusion, pragmas and pooling."""
+
+import pytest
+from sqlalchemy import text
+
+from src import database
+from src.database import dispose_engines, get_engine, get_session, shared_engine
+
+
+@pytest.fixture()
+def db_url(tmp_path):
+    yield f"sqlite:///{tmp_path / 'test.db'}"
+    dispose_engines()
+
+
+class TestSharedEngine:
+    def test_one_engine_per_url(self, db_url):
+        assert shared_engine(db_url) is shared_engine(db_url)
+
+    def test_in_memory_never_shared(self):
+        assert shared_engine("sqlite:///:memory:") is not shared_engine("sqlite:///:memory:")
+
+    def test_defaults_to_database_url(self, db_url, monkeypatch):
+        monkeypatch.setenv("DATABASE_URL", db_url)
+        assert shared_engine() is shared_engine(db_url)
+
+    def test_pool_options_from_env(self, db_url, monkeypatch):
+        monkeypatch.setenv("DATABASE_POOL_SIZE", "3")
+        assert shared_engine(db_url).pool.size() == 3
+
+    def test_sqlite_pragmas(self, db_url):
+        with shared_engine(db_url).connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1   # NORMAL
+            assert conn.execute(text("PRAGMA temp_store")).scalar() == 2    # MEMORY
+            assert conn.execute(text("PRAGMA cache_size")).scalar() == -64 * 1024
+
+
+def test_session_factory_reused(db_url, monkeypatch):
+    engine = get_engine(db_url)
+    get_session(engine).close()
+    monkeypatch.setattr(database, "sessionmaker", None)  # would fail if called again
+    get_session(engine).close()
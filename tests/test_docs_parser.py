@@ -0,0 +1,62 @@
+"""Streaming Docs.json reader - encodings, chunk boundaries, filtering and errors."""
+
+import io
+import json
+
+import pytest
+
+from src.docs_parser import detect_encoding, iter_sections
+
+SECTIONS = [
+    {"NativeClass": "/Script/FactoryGame.FGItemDescriptor",
+     "Classes": [{"ClassName": "Desc_IronPlate_C", "mDescription": "Braces { ] and \"quotes\""}]},
+    {"NativeClass": "/Script/FactoryGame.FGSchematic",
+     "Classes": [{"ClassName": "Schematic_1_C", "mDescription": "Überlast \\ 世界"}]},
+    {"NativeClass": "/Script/FactoryGame.FGRecipe", "Classes": []},
+]
+TEXT = json.dumps(SECTIONS, indent=2, ensure_ascii=False).replace("\n", "\r\n")
+
+
+@pytest.mark.parametrize("encoding, expected", [
+    ("utf-8", "utf-8"),
+    ("utf-8-sig", "utf-8-sig"),
+    ("utf-16", "utf-16"),
+    ("utf-16-le", "utf-16-le"),
+    ("utf-16-be", "utf-16-be"),
+    ("utf-32", "utf-32"),
+    ("utf-32-be", "utf-32-be"),
+])
+def test_encodings(encoding, expected):
+    raw = TEXT.encode(encoding)
+    assert detect_encoding(raw[:4]) == expected
+    assert list(iter_sections(io.BytesIO(raw))) == SECTIONS
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_sections_split_across_chunks(tmp_path, chunk_size):
+    path = tmp_path / "Docs.json"
+    path.write_bytes(TEXT.encode("utf-16"))
+    assert list(iter_sections(path, chunk_size=chunk_size)) == SECTIONS
+
+
+def test_filters_by_native_class():
+    got = iter_sections(io.BytesIO(TEXT.encode()), ("FGRecipe", "ItemDescriptor"))
+    assert [s["NativeClass"].rsplit(".", 1)[1] for s in got] == ["FGItemDescriptor", "FGRecipe"]
+
+
+def test_empty_array():
+    assert list(iter_sections(io.BytesIO(b" [ ] \n"))) == []
+
+
+@pytest.mark.parametrize("text", [
+    '{"NativeClass": "x"}',
+    '[{"NativeClass": "x"}',
+    '[{"NativeClass": "x"}, ]',
+    '[{"NativeClass": "x"} {"NativeClass": "y"}]',
+    '[1, 2]',
+    '[{"NativeClass": "x",}]',
+    '[{"NativeClass": "x"}] trailing',
+])
+def test_malformed(text):
+    with pytest.raises(ValueError):
+        list(iter_sections(io.BytesIO(text.encode()), chunk_size=4))
@@ -0,0 +1,259 @@
+"""ETL tests - a miniature Docs.json loaded, then refreshed incrementally after a "patch"."""
+
+import copy
+import json
+
+import pytest
+from sqlalchemy import select
+
+from src import etl
+from src.database import (
+    Building,
+    Factory,
+    Group,
+    Item,
+    ProductionLine,
+    Recipe,
+    RecipeIngredient,
+    UnitCost,
+    get_etl_generation,
+)
+from src.etl import read_docs, refresh_catalog
+from src.instrumentation import record_queries
+from src.production import create_group, create_production_line
+
+_ITEM_PATH = "/Script/Engine.BlueprintGeneratedClass'\"/Game/FactoryGame/Resource/{0}.{0}_C\"'"
+
+
+def _item(class_stem: str, name: str) -> dict:
+    return {
+        "ClassName": f"{class_stem}_C",
+        "mDisplayName": name,
+        "mDescription": "",
+        "mForm": "RF_SOLID",
+        "mStackSize": "SS_HUGE",
+        "mEnergyValue": "0.000000",
+        "mRadioactiveDecay": "0.000000",
+        "mResourceSinkPoints": "1",
+        "mFluidColor": "(B=0,G=0,R=0,A=0)",
+    }
+
+
+def _parts(*parts: tuple[str, int]) -> str:
+    inner = ",".join(f"(ItemClass={_ITEM_PATH.format(stem)},Amount={n})" for stem, n in parts)
+    return f"({inner})"
+
+
+def _recipe(class_name: str, name: str, building: str, inputs, outputs) -> dict:
+    return {
+        "ClassName": class_name,
+        "mDisplayName": name,
+        "mIngredients": _parts(*inputs),
+        "mProduct": _parts(*outputs),
+        "mManufactoringDuration": "6.000000",
+        "mProducedIn": f'("/Game/FactoryGame/Buildable/Factory/{building}/Build_{building}'
+                       f'.Build_{building}_C")',
+    }
+
+
+DOCS = [
+    {"NativeClass": "/Script/FactoryGame.FGResourceDescriptor",
+     "Classes": [_item("Desc_OreIron", "Iron Ore")]},
+    {"NativeClass": "/Script/FactoryGame.FGItemDescriptor",
+     "Classes": [_item("Desc_IronIngot", "Iron Ingot"), _item("Desc_IronPlate", "Iron Plate")]},
+    {"NativeClass": "/Script/FactoryGame.FGRecipe", "Classes": [
+        _recipe("Recipe_IngotIron_C", "Iron Ingot", "SmelterMk1",
+                [("Desc_OreIron", 1)], [("Desc_IronIngot", 1)]),
+        _recipe("Recipe_IronPlate_C", "Iron Plate", "ConstructorMk1",
+                [("Desc_IronIngot", 3), ("Desc_Unknown", 1)], [("Desc_IronPlate", 2)]),
+        _recipe("Recipe_IronPlate_C", "Duplicate", "ConstructorMk1", [], []),
+        {**_recipe("Recipe_Handheld_C", "Build gun", "ConstructorMk1", [], []),
+         "mProducedIn": '("/Game/FactoryGame/Equipment/BuildGun/BP_BuildGun.BP_BuildGun_C")'},
+    ]},
+    {"NativeClass": "/Script/FactoryGame.FGBuildableManufacturer", "Classes": [
+        {"ClassName": "Build_SmelterMk1_C", "mPowerConsumption": "4.000000"},
+        {"ClassName": "Build_ConstructorMk1_C", "mPowerConsumption": "4.000000"},
+    ]},
+    {"NativeClass": "/Script/FactoryGame.FGSchematic", "Classes": [{"ClassName": "Schematic_1_C"}]},
+]
+
+
+def _write(path, docs) -> None:
+    """Write docs the way the game exports them: UTF-16 with a BOM."""
+    path.write_text(json.dumps(docs, indent=2), encoding="utf-16")
+
+
+def _recipes(docs: list[dict]) -> list[dict]:
+    return next(s for s in docs if s["NativeClass"].endswith("FGRecipe"))["Classes"]
+
+
+@pytest.fixture()
+def docs_path(tmp_path):
+    path = tmp_path / "Docs.json"
+    _write(path, DOCS)
+    return path
+
+
+@pytest.fixture()
+def loaded(session, docs_path):
+    with record_queries() as stats:
+        refresh = refresh_catalog(session, docs_path)
+    return refresh, stats
+
+
+@pytest.fixture()
+def lines(session, loaded):
+    """Two user lines: Iron Plate (uses both recipes) and Iron Ingot (smelting only)."""
+    group = create_group(session, "Base")
+    ids = {i.class_name: i.id for i in session.query(Item)}
+    plate = create_production_line(session, group.id, "Plates", ids["Desc_IronPlate_C"], 20.0)
+    ingot = create_production_line(session, group.id, "Ingots", ids["Desc_IronIngot_C"], 30.0)
+    return plate.id, ingot.id
+
+
+def _factory_ids(session, line_id: int) -> list[int]:
+    return sorted(session.scalars(select(Factory.id).where(Factory.production_line_id == line_id)))
+
+
+def test_read_docs_dispatches_sections(docs_path):
+    docs = read_docs(docs_path)
+    assert [i["ClassName"] for i in docs.items] == [
+        "Desc_OreIron_C", "Desc_IronIngot_C", "Desc_IronPlate_C",
+    ]
+    assert len(docs.recipes) == 4
+    assert docs.building_power == {"Build_SmelterMk1_C": 4.0, "Build_ConstructorMk1_C": 4.0}
+    assert set(docs.fingerprints) == {"items", "recipes", "manufacturers"}
+
+
+def test_loads_catalog(session, loaded):
+    refresh, _ = loaded
+    assert refresh.sections == ["items", "recipes", "manufacturers"]
+    assert {table: str(diff) for table, diff in refresh.diff.items()} == {
+        "items": "+3 ~0 -0", "buildings": "+2 ~0 -0", "recipes": "+2 ~0 -0",
+    }
+
+    buildings = {b.class_name: (b.name, b.power_mw) for b in session.query(Building)}
+    assert buildings == {
+        "Build_SmelterMk1_C": ("SmelterMk1", 4.0),
+        "Build_ConstructorMk1_C": ("ConstructorMk1", 4.0),
+    }
+    plate = session.query(Recipe).filter_by(class_name="Recipe_IronPlate_C").one()
+    assert plate.name == "Iron Plate"
+    assert plate.building.class_name == "Build_ConstructorMk1_C"
+    assert sorted(
+        (i.item.class_name, i.quantity, i.is_output) for i in plate.ingredients
+    ) == [("Desc_IronIngot_C", 3, False), ("Desc_IronPlate_C", 2, True)]
+    assert session.query(RecipeIngredient).count() == 4
+
+
+def test_unchanged_docs_are_skipped(session, engine, loaded, docs_path):
+    generation = get_etl_generation(engine)
+    with record_queries() as stats:
+        refresh = refresh_catalog(session, docs_path)
+    assert refresh.sections == [] and refresh.diff == {}
+    assert stats.count == 1                      # the stored fingerprints
+    assert get_etl_generation(engine) == generation
+
+
+def test_unrelated_section_change_writes_nothing(session, engine, loaded, docs_path):
+    generation = get_etl_generation(engine)
+    docs = copy.deepcopy(DOCS)
+    docs[-1]["Classes"].append({"ClassName": "Schematic_2_C"})
+    _write(docs_path, docs)
+    refresh = refresh_catalog(session, docs_path)
+    assert refresh.sections == [] and not refresh.catalog_changed
+    assert get_etl_generation(engine) == generation
+    assert refresh_catalog(session, docs_path).fingerprint == refresh.fingerprint
+
+
+def test_failed_refresh_is_retried(session, engine, docs_path, monkeypatch, capsys):
+    def fail(*args):
+        raise RuntimeError("unit costs failed")
+
+    monkeypatch.setattr(etl, "build_unit_costs", fail)
+    with pytest.raises(RuntimeError):
+        refresh_catalog(session, docs_path)
+    session.rollback()
+    assert get_etl_generation(engine) == "0"
+    assert session.query(Item).count() == 0
+
+    monkeypatch.undo()
+    refresh = refresh_catalog(session, docs_path)
+    assert refresh.catalog_changed
+    assert get_etl_generation(engine) != "0"
+    assert session.query(UnitCost).count() == session.query(Item).count() == 3
+    assert [p.name for p in refresh.phases] == [
+        "fingerprint", "read docs", "items", "recipes", "lines", "unit costs",
+    ]
+    assert capsys.readouterr().out == ""
+
+
+def test_patch_rebuilds_only_affected_lines(session, docs_path, lines):
+    plate_line, ingot_line = lines
+    ingot_factories = _factory_ids(session, ingot_line)
+    item_ids = {i.class_name: i.id for i in session.query(Item)}
+
+    docs = copy.deepcopy(DOCS)
+    _recipes(docs)[1]["mIngredients"] = _parts(("Desc_IronIngot", 4))
+    docs[1]["Classes"].append(_item("Desc_IronRod", "Iron Rod"))
+    docs[3]["Classes"][1]["mPowerConsumption"] = "5.000000"
+    _write(docs_path, docs)
+    refresh = refresh_catalog(session, docs_path)
+
+    assert refresh.sections == ["items", "recipes", "manufacturers"]
+    assert refresh.diff["items"].added == ["Desc_IronRod_C"]
+    assert refresh.diff["recipes"].changed == ["Recipe_IronPlate_C"]
+    assert refresh.diff["buildings"].changed == ["Build_ConstructorMk1_C"]
+    assert refresh.rebuilt_lines == [plate_line]
+    assert _factory_ids(session, ingot_line) == ingot_factories
+    assert {i.class_name: i.id for i in session.query(Item)} == {
+        **item_ids, "Desc_IronRod_C": item_ids["Desc_IronPlate_C"] + 1,
+    }
+    # 20 plates/min now need 40 ingots/min: four smelters (10/min each) instead of three.
+    smelting = session.query(Factory).filter_by(production_line_id=plate_line).first()
+    assert smelting.recipe.class_name == "Recipe_IngotIron_C"
+    assert smelting.building_count == 4
+    assert session.query(Group).count() == 1 and session.query(ProductionLine).count() == 2
+
+
+def test_non_desc_items_keep_their_amounts(session, docs_path, loaded):
+    docs = copy.deepcopy(DOCS)
+    docs[1]["Classes"].append(_item("BP_ItemDescriptorPortableMiner", "Portable Miner"))
+    _recipes(docs)[1]["mIngredients"] = _parts(
+        ("BP_ItemDescriptorPortableMiner", 1), ("Desc_IronIngot", 3),
+    )
+    _write(docs_path, docs)
+    refresh_catalog(session, docs_path)
+    plate = session.query(Recipe).filter_by(class_name="Recipe_IronPlate_C").one()
+    assert sorted(
+        (i.item.class_name, i.quantity) for i in plate.ingredients if not i.is_output
+    ) == [("BP_ItemDescriptorPortableMiner_C", 1), ("Desc_IronIngot_C", 3)]
+
+
+def test_unparsable_property_names_the_recipe(session, engine, docs_path, loaded):
+    generation = get_etl_generation(engine)
+    docs = copy.deepcopy(DOCS)
+    _recipes(docs)[1]["mIngredients"] = "((ItemClass=Desc_IronIngot_C,Amount=3)"
+    _write(docs_path, docs)
+    with pytest.raises(ValueError, match=r"^Recipe_IronPlate_C\.mIngredients: "):
+        refresh_catalog(session, docs_path)
+    session.rollback()
+    assert get_etl_generation(engine) == generation
+
+
+def test_removed_item_is_kept_while_a_line_uses_it(session, docs_path, lines):
+    plate_line, _ = lines
+    docs = copy.deepcopy(DOCS)
+    docs[1]["Classes"].pop()                     # Iron Plate item
+    docs[2]["Classes"] = [                       # and its recipe
+        r for r in _recipes(docs) if r["ClassName"] != "Recipe_IronPlate_C"
+    ]
+    _write(docs_path, docs)
+    refresh = refresh_catalog(session, docs_path)
+
+    assert refresh.diff["items"].removed == ["Desc_IronPlate_C"]
+    assert refresh.kept_items == ["Desc_IronPlate_C"]
+    assert refresh.diff["recipes"].removed == ["Recipe_IronPlate_C"]
+    assert refresh.rebuilt_lines == [plate_line]
+    assert session.query(Recipe).filter_by(class_name="Recipe_IronPlate_C").count() == 0
+    assert session.query(Factory).filter_by(production_line_id=plate_line).count() == 0
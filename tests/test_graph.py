@@ -0,0 +1,109 @@
+"""RecipeGraph snapshot tests - parity with the SQL-backed calculator, zero SQL."""
+
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import event
+
+from src.calculator import ProductionCalculator, calculate_chain
+from src.database import Item, Recipe, new_etl_generation
+from src.graph import RecipeGraph, as_recipe_graph, load_recipe_graph
+
+
+def _item(session, class_name: str) -> Item:
+    return session.query(Item).filter_by(class_name=class_name).one()
+
+
+def _recipe(session, class_name: str) -> Recipe:
+    return session.query(Recipe).filter_by(class_name=class_name).one()
+
+
+@pytest.fixture()
+def graph(seeded_session) -> RecipeGraph:
+    return RecipeGraph.from_session(seeded_session)
+
+
+class TestSnapshot:
+    def test_indexes_and_adjacency(self, seeded_session, graph):
+        screw = _item(seeded_session, 'Desc_Screw_C')
+        ore = _item(seeded_session, 'Desc_OreIron_C')
+
+        assert graph.item_count == 8
+        assert graph.recipe_count == 6
+        # default recipe first, alternate second
+        assert [r.name for r in graph.recipes_for(screw.id)] == ["Screw", "Cast Screw"]
+        assert graph.recipes_for(ore.id) == ()
+
+    def test_net_rate_vector(self, seeded_session, graph):
+        plate = _item(seeded_session, 'Desc_IronPlate_C')
+        ingot = _item(seeded_session, 'Desc_IronIngot_C')
+        recipe = _recipe(seeded_session, 'Recipe_IronPlate_C')
+
+        vector = dict(graph.net_rates[graph.recipe_index[recipe.id]])
+        assert vector == {
+            graph.item_index[ingot.id]: -30.0,
+            graph.item_index[plate.id]: 20.0,
+        }
+
+    def test_immutable(self, graph):
+        with pytest.raises(AttributeError):
+            graph.version = "x"
+
+    def test_load_is_cached_per_engine(self, seeded_session, engine):
+        assert load_recipe_graph(engine) is load_recipe_graph(engine)
+
+    def test_reloaded_after_a_new_etl_generation(self, seeded_session, engine):
+        seeded_session.commit()
+        before = as_recipe_graph(seeded_session)
+        _item(seeded_session, 'Desc_Screw_C').name = 'Patched Screw'
+        seeded_session.commit()
+        assert as_recipe_graph(seeded_session) is before   # same generation
+
+        new_etl_generation(seeded_session)                 # e.g. `python -m src.etl` elsewhere
+        seeded_session.commit()
+        after = load_recipe_graph(engine)
+        assert after is not before
+        assert after.item_name(_item(seeded_session, 'Desc_Screw_C').id) == 'Patched Screw'
+        assert as_recipe_graph(seeded_session) is after
+
+
+class TestChainParity:
+    @pytest.mark.parametrize(
+        "class_name,rate",
+        [('Desc_IronPlate_C', 60.0), ('Desc_Screw_C', 37.5), ('Desc_Fuel_C', 40.0)],
+    )
+    def test_matches_session_calculator(self, seeded_session, graph, class_name, rate):
+        item = _item(seeded_session, class_name)
+        assert calculate_chain(graph, item.id, rate) == calculate_chain(
+            seeded_session, item.id, rate
+        )
+
+    def test_preferred_recipe(self, seeded_session, graph):
+        screw = _item(seeded_session, 'Desc_Screw_C')
+        cast = _recipe(seeded_session, 'Recipe_Alternate_Screw_C')
+        node = ProductionCalculator(graph, {screw.id: cast.id}).calculate(screw.id, 40.0)
+
+        assert node['recipe']['recipe_name'] == "Cast Screw"
+        assert math.isclose(node['raw_materials']['Iron Ore'], 10.0)
+
+    def test_issues_no_sql(self, seeded_session, engine, graph):
+        plate = _item(seeded_session, 'Desc_IronPlate_C')
+        statements: list[str] = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            calculate_chain(graph, plate.id, 60.0)
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+        assert statements == []
+
+    def test_shared_across_threads(self, seeded_session, graph):
+        plate = _item(seeded_session, 'Desc_IronPlate_C')
+        expected = calculate_chain(graph, plate.id, 60.0)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda _: calculate_chain(graph, plate.id, 60.0), range(16)))
+        assert all(r == expected for r in results)
@@ -0,0 +1,95 @@
+"""Incremental recomputation tests - parity with calculate_chain and structural sharing."""
+
+import pytest
+
+from src.calculator import calculate_chain
+from src.database import Building, Item, Recipe, RecipeIngredient
+from src.graph import RecipeGraph
+from src.incremental import IncrementalChain
+
+
+def _item(session, class_name: str) -> Item:
+    return session.query(Item).filter_by(class_name=class_name).one()
+
+
+def _recipe(session, class_name: str) -> Recipe:
+    return session.query(Recipe).filter_by(class_name=class_name).one()
+
+
+@pytest.fixture()
+def frame_session(seeded_session):
+    """Adds "Frame": 2 Iron Plate + 2 Iron Rod + 8 Screw -> 1 Frame in 60s."""
+    s = seeded_session
+    frame = Item(class_name='Desc_Frame_C', name='Frame')
+    s.add(frame)
+    s.flush()
+    constructor = s.query(Building).filter_by(class_name='Build_ConstructorMk1_C').one()
+    recipe = Recipe(class_name='Recipe_Frame_C', name='Frame', crafting_time=60.0,
+                    building_id=constructor.id)
+    s.add(recipe)
+    s.flush()
+    for class_name, qty in (('Desc_IronPlate_C', 2), ('Desc_IronRod_C', 2), ('Desc_Screw_C', 8)):
+        s.add(RecipeIngredient(recipe_id=recipe.id, item_id=_item(s, class_name).id,
+                               quantity=qty, is_output=False))
+    s.add(RecipeIngredient(recipe_id=recipe.id, item_id=frame.id, quantity=1, is_output=True))
+    s.commit()
+    return s
+
+
+class TestIncrementalChain:
+    def test_switch_matches_full_recompute(self, frame_session):
+        graph = RecipeGraph.from_session(frame_session)
+        frame, screw = _item(frame_session, 'Desc_Frame_C'), _item(frame_session, 'Desc_Screw_C')
+        cast = _recipe(frame_session, 'Recipe_Alternate_Screw_C')
+
+        chain = IncrementalChain(graph, frame.id, 10.0)
+        chain.switch_recipe(screw.id, cast.id)
+        assert chain.root == calculate_chain(
+            graph, frame.id, 10.0, preferred_recipes={screw.id: cast.id}
+        )
+
+        chain.switch_recipe(screw.id, None)
+        assert chain.root == calculate_chain(graph, frame.id, 10.0)
+
+    def test_untouched_subtrees_are_shared(self, frame_session):
+        graph = RecipeGraph.from_session(frame_session)
+        frame, screw = _item(frame_session, 'Desc_Frame_C'), _item(frame_session, 'Desc_Screw_C')
+        cast = _recipe(frame_session, 'Recipe_Alternate_Screw_C')
+
+        chain = IncrementalChain(graph, frame.id, 10.0)
+        before = chain.root
+        snapshot = calculate_chain(graph, frame.id, 10.0)
+        after = chain.switch_recipe(screw.id, cast.id)
+
+        assert after is not before
+        assert before == snapshot  # the previous chain is left intact
+        assert after['dependencies']['Iron Plate'] is before['dependencies']['Iron Plate']
+        assert after['dependencies']['Iron Rod'] is before['dependencies']['Iron Rod']
+        assert after['dependencies']['Screw'] is not before['dependencies']['Screw']
+        # Cast Screw takes ingots directly, so the rod under Screw is gone from the index.
+        rod = _item(frame_session, 'Desc_IronRod_C')
+        assert chain.paths(rod.id) == [('Iron Rod',)]
+
+    def test_update_diffs_preferences(self, frame_session):
+        frame, screw = _item(frame_session, 'Desc_Frame_C'), _item(frame_session, 'Desc_Screw_C')
+        cast = _recipe(frame_session, 'Recipe_Alternate_Screw_C')
+        default = _recipe(frame_session, 'Recipe_Screw_C')
+
+        chain = IncrementalChain(frame_session, frame.id, 10.0)
+        root = chain.root
+        # An explicit default is the same recipe, so nothing is recomputed.
+        assert chain.update({screw.id: default.id}) is root
+        assert chain.update({screw.id: cast.id}) == calculate_chain(
+            frame_session, frame.id, 10.0, preferred_recipes={screw.id: cast.id}
+        )
+        assert chain.preferred_recipes == {screw.id: cast.id}
+
+    def test_switching_the_root(self, frame_session):
+        screw = _item(frame_session, 'Desc_Screw_C')
+        cast = _recipe(frame_session, 'Recipe_Alternate_Screw_C')
+        chain = IncrementalChain(frame_session, screw.id, 40.0)
+        chain.switch_recipe(screw.id, cast.id)
+        assert chain.root == calculate_chain(
+            frame_session, screw.id, 40.0, preferred_recipes={screw.id: cast.id}
+        )
+        assert chain.paths(screw.id) == [()]
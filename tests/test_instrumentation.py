@@ -0,0 +1,63 @@
+"""Instrumentation tests - counting, timing, attribution and nesting."""
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from src.instrumentation import UNATTRIBUTED, QueryRecord, QueryStats, record_queries
+from src.production import create_group, get_global_summary
+from src.queries import get_all_groups
+
+
+def test_counts_and_attributes_statements(seeded_session):
+    create_group(seeded_session, "North", "")
+    with record_queries() as stats:
+        get_all_groups(seeded_session)
+        seeded_session.execute(text("SELECT 1"))
+    assert stats.count == 2
+    assert [r.caller for r in stats.records] == ["queries.get_all_groups", UNATTRIBUTED]
+    assert stats.total_ms >= stats.p95_ms >= 0.0
+
+
+def test_innermost_data_layer_caller_wins(seeded_session):
+    create_group(seeded_session, "North", "")
+    with record_queries() as stats:
+        get_global_summary(seeded_session)
+    callers = stats.by_caller()
+    assert callers["queries.get_all_groups"].statements == 1
+    assert sum(c.statements for c in callers.values()) == stats.count
+
+
+def test_nested_blocks_and_inactive_outside(seeded_session):
+    with record_queries() as outer:
+        get_all_groups(seeded_session)
+        with record_queries() as inner:
+            get_all_groups(seeded_session)
+    get_all_groups(seeded_session)
+    assert (outer.count, inner.count) == (2, 1)
+
+
+def test_instruments_foreign_engines():
+    engine = create_engine("sqlite:///:memory:")
+    with record_queries(engine) as stats, engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert stats.statements == ["SELECT 1"]
+
+
+def test_failed_statements_leave_nothing_behind():
+    engine = create_engine("sqlite:///:memory:")
+    with record_queries(engine) as stats, engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM missing"))
+        conn.execute(text("SELECT 1"))
+        assert not any("instrumentation" in str(key) for key in conn.info)
+    assert stats.statements == ["SELECT 1"]
+
+
+def test_summary_figures():
+    stats = QueryStats()
+    stats.records = [QueryRecord(f"q{n}", float(n), "a" if n % 2 else "b") for n in range(1, 21)]
+    assert stats.p95_ms == 19.0
+    assert [r.statement for r in stats.slowest(2)] == ["q20", "q19"]
+    assert stats.by_caller() == {"b": (10, 110.0), "a": (10, 100.0)}
@@ -0,0 +1,108 @@
+"""Matrix solver tests - closed loops and byproduct netting."""
+
+import math
+
+import pytest
+
+from src.calculator import calculate_chain
+from src.database import Building, Item, Recipe, RecipeIngredient
+from src.graph import RecipeGraph
+from src.linear import solve_chain
+
+
+def _item(session, class_name: str) -> Item:
+    return session.query(Item).filter_by(class_name=class_name).one()
+
+
+def _add_recipe(session, class_name, name, seconds, building, inputs, outputs) -> Recipe:
+    recipe = Recipe(class_name=class_name, name=name, crafting_time=seconds, building_id=building.id)
+    session.add(recipe)
+    session.flush()
+    for item, qty in inputs:
+        session.add(RecipeIngredient(recipe_id=recipe.id, item_id=item.id, quantity=qty, is_output=False))
+    for item, qty in outputs:
+        session.add(RecipeIngredient(recipe_id=recipe.id, item_id=item.id, quantity=qty, is_output=True))
+    return recipe
+
+
+@pytest.fixture()
+def loop_session(seeded_session):
+    """
+    Adds a Rubber <-> Plastic recycling loop fed by Fuel, a Widget that eats both
+    Residual Fuel outputs, and an unproductive Gizmo package/unpackage pair.
+    """
+    s = seeded_session
+    refinery = s.query(Building).filter_by(class_name='Build_OilRefinery_C').one()
+    fuel, resin = _item(s, 'Desc_Fuel_C'), _item(s, 'Desc_PolymerResin_C')
+    plastic = Item(class_name='Desc_Plastic_C', name='Plastic')
+    rubber = Item(class_name='Desc_Rubber_C', name='Rubber')
+    widget = Item(class_name='Desc_Widget_C', name='Widget')
+    gizmo = Item(class_name='Desc_Gizmo_C', name='Gizmo')
+    packed = Item(class_name='Desc_PackagedGizmo_C', name='Packaged Gizmo')
+    s.add_all([plastic, rubber, widget, gizmo, packed])
+    s.flush()
+    # 6 Rubber + 6 Fuel -> 12 Plastic / 12 Plastic + 6 Fuel -> 12 Rubber (per 12s)
+    _add_recipe(s, 'Recipe_RecycledPlastic_C', 'Recycled Plastic', 12.0, refinery,
+                [(rubber, 6), (fuel, 6)], [(plastic, 12)])
+    _add_recipe(s, 'Recipe_RecycledRubber_C', 'Recycled Rubber', 12.0, refinery,
+                [(plastic, 6), (fuel, 6)], [(rubber, 12)])
+    # 4 Fuel + 3 Polymer Resin -> 1 Widget per 6s (10/min)
+    _add_recipe(s, 'Recipe_Widget_C', 'Widget', 6.0, refinery,
+                [(fuel, 4), (resin, 3)], [(widget, 1)])
+    _add_recipe(s, 'Recipe_UnpackageGizmo_C', 'Unpackage Gizmo', 1.0, refinery,
+                [(packed, 1)], [(gizmo, 1)])
+    _add_recipe(s, 'Recipe_PackageGizmo_C', 'Package Gizmo', 1.0, refinery,
+                [(gizmo, 1)], [(packed, 1)])
+    s.commit()
+    return s
+
+
+@pytest.fixture()
+def graph(loop_session) -> RecipeGraph:
+    return RecipeGraph.from_session(loop_session)
+
+
+class TestSolveChain:
+    def test_matches_tree_on_acyclic_chain(self, seeded_session):
+        plate = _item(seeded_session, 'Desc_IronPlate_C')
+        graph = RecipeGraph.from_session(seeded_session)
+        solved = solve_chain(graph, plate.id, 60.0)
+        tree = calculate_chain(graph, plate.id, 60.0)
+
+        assert solved['raw_materials'] == pytest.approx(tree['raw_materials'])
+        assert solved['building_summary'] == pytest.approx(tree['building_summary'])
+        assert [r['recipe_name'] for r in solved['recipe_totals']] == ["Iron Ingot", "Iron Plate"]
+
+    def test_recycling_loop_closes_exactly(self, loop_session, graph):
+        plastic = _item(loop_session, 'Desc_Plastic_C')
+        solved = solve_chain(graph, plastic.id, 60.0)
+        activity = {r['recipe_name']: r['num_buildings_ideal'] for r in solved['recipe_totals']}
+
+        # 12p - 6q = 60 plastic/min net, 12q - 6p = 0 rubber -> p = 20/3, q = 10/3 cycles/min
+        assert math.isclose(activity['Recycled Plastic'], 20 / 3 / 5)
+        assert math.isclose(activity['Recycled Rubber'], 10 / 3 / 5)
+        # 60 fuel/min -> 1.5 Residual Fuel refineries -> 90 crude/min, 45 resin surplus
+        assert solved['raw_materials'] == pytest.approx({'Crude Oil': 90.0})
+        assert solved['byproducts_totals'] == pytest.approx({'Polymer Resin': 45.0})
+        assert 'Rubber' not in solved['raw_materials']
+
+    def test_byproducts_netted_against_inputs(self, loop_session, graph):
+        widget = _item(loop_session, 'Desc_Widget_C')
+        solved = solve_chain(graph, widget.id, 10.0)
+        tree = calculate_chain(graph, widget.id, 10.0)
+
+        # One Residual Fuel refinery covers both the fuel and the resin
+        assert solved['raw_materials'] == pytest.approx({'Crude Oil': 60.0})
+        assert solved['byproducts_totals'] == {}
+        assert tree['raw_materials']['Crude Oil'] == pytest.approx(120.0)
+
+    def test_unproductive_loop_falls_back_to_raw(self, loop_session, graph):
+        gizmo = _item(loop_session, 'Desc_Gizmo_C')
+        solved = solve_chain(graph, gizmo.id, 30.0)
+        assert solved['is_raw_material'] is True
+        assert solved['raw_materials'] == {'Gizmo': 30.0}
+
+    def test_accepts_session(self, loop_session):
+        plastic = _item(loop_session, 'Desc_Plastic_C')
+        solved = solve_chain(loop_session, plastic.id, 60.0)
+        assert solved['raw_materials'] == pytest.approx({'Crude Oil': 90.0})
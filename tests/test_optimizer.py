@@ -0,0 +1,112 @@
+"""Recipe optimizer tests - simplex core and objective-driven recipe choice."""
+
+import numpy as np
+import pytest
+
+from src.calculator import calculate_chain
+from src.database import Building, Item, Recipe, RecipeIngredient
+from src.graph import RecipeGraph
+from src.linear import solve_chain
+from src.optimizer import optimize_chain, scarcity_weight, simplex
+
+
+def _item(session, class_name: str) -> Item:
+    return session.query(Item).filter_by(class_name=class_name).one()
+
+
+@pytest.fixture()
+def alt_plate_session(seeded_session):
+    """
+    Adds "Slow Plate": 1 Iron Ingot -> 1 Iron Plate in 12s (5/min). It saves a third
+    of the ore of the default plate (3 ingots -> 2 plates) but needs 4x the buildings.
+    """
+    s = seeded_session
+    constructor = s.query(Building).filter_by(class_name='Build_ConstructorMk1_C').one()
+    ingot, plate = _item(s, 'Desc_IronIngot_C'), _item(s, 'Desc_IronPlate_C')
+    recipe = Recipe(class_name='Recipe_Alternate_SlowPlate_C', name='Slow Plate',
+                    crafting_time=12.0, building_id=constructor.id)
+    s.add(recipe)
+    s.flush()
+    s.add_all([
+        RecipeIngredient(recipe_id=recipe.id, item_id=ingot.id, quantity=1, is_output=False),
+        RecipeIngredient(recipe_id=recipe.id, item_id=plate.id, quantity=1, is_output=True),
+    ])
+    s.commit()
+    return s
+
+
+class TestSimplex:
+    def test_known_optimum(self):
+        # min x + 2y  s.t.  x + y - s = 4,  x <= 3 (x + t = 3)
+        cost = np.array([1.0, 2.0, 0.0, 0.0])
+        matrix = np.array([[1.0, 1.0, -1.0, 0.0], [1.0, 0.0, 0.0, 1.0]])
+        x = simplex(cost, matrix, np.array([4.0, 3.0]))
+        assert x is not None
+        assert x[:2] == pytest.approx([3.0, 1.0])
+
+    def test_infeasible_returns_none(self):
+        # x + y = -1 with x, y >= 0
+        assert simplex(np.ones(2), np.array([[1.0, 1.0]]), np.array([-1.0])) is None
+
+
+class TestOptimizeChain:
+    def test_resources_objective_picks_ore_saving_alternate(self, alt_plate_session):
+        plate = _item(alt_plate_session, 'Desc_IronPlate_C')
+        plan = optimize_chain(RecipeGraph.from_session(alt_plate_session), plate.id, 60.0)
+
+        slow = alt_plate_session.query(Recipe).filter_by(name='Slow Plate').one()
+        assert plan['preferred_recipes'][plate.id] == slow.id
+        assert plan['raw_materials'] == pytest.approx({'Iron Ore': 60.0})
+        assert plan['objective_value'] == pytest.approx(60.0)
+
+    def test_buildings_objective_keeps_default(self, alt_plate_session):
+        plate = _item(alt_plate_session, 'Desc_IronPlate_C')
+        plan = optimize_chain(
+            RecipeGraph.from_session(alt_plate_session), plate.id, 60.0, objective="buildings",
+        )
+
+        default = alt_plate_session.query(Recipe).filter_by(name='Iron Plate').one()
+        assert plan['preferred_recipes'][plate.id] == default.id
+        assert plan['objective_value'] == pytest.approx(6.0)
+        assert plan['raw_materials'] == pytest.approx({'Iron Ore': 90.0})
+        assert [r['recipe_name'] for r in plan['recipe_totals']] == ["Iron Ingot", "Iron Plate"]
+
+    def test_preferred_recipes_reproduce_plan(self, alt_plate_session):
+        screw = _item(alt_plate_session, 'Desc_Screw_C')
+        graph = RecipeGraph.from_session(alt_plate_session)
+        plan = optimize_chain(graph, screw.id, 40.0, objective="power")
+        chain = calculate_chain(graph, screw.id, 40.0, preferred_recipes=plan['preferred_recipes'])
+
+        # Cast Screw skips the Iron Rod step: 0.8 + 1/3 buildings instead of 2.
+        assert chain['recipe']['recipe_name'] == "Cast Screw"
+        assert chain['raw_materials'] == pytest.approx(plan['raw_materials'])
+        assert plan['objective_value'] == pytest.approx(4.0 * (0.8 + 1 / 3))
+
+    def test_byproduct_becomes_surplus(self, seeded_session):
+        fuel = _item(seeded_session, 'Desc_Fuel_C')
+        plan = optimize_chain(seeded_session, fuel.id, 40.0)
+        solved = solve_chain(seeded_session, fuel.id, 40.0)
+
+        assert plan['raw_materials'] == pytest.approx(solved['raw_materials'])
+        assert plan['byproducts_totals'] == pytest.approx({'Polymer Resin': 30.0})
+
+    def test_raw_and_unknown_targets(self, seeded_session):
+        ore = _item(seeded_session, 'Desc_OreIron_C')
+        plan = optimize_chain(seeded_session, ore.id, 30.0)
+        assert plan['is_raw_material'] is True
+        assert plan['raw_materials'] == pytest.approx({'Iron Ore': 30.0})
+        assert plan['recipe_totals'] == []
+
+        missing = optimize_chain(seeded_session, 99999, 1.0)
+        assert missing['raw_materials'] == {'item_99999': 1.0}
+
+    def test_rejects_unknown_objective(self, seeded_session):
+        with pytest.raises(ValueError, match="objective"):
+            optimize_chain(seeded_session, 1, 1.0, objective="happiness")
+
+
+def test_scarcity_weights():
+    assert scarcity_weight('Desc_OreIron_C') == pytest.approx(1.0)
+    assert scarcity_weight('Desc_OreUranium_C') > scarcity_weight('Desc_OreCopper_C') > 1.0
+    assert 0 < scarcity_weight('Desc_Water_C') < 1e-3
+    assert scarcity_weight('Desc_Wood_C') == scarcity_weight('Desc_OreUranium_C')
@@ -1,9 +1,29 @@
 """Integration tests for production.py CRUD + summary functions."""
 
+import io
 import json
 import math
 
-from src.database import Factory, Group, Item, ProductionLine, Purity, ResourceNode
+import pytest
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from src.calculator import calculate_chain
+from src.database import (
+    Base,
+    Building,
+    Factory,
+    Group,
+    Item,
+    ItemForm,
+    LineRequirement,
+    ProductionLine,
+    Purity,
+    Recipe,
+    RecipeIngredient,
+    ResourceNode,
+    get_engine,
+)
 from src.production import (
     add_resource_node,
     create_group,
@@ -12,17 +32,23 @@ from src.production import (
     delete_group,
     delete_production_line,
     delete_resource_node,
+    dump_factory_ndjson,
+    export_factory_records,
     export_factory_state,
     get_global_summary,
     get_group_summary,
     get_max_output,
+    get_resource_balance,
+    import_factory_records,
     import_factory_state,
+    load_factory_ndjson,
     rename_group,
     rename_production_line,
     set_production_line_active,
     update_production_line_rate,
     update_resource_node,
 )
+from src.summary_cache import group_summaries
 
 
 def _item(session, class_name: str) -> Item:
@@ -68,6 +94,32 @@ class TestProductionLine:
         assert all(f.building_count == 3 for f in factories)
         assert all(math.isclose(f.clock_speed, 100.0) for f in factories)
 
+    def test_factories_follow_the_tree_through_a_loop(self, seeded_session):
+        """C needs A and B, which need each other: each loop recipe runs under both."""
+        s = seeded_session
+        constructor = s.query(Building).filter_by(class_name='Build_ConstructorMk1_C').one()
+        a, b, c = (Item(class_name=f'Desc_Loop{n}_C', name=f'Loop {n}') for n in 'ABC')
+        s.add_all([a, b, c])
+        s.flush()
+        for out, ins in ((a, [b]), (b, [a]), (c, [a, b])):
+            recipe = Recipe(class_name=f'Recipe_{out.class_name}', name=out.name,
+                            crafting_time=60.0, building_id=constructor.id)
+            s.add(recipe)
+            s.flush()
+            s.add_all([RecipeIngredient(recipe_id=recipe.id, item_id=i.id, quantity=1,
+                                        is_output=False) for i in ins])
+            s.add(RecipeIngredient(recipe_id=recipe.id, item_id=out.id, quantity=1,
+                                   is_output=True))
+        s.commit()
+
+        g = create_group(s, "G", "")
+        line = create_production_line(s, g.id, "L", c.id, 2.0)
+
+        counts = {f.recipe.name: f.building_count for f in line.factories}
+        assert counts == {'Loop A': 4, 'Loop B': 4, 'Loop C': 2}
+        tree = calculate_chain(s, c.id, 2.0)
+        assert sum(counts.values()) == pytest.approx(sum(tree['building_summary'].values()))
+
     def test_update_rate_rebuilds_factories(self, seeded_session):
         plate = _item(seeded_session, 'Desc_IronPlate_C')
         g = create_group(seeded_session, "G", "")
@@ -149,6 +201,27 @@ class TestSummaries:
         assert gs['total_buildings'] == 12
         assert gs['global_resource_totals']['Iron Ore'] == 240.0
 
+    def test_group_summary_matches_per_line_balance(self, seeded_session):
+        plate = _item(seeded_session, 'Desc_IronPlate_C')
+        screw = _item(seeded_session, 'Desc_Screw_C')
+        ore = _item(seeded_session, 'Desc_OreIron_C')
+        g = create_group(seeded_session, "N", "")
+        add_resource_node(seeded_session, g.id, "A", ore.id, "PURE", 120.0)
+        lines = [
+            create_production_line(seeded_session, g.id, "Plates", plate.id, 60.0),
+            create_production_line(seeded_session, g.id, "More plates", plate.id, 30.0),
+            create_production_line(seeded_session, g.id, "Screws", screw.id, 40.0),
+        ]
+
+        summary = get_group_summary(seeded_session, g.id)
+        for line, line_summary in zip(lines, summary['production_lines'], strict=True):
+            expected = get_resource_balance(seeded_session, line.id)
+            meta = expected.pop('__line__')
+            assert line_summary['balance'] == expected
+            assert line_summary['building_count'] == meta['building_count']
+        # 90 + 45 + 10 ore against 120 supplied
+        assert summary['overall_balance']['Iron Ore'] == pytest.approx(-25.0)
+
     def test_max_output_bottleneck(self, seeded_session):
         plate = _item(seeded_session, 'Desc_IronPlate_C')
         ore = _item(seeded_session, 'Desc_OreIron_C')
@@ -171,6 +244,76 @@ class TestSummaries:
         assert 'Iron Ore' in result['missing']
 
 
+class TestLineRequirements:
+    @staticmethod
+    def _rows(session, line_id):
+        return {
+            r.item_id: r
+            for r in session.query(LineRequirement).filter_by(line_id=line_id)
+        }
+
+    def test_written_on_create_and_update(self, seeded_session):
+        plate = _item(seeded_session, 'Desc_IronPlate_C')
+        ore = _item(seeded_session, 'Desc_OreIron_C')
+        g = create_group(seeded_session, "G", "")
+        line = create_production_line(seeded_session, g.id, "Plates", plate.id, 60.0)
+
+        rows = self._rows(seeded_session, line.id)
+        assert set(rows) == {ore.id, None}
+        chain = calculate_chain(seeded_session, plate.id, 60.0)
+        assert rows[ore.id].rate == pytest.approx(chain['raw_materials']['Iron Ore'])
+        assert rows[None].power_mw == pytest.approx(chain['power_mw_total'])
+        assert rows[None].building_count == 6
+
+        update_production_line_rate(seeded_session, line.id, 120.0)
+        rows = self._rows(seeded_session, line.id)
+        assert rows[ore.id].rate == pytest.approx(2 * chain['raw_materials']['Iron Ore'])
+        assert rows[None].building_count == 12
+
+    def test_removed_on_delete(self, seeded_session):
+        plate = _item(seeded_session, 'Desc_IronPlate_C')
+        g = create_group(seeded_session, "G", "")
+        kept = create_production_line(seeded_session, g.id, "Kept", plate.id, 30.0)
+        dropped = create_production_line(seeded_session, g.id, "Dropped", plate.id, 30.0)
+
+        delete_production_line(seeded_session, dropped.id)
+        assert self._rows(seeded_session, dropped.id) == {}
+        assert self._rows(seeded_session, kept.id)
+
+        delete_group(seeded_session, g.id)
+        assert seeded_session.query(LineRequirement).count() == 0
+
+    def test_missing_or_stale_rows_backfilled(self, seeded_session):
+        plate = _item(seeded_session, 'Desc_IronPlate_C')
+        g = create_group(seeded_session, "G", "")
+        fresh = create_production_line(seeded_session, g.id, "Fresh", plate.id, 60.0)
+        stale = create_production_line(seeded_session, g.id, "Stale", plate.id, 60.0)
+        expected = get_group_summary(seeded_session, g.id)
+
+        seeded_session.query(LineRequirement).filter_by(line_id=fresh.id).delete()
+        seeded_session.query(LineRequirement).filter_by(line_id=stale.id).update(
+            {"catalog_version": "outdated", "rate": 0.0}
+        )
+        seeded_session.commit()
+        group_summaries.clear()
+
+        assert get_group_summary(seeded_session, g.id) == expected
+        assert self._rows(seeded_session, fresh.id)
+
+    def test_backfill_does_not_commit_the_caller(self, seeded_session):
+        plate = _item(seeded_session, 'Desc_IronPlate_C')
+        g = create_group(seeded_session, "G", "")
+        line = create_production_line(seeded_session, g.id, "L", plate.id, 60.0)
+        seeded_session.query(LineRequirement).filter_by(line_id=line.id).delete()
+        seeded_session.commit()
+        group_summaries.clear()
+
+        plate.name = 'Pending Plate'                 # unrelated, not committed
+        get_group_summary(seeded_session, g.id)
+        seeded_session.rollback()
+        assert _item(seeded_session, 'Desc_IronPlate_C').name == 'Iron Plate'
+
+
 class TestImportExport:
     def test_round_trip(self, seeded_session):
         plate = _item(seeded_session, 'Desc_IronPlate_C')
@@ -198,6 +341,152 @@ class TestImportExport:
         assert reloaded.name == "N"
         assert reloaded.production_lines[0].is_active is False
 
+    @staticmethod
+    def _export(lines: int, item_class: str = 'Desc_IronPlate_C') -> dict:
+        return {"version": 1, "groups": [{
+            "name": "Imported",
+            "resource_nodes": [
+                {"name": "A", "item_class": 'Desc_OreIron_C', "purity": "PURE",
+                 "extraction_rate": 240.0},
+                {"name": "Gone", "item_class": 'Desc_Missing_C'},
+            ],
+            "production_lines": [
+                {"name": f"L{n}", "target_item_class": item_class, "target_rate": 30.0 * n}
+                for n in range(1, lines + 1)
+            ],
+        }]}
+
+    def test_bulk_import_matches_per_line_creation(self, seeded_session):
+        plate = _item(seeded_session, 'Desc_IronPlate_C')
+        g = create_group(seeded_session, "Manual", "")
+        manual = [
+            create_production_line(seeded_session, g.id, f"L{n}", plate.id, 30.0 * n)
+            for n in (1, 2)
+        ]
+
+        result = import_factory_state(seeded_session, self._export(2))
+        assert result == {"groups": 1, "lines": 2, "nodes": 1, "skipped_items": ['Desc_Missing_C']}
+
+        imported = seeded_session.query(Group).filter_by(name="Imported").one()
+        for mine, theirs in zip(manual, imported.production_lines, strict=True):
+            assert [
+                (f.recipe_id, f.building_count, f.clock_speed, f.order) for f in mine.factories
+            ] == [
+                (f.recipe_id, f.building_count, f.clock_speed, f.order) for f in theirs.factories
+            ]
+            ours, bulk = (get_resource_balance(seeded_session, line.id) for line in (mine, theirs))
+            assert bulk['__line__'] == ours['__line__']
+            assert bulk['Iron Ore']['required'] == ours['Iron Ore']['required']
+
+    def test_bulk_import_ids_survive_a_concurrent_writer(self, tmp_path):
+        engine = get_engine(f"sqlite:///{tmp_path / 'shared.db'}")
+        Base.metadata.create_all(engine)
+        with Session(engine) as setup:
+            setup.add(Item(class_name='Desc_OreIron_C', name='Iron Ore', form=ItemForm.SOLID))
+            setup.commit()
+
+        def other_writer(conn, cursor, statement, *args):
+            if statement.startswith("INSERT INTO groups") and not written:
+                written.append(True)
+                with engine.begin() as other:
+                    other.execute(insert(Group), {"name": "Concurrent", "description": ""})
+
+        written = []
+        event.listen(engine, "before_cursor_execute", other_writer)
+        try:
+            with Session(engine) as session:
+                import_factory_state(session, {"version": 1, "groups": [
+                    {"name": f"G{n}", "resource_nodes": [
+                        {"name": f"N{n}", "item_class": 'Desc_OreIron_C'},
+                    ]}
+                    for n in range(3)
+                ]})
+                nodes = session.query(ResourceNode).order_by(ResourceNode.id)
+                assert written and [(node.name, node.group.name) for node in nodes] == [
+                    ("N0", "G0"), ("N1", "G1"), ("N2", "G2"),
+                ]
+        finally:
+            event.remove(engine, "before_cursor_execute", other_writer)
+            engine.dispose()
+
+    def test_bulk_import_rolls_back_on_error(self, seeded_session):
+        data = self._export(3)
+        del data["groups"][0]["production_lines"][-1]["name"]
+        with pytest.raises(KeyError):
+            import_factory_state(seeded_session, data)
+        assert seeded_session.query(Group).count() == 0
+        assert seeded_session.query(ResourceNode).count() == 0
+        assert seeded_session.query(ProductionLine).count() == 0
+
+
+class TestNdjson:
+    @pytest.fixture()
+    def state(self, seeded_session):
+        plate = _item(seeded_session, 'Desc_IronPlate_C')
+        ore = _item(seeded_session, 'Desc_OreIron_C')
+        for name in ("A", "B"):
+            g = create_group(seeded_session, name, f"{name} desc")
+            add_resource_node(seeded_session, g.id, "Node", ore.id, "PURE", 240.0)
+            for n in range(3):
+                create_production_line(seeded_session, g.id, f"L{n}", plate.id, 10.0 * (n + 1))
+        create_group(seeded_session, "Empty", "")
+        return export_factory_state(seeded_session)
+
+    @staticmethod
+    def _wipe(session):
+        for group in session.query(Group).all():
+            delete_group(session, group.id)
+
+    def test_records_match_dict_export(self, seeded_session, state):
+        records = list(export_factory_records(seeded_session, batch_size=2))
+        assert records[0] == {"type": "header", "version": 1}
+        assert [r["type"] for r in records[1:6]] == [
+            "group", "resource_node", "production_line", "production_line", "production_line",
+        ]
+        assert sum(r["type"] == "group" for r in records) == len(state["groups"]) == 3
+
+    def test_groupless_rows_are_skipped(self, seeded_session, state):
+        plate = _item(seeded_session, 'Desc_IronPlate_C')
+        ore = _item(seeded_session, 'Desc_OreIron_C')
+        seeded_session.add_all([
+            ProductionLine(name="Loose", target_item_id=plate.id, target_rate=5.0),
+            ResourceNode(name="Loose", item_id=ore.id, extraction_rate=60.0),
+        ])
+        seeded_session.commit()
+        assert export_factory_state(seeded_session) == state
+
+    @pytest.mark.parametrize("compress", [False, True])
+    def test_file_round_trip(self, seeded_session, state, compress):
+        buffer = io.BytesIO()
+        count = dump_factory_ndjson(seeded_session, buffer, compress=compress)
+        assert count == 1 + 3 + 2 + 6
+        assert buffer.getvalue().startswith(b"\x1f\x8b") is compress
+
+        self._wipe(seeded_session)
+        buffer.seek(0)
+        result = load_factory_ndjson(seeded_session, buffer)
+        assert (result["groups"], result["nodes"], result["lines"]) == (3, 2, 6)
+        assert export_factory_state(seeded_session) == state
+
+    def test_groups_split_across_batches(self, seeded_session, state):
+        records = list(export_factory_records(seeded_session))
+        self._wipe(seeded_session)
+        import_factory_records(seeded_session, iter(records), batch_size=2)
+        assert export_factory_state(seeded_session) == state
+        lines = seeded_session.query(ProductionLine).order_by(ProductionLine.id)
+        assert [line.group.name for line in lines] == ["A"] * 3 + ["B"] * 3
+
+    @pytest.mark.parametrize("records", [
+        [],
+        [{"type": "header", "version": 99}],
+        [{"type": "group", "name": "No header"}],
+        [{"type": "header", "version": 1}, {"type": "resource_node", "name": "Orphan"}],
+    ])
+    def test_rejects_malformed_streams(self, seeded_session, records):
+        with pytest.raises(ValueError):
+            import_factory_records(seeded_session, records)
+        assert seeded_session.query(Group).count() == 0
+
 
 class TestStarterData:
     def test_no_op_if_groups_exist(self, seeded_session):
@@ -0,0 +1,146 @@
+"""Query-layer tests - serialized results and a fixed statement count per query."""
+
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import select
+
+from src.database import Item, ProductionLine, Recipe
+from src.instrumentation import record_queries
+from src.production import (
+    add_resource_node,
+    create_group,
+    create_production_line,
+    delete_group,
+    delete_production_line,
+    get_global_summary,
+)
+from src.queries import (
+    get_all_groups,
+    get_all_production_lines,
+    get_all_recipes,
+    get_factories_for_production_line,
+    get_production_lines_for_group,
+    get_recipe,
+    get_recipe_details,
+    get_resource_nodes_for_group,
+    get_resource_totals,
+    get_resource_totals_by_group,
+)
+
+
+def _item(session, class_name: str) -> Item:
+    return session.query(Item).filter_by(class_name=class_name).one()
+
+
+@contextmanager
+def _count_statements(session):
+    """Yields the QueryStats of every SQL statement run inside the block."""
+    session.expunge_all()  # nothing pre-loaded: every lazy load would show up
+    with record_queries() as stats:
+        yield stats
+
+
+def _populate(session, groups: int) -> None:
+    """`groups` groups, each with two resource nodes and two lines (with factories)."""
+    ore, plate = _item(session, 'Desc_OreIron_C'), _item(session, 'Desc_IronPlate_C')
+    screw = _item(session, 'Desc_Screw_C')
+    for n in range(groups):
+        g = create_group(session, f"G{n}", "")
+        add_resource_node(session, g.id, "A", ore.id, "NORMAL", 60.0)
+        add_resource_node(session, g.id, "B", ore.id, "PURE", 120.0)
+        create_production_line(session, g.id, "Plates", plate.id, 20.0)
+        create_production_line(session, g.id, "Screws", screw.id, 40.0)
+
+
+class TestStatementCounts:
+    @pytest.mark.parametrize("groups", [1, 6])
+    def test_constant_as_data_grows(self, seeded_session, groups):
+        _populate(seeded_session, groups)
+        group_id = seeded_session.scalars(select(ProductionLine.group_id)).first()
+        line_id = seeded_session.scalars(
+            select(ProductionLine.id).where(ProductionLine.name == "Screws")
+        ).first()
+
+        for query, expected in (
+            (lambda: get_all_groups(seeded_session), 1),
+            (lambda: get_all_production_lines(seeded_session), 1),
+            (lambda: get_resource_totals(seeded_session, group_id), 1),
+            (lambda: get_resource_totals_by_group(seeded_session), 1),
+            (lambda: get_production_lines_for_group(seeded_session, group_id), 1),
+            (lambda: get_resource_nodes_for_group(seeded_session, group_id), 1),
+            (lambda: get_factories_for_production_line(seeded_session, line_id), 1),
+            (lambda: get_all_recipes(seeded_session), 2),
+        ):
+            with _count_statements(seeded_session) as statements:
+                result = query()
+            assert result
+            assert statements.count == expected, statements.statements
+
+    def test_global_summary_flat_as_groups_grow(self, seeded_session):
+        get_global_summary(seeded_session)  # load the shared recipe graph first
+        counts = []
+        for groups in (1, 5):
+            _populate(seeded_session, groups)
+            with _count_statements(seeded_session) as statements:
+                get_global_summary(seeded_session)
+            counts.append(statements.count)
+        assert counts[0] == counts[1]
+
+    def test_cached_global_summary_statements(self, seeded_session):
+        _populate(seeded_session, 2)
+        get_global_summary(seeded_session)
+        with _count_statements(seeded_session) as statements:
+            get_global_summary(seeded_session)
+        # the ETL generation behind the shared recipe graph, then the group list
+        assert statements.count == 2, statements.statements
+
+    def test_deletes_are_set_based(self, seeded_session):
+        ore_id = _item(seeded_session, 'Desc_OreIron_C').id
+        screw_id = _item(seeded_session, 'Desc_Screw_C').id
+        _populate(seeded_session, 1)                 # a bystander that must survive
+        counts = []
+        for size in (1, 12):
+            group_id = create_group(seeded_session, f"Big {size}", "").id
+            for n in range(size):
+                add_resource_node(seeded_session, group_id, f"N{n}", ore_id, "NORMAL", 60.0)
+                line_id = create_production_line(
+                    seeded_session, group_id, f"L{n}", screw_id, 40.0
+                ).id
+            with _count_statements(seeded_session) as line_statements:
+                delete_production_line(seeded_session, line_id)
+            with _count_statements(seeded_session) as group_statements:
+                delete_group(seeded_session, group_id)
+            counts.append((line_statements.count, group_statements.count))
+        assert counts[0] == counts[1]
+        assert [g['name'] for g in get_all_groups(seeded_session)] == ["G0"]
+        assert len(get_all_production_lines(seeded_session)) == 2
+
+    def test_recipe_details_single_load(self, seeded_session):
+        recipe_id = seeded_session.scalars(select(Recipe.id)).first()
+        with _count_statements(seeded_session) as statements:
+            get_recipe_details(get_recipe(seeded_session, recipe_id))
+        assert statements.count == 2
+
+
+def test_all_recipes_match_per_recipe_details(seeded_session):
+    recipes = seeded_session.scalars(select(Recipe).order_by(Recipe.id)).all()
+    assert get_all_recipes(seeded_session) == [get_recipe_details(r) for r in recipes]
+
+
+def test_group_counts(seeded_session):
+    _populate(seeded_session, 2)
+    groups = get_all_groups(seeded_session)
+    assert [(g['production_line_count'], g['resource_node_count']) for g in groups] == [
+        (2, 2), (2, 2),
+    ]
+
+
+def test_resource_totals(seeded_session):
+    _populate(seeded_session, 2)
+    first = get_all_groups(seeded_session)[0]['id']
+
+    assert get_resource_totals(seeded_session, first) == {'Iron Ore': 180.0}
+    assert list(get_resource_totals_by_group(seeded_session).values()) == [
+        {'Iron Ore': 180.0}, {'Iron Ore': 180.0},
+    ]
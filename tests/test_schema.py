@@ -0,0 +1,80 @@
+"""Schema tests - secondary indexes, the in-place upgrade, and hot-query plans."""
+
+import pytest
+from sqlalchemy import event, inspect, text
+
+from src.database import Base, Item, get_engine, upgrade_schema
+from src.queries import (
+    get_factories_for_production_line,
+    get_production_lines_for_group,
+    get_recipes_for_item,
+    get_resource_nodes_for_group,
+)
+
+HOT_INDEXES = {
+    'ix_recipe_ingredients_item_id_is_output',
+    'ix_recipe_ingredients_recipe_id',
+    'ix_recipes_building_id',
+    'ix_production_lines_group_id',
+    'ix_resource_nodes_group_id',
+    'ix_factories_production_line_id',
+}
+
+
+def _index_names(engine) -> set[str]:
+    inspector = inspect(engine)
+    return {
+        ix['name'] for table in inspector.get_table_names() for ix in inspector.get_indexes(table)
+    }
+
+
+def _query_plan(session, run) -> list[str]:
+    """EXPLAIN QUERY PLAN details for the statement `run()` sends to the database."""
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, *args):
+        captured.append((statement, parameters))
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        run()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    statement, parameters = captured[0]
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return [row[3] for row in rows]
+
+
+class TestUpgradeSchema:
+    def test_adds_missing_indexes_in_place(self):
+        engine = get_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            for name in HOT_INDEXES:
+                conn.execute(text(f"DROP INDEX {name}"))
+            conn.execute(text("INSERT INTO items (class_name, name) VALUES ('Desc_X_C', 'X')"))
+        assert not HOT_INDEXES & _index_names(engine)
+
+        assert set(upgrade_schema(engine)) == HOT_INDEXES
+        assert _index_names(engine) >= HOT_INDEXES
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT name FROM items")).scalar() == 'X'
+
+    def test_idempotent(self, engine):
+        assert upgrade_schema(engine) == []
+
+
+class TestQueryPlans:
+    @pytest.mark.parametrize("run, index", [
+        (lambda s, item_id: get_recipes_for_item(s, item_id),
+         'ix_recipe_ingredients_item_id_is_output'),
+        (lambda s, _: get_production_lines_for_group(s, 1), 'ix_production_lines_group_id'),
+        (lambda s, _: get_resource_nodes_for_group(s, 1), 'ix_resource_nodes_group_id'),
+        (lambda s, _: get_factories_for_production_line(s, 1), 'ix_factories_production_line_id'),
+    ])
+    def test_hot_queries_use_indexes(self, seeded_session, run, index):
+        plate = seeded_session.query(Item).filter_by(class_name='Desc_IronPlate_C').one()
+        plan = _query_plan(seeded_session, lambda: run(seeded_session, plate.id))
+        assert any(f"USING INDEX {index}" in step for step in plan), plan
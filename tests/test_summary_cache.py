@@ -0,0 +1,95 @@
+"""Summary cache tests - per-group write versions and targeted recomputation."""
+
+import pytest
+
+from src.database import Item
+from src.production import (
+    add_resource_node,
+    create_group,
+    create_production_line,
+    delete_production_line,
+    get_global_summary,
+    get_group_summary,
+    set_production_line_active,
+    update_resource_node,
+)
+from src.summary_cache import GroupSummaryCache, group_summaries
+
+
+def _item(session, class_name: str) -> Item:
+    return session.query(Item).filter_by(class_name=class_name).one()
+
+
+@pytest.fixture()
+def two_groups(seeded_session):
+    ore, plate = _item(seeded_session, 'Desc_OreIron_C'), _item(seeded_session, 'Desc_IronPlate_C')
+    groups = []
+    for name in ("North", "South"):
+        g = create_group(seeded_session, name, "")
+        node = add_resource_node(seeded_session, g.id, "Node", ore.id, "NORMAL", 120.0)
+        line = create_production_line(seeded_session, g.id, "Plates", plate.id, 30.0)
+        groups.append((g.id, node.id, line.id))
+    return groups
+
+
+def _fresh_global(session) -> dict:
+    group_summaries.clear()
+    return get_global_summary(session)
+
+
+class TestTargetedInvalidation:
+    def test_untouched_groups_stay_cached(self, seeded_session, two_groups):
+        (north, north_node, _), (south, _, _) = two_groups
+        before = {gid: get_group_summary(seeded_session, gid) for gid in (north, south)}
+
+        update_resource_node(seeded_session, north_node, extraction_rate=60.0)
+
+        assert get_group_summary(seeded_session, south) is before[south]
+        after = get_group_summary(seeded_session, north)
+        assert after is not before[north]
+        assert after['resource_totals'] == {'Iron Ore': 60.0}
+
+    @pytest.mark.parametrize("mutate", [
+        lambda s, ids: set_production_line_active(s, ids[0][2], False),
+        lambda s, ids: delete_production_line(s, ids[0][2]),
+        lambda s, ids: add_resource_node(
+            s, ids[0][0], "Extra", _item(s, 'Desc_OreIron_C').id, "PURE", 240.0
+        ),
+    ])
+    def test_global_summary_recomputes_only_dirty_groups(
+        self, seeded_session, two_groups, mutate
+    ):
+        first = get_global_summary(seeded_session)
+        mutate(seeded_session, two_groups)
+
+        misses = group_summaries.misses
+        summary = get_global_summary(seeded_session)
+        assert group_summaries.misses - misses == 1
+        assert summary['groups'][1] is first['groups'][1]
+        assert summary == _fresh_global(seeded_session)
+
+    def test_new_group_appears(self, seeded_session, two_groups):
+        get_global_summary(seeded_session)
+        create_group(seeded_session, "East", "")
+        assert [g['name'] for g in get_global_summary(seeded_session)['groups']] == [
+            "North", "South", "East",
+        ]
+
+
+class _Bind:
+    """Stands in for an engine: any weak-referenceable object will do."""
+
+
+def test_write_during_recompute_is_not_cached():
+    cache, bind = GroupSummaryCache(), _Bind()
+    version = cache.version(bind, 1)
+    cache.touch(bind, 1)                       # a write lands while computing
+    cache.put(bind, 1, version, "v1", {"stale": True})
+    assert cache.get(bind, 1, cache.version(bind, 1), "v1") is None
+
+
+def test_catalog_change_drops_entries():
+    cache, bind = GroupSummaryCache(), _Bind()
+    cache.put(bind, 1, 0, "v1", {"id": 1})
+    assert cache.get(bind, 1, 0, "v1") == {"id": 1}
+    assert cache.get(bind, 1, 0, "v2") is None
@@ -0,0 +1,64 @@
+"""UE property text parser - values, item amounts, class paths and malformed input."""
+
+import pytest
+
+from src.ue_properties import (
+    ItemAmount,
+    ObjectPath,
+    object_path,
+    parse_class_paths,
+    parse_item_amounts,
+    parse_value,
+)
+
+_REF = "/Script/Engine.BlueprintGeneratedClass'\"/Game/FactoryGame/Resource/{0}.{0}_C\"'"
+
+
+def _amounts(*parts: tuple[str, int]) -> str:
+    return "(" + ",".join(f"(ItemClass={_REF.format(c)},Amount={n})" for c, n in parts) + ")"
+
+
+def test_parse_value_shapes():
+    assert parse_value("") == ""
+    assert parse_value("()") == ()
+    assert parse_value(" ( a , b ) ") == ("a", "b")
+    assert parse_value('(A=1,B=(x,"q\\"uote, (not a list)"),C=())') == {
+        "A": "1", "B": ("x", 'q"uote, (not a list)'), "C": (),
+    }
+
+
+def test_item_amounts_keep_every_prefix_in_order():
+    text = _amounts(("BP_ItemDescriptorPortableMiner", 2), ("Desc_SteelPlateReinforced", 10),
+                    ("Foundation_8x4_01", 1))
+    assert parse_item_amounts(text) == [
+        ItemAmount("BP_ItemDescriptorPortableMiner_C", 2),
+        ItemAmount("Desc_SteelPlateReinforced_C", 10),
+        ItemAmount("Foundation_8x4_01_C", 1),
+    ]
+    assert parse_item_amounts("") == []
+
+
+def test_class_paths():
+    text = ('("/Game/FactoryGame/Buildable/Factory/SmelterMk1/Build_SmelterMk1.Build_SmelterMk1_C",'
+            '"/Script/FactoryGame.FGBuildableAutomatedWorkBench")')
+    assert parse_class_paths(text) == [
+        ObjectPath("/Game/FactoryGame/Buildable/Factory/SmelterMk1/Build_SmelterMk1",
+                   "Build_SmelterMk1_C"),
+        ObjectPath("/Script/FactoryGame", "FGBuildableAutomatedWorkBench"),
+    ]
+    assert object_path(_REF.format("Desc_Coal")).name == "Desc_Coal_C"
+
+
+@pytest.mark.parametrize("text", [
+    "(a", "a)", "(a,b=1)", "(a=1,b)", "(,a)", "(a,)", "((a)(b))", "(a=)", "a=1", "(a)b",
+])
+def test_malformed_values(text):
+    with pytest.raises(ValueError):
+        parse_value(text)
+
+
+def test_typed_parsers_reject_other_shapes():
+    with pytest.raises(ValueError):
+        parse_item_amounts("((ItemClass=x))")
+    with pytest.raises(ValueError):
+        parse_class_paths("((a,b))")
@@ -0,0 +1,96 @@
+"""Unit-cost table tests - build, read-only lookups and stale rows."""
+
+import pytest
+from sqlalchemy import event
+
+from src.calculator import calculate_chain
+from src.database import Item, Recipe, RecipeIngredient, UnitCost, upgrade_schema
+from src.graph import invalidate_recipe_graph
+from src.unit_costs import build_unit_costs, get_unit_cost
+
+
+def _item(session, class_name: str) -> Item:
+    return session.query(Item).filter_by(class_name=class_name).one()
+
+
+@pytest.fixture()
+def built(seeded_session):
+    build_unit_costs(seeded_session)
+    seeded_session.commit()
+    return seeded_session
+
+
+class TestUnitCosts:
+    def test_build_covers_every_item(self, seeded_session):
+        assert build_unit_costs(seeded_session) == seeded_session.query(Item).count()
+        assert seeded_session.query(UnitCost).count() == seeded_session.query(Item).count()
+
+    def test_upgrade_schema_builds_an_empty_table(self, seeded_session, engine):
+        seeded_session.commit()
+        upgrade_schema(engine)
+        assert seeded_session.query(UnitCost).count() == seeded_session.query(Item).count()
+
+    def test_matches_calculator_per_unit(self, built):
+        screw = _item(built, 'Desc_Screw_C')
+        cost = get_unit_cost(built, screw.id)
+        chain = calculate_chain(built, screw.id, 1.0)
+
+        assert cost is not None and cost['is_raw_material'] is False
+        assert cost['raw_materials'] == pytest.approx(chain['raw_materials'])
+        assert cost['building_summary'] == pytest.approx(chain['building_summary'])
+        # Screw (1/40), Rod (1/60), Ingot (1/120) constructors/smelters at 4 MW
+        assert cost['building_count'] == pytest.approx(1 / 40 + 1 / 60 + 1 / 120)
+        assert cost['power_mw'] == pytest.approx(4.0 * (1 / 40 + 1 / 60 + 1 / 120))
+
+    def test_raw_and_unknown_items(self, built):
+        ore = _item(built, 'Desc_OreIron_C')
+        cost = get_unit_cost(built, ore.id)
+        assert cost is not None
+        assert cost['is_raw_material'] is True
+        assert cost['raw_materials'] == {'Iron Ore': 1.0}
+        assert cost['power_mw'] == 0.0
+        assert get_unit_cost(built, 99999) is None
+
+    def test_lookup_only_reads(self, seeded_session):
+        plate = _item(seeded_session, 'Desc_IronPlate_C')
+        seeded_session.commit()
+        plate.name = 'Pending Plate'                # an unrelated write the caller hasn't committed
+        assert get_unit_cost(seeded_session, plate.id) is None   # table not built yet
+        seeded_session.rollback()
+        assert _item(seeded_session, 'Desc_IronPlate_C').name == 'Iron Plate'
+
+    def test_lookup_statements(self, built):
+        plate = _item(built, 'Desc_IronPlate_C')
+        get_unit_cost(built, plate.id)              # first lookup checks the table exists
+        statements = []
+
+        def listener(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(built.get_bind(), "before_cursor_execute", listener)
+        try:
+            assert get_unit_cost(built, plate.id) is not None
+        finally:
+            event.remove(built.get_bind(), "before_cursor_execute", listener)
+        assert len(statements) == 2, statements
+
+    def test_stale_rows_are_not_served(self, built):
+        plate = _item(built, 'Desc_IronPlate_C')
+        assert get_unit_cost(built, plate.id)['raw_materials'] == pytest.approx(
+            {'Iron Ore': 1.5}
+        )
+
+        # Make the plate recipe cheaper: 2 ingots -> 2 plates.
+        recipe = built.query(Recipe).filter_by(class_name='Recipe_IronPlate_C').one()
+        ingredient = built.query(RecipeIngredient).filter_by(
+            recipe_id=recipe.id, is_output=False
+        ).one()
+        ingredient.quantity = 2
+        built.commit()
+        invalidate_recipe_graph(built.get_bind())
+
+        assert get_unit_cost(built, plate.id) is None
+        build_unit_costs(built)
+        assert get_unit_cost(built, plate.id)['raw_materials'] == pytest.approx(
+            {'Iron Ore': 1.0}
+        )